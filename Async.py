@@ -0,0 +1,273 @@
+"""
+Awaitable versions of the heavy operations, for use from asyncio.
+
+    C = await Async.amul(A, B)
+    x = await Async.asolve(A, b, progress=report)
+    A_inv = await Async.ainverse(A)
+    U, E = await Async.arref(A, elim_matrix=True)
+
+Each runs on an executor, so the event loop keeps running meanwhile:
+threads (the default) keep it responsive, and processes run jobs on other
+cores too (their operands and results are pickled, so what they cache is
+not seen by the caller). At most MAX_IN_FLIGHT jobs run at once; the others
+wait their turn without holding a worker.
+
+Eliminations (LU factorizations, inverses, rref, exact solves) check for
+cancellation and call progress(done, total) at each pivot column, done out
+of total columns of the current pass (an inverse makes two: factoring, then
+one solve per column; rref makes two as well: down to the echelon form,
+then back up through the pivots). Products do the same for each block of ROWS rows.
+Cancelling the awaiting task, e.g. when its client goes away, stops the job
+at its next check, and its slot is freed once the worker has stopped.
+
+    EXECUTOR = kind of executor: "thread" or "process"
+    WORKERS = number of workers of the executor (None for its default)
+    MAX_IN_FLIGHT = most jobs running at once, per event loop
+    ROWS = rows of a product computed between checks
+    INTERVAL = seconds between checks in process workers, and between
+               progress updates from them
+"""
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import atexit
+import multiprocessing
+import queue
+import threading
+import time
+import weakref
+import Matrix as M
+import Backend
+import Parallel
+import Utils
+
+EXECUTOR = "thread"
+WORKERS = None
+MAX_IN_FLIGHT = 4
+ROWS = 64
+INTERVAL = 0.05
+
+_pool = None
+_pool_kind = None
+_manager = None
+_limits = weakref.WeakKeyDictionary()    # event loop -> (size, semaphore)
+
+
+class Cancelled(Exception):
+    """
+    Raised in a worker to stop a job that was cancelled.
+    """
+
+
+def set_executor(kind="thread", workers=None):
+    """
+    sets the kind of executor jobs run on ("thread" or "process") and its
+    number of workers (None for the executor's default)
+    """
+    global EXECUTOR, WORKERS
+    if kind not in ("thread", "process"):
+        raise ValueError(f"Unknown executor {kind!r} (expected \"thread\" or \"process\")")
+    EXECUTOR, WORKERS = kind, workers
+
+
+def set_max_in_flight(n):
+    """
+    sets the most jobs running at once. jobs already running are not affected
+    """
+    global MAX_IN_FLIGHT
+    if n < 1:
+        raise ValueError("At least one job must be allowed to run")
+    MAX_IN_FLIGHT = n
+
+
+def shutdown():
+    """
+    stops the executor. it is started again when next needed
+    """
+    global _pool, _pool_kind, _manager
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = _pool_kind = None
+    if _manager is not None:
+        _manager.shutdown()
+        _manager = None
+
+
+atexit.register(shutdown)
+
+
+def _executor():
+    global _pool, _pool_kind
+    kind = (EXECUTOR, WORKERS)
+    if _pool is None or _pool_kind != kind:
+        shutdown()
+        _pool = (ThreadPoolExecutor if EXECUTOR == "thread" else ProcessPoolExecutor)(WORKERS)
+        _pool_kind = kind
+    return _pool
+
+
+def _limit(loop):
+    """
+    returns the semaphore bounding the jobs in flight on the event loop
+    """
+    size, sem = _limits.get(loop, (None, None))
+    if size != MAX_IN_FLIGHT:
+        sem = asyncio.Semaphore(MAX_IN_FLIGHT)
+        _limits[loop] = (MAX_IN_FLIGHT, sem)
+    return sem
+
+
+class _ThreadJob:
+    """
+    The cancellation flag and progress reporting of a job run on a thread.
+    """
+
+    def __init__(self, loop, progress):
+        self.cancelled = threading.Event()
+        self.loop = loop
+        self.progress = progress
+
+
+    def __call__(self, done, total):
+        if self.cancelled.is_set():
+            raise Cancelled("Job was cancelled")
+        if self.progress is not None:
+            _call_soon(self.loop, self.progress, done, total)
+
+
+class _ProcessJob:
+    """
+    The cancellation flag and progress reporting of a job run in another
+    process, through a manager. checks are made at most every INTERVAL seconds
+    """
+
+    def __init__(self, manager, report):
+        self.cancelled = manager.Event()
+        self.updates = manager.Queue() if report else None
+        self.last = 0
+
+
+    def __call__(self, done, total):
+        now = time.monotonic()
+        if now - self.last < INTERVAL and done < total:
+            return
+        self.last = now
+        if self.cancelled.is_set():
+            raise Cancelled("Job was cancelled")
+        if self.updates is not None:
+            self.updates.put((done, total))
+
+
+def _call_soon(loop, func, *args):
+    try:
+        loop.call_soon_threadsafe(func, *args)
+    except RuntimeError:    # the loop has been closed
+        pass
+
+
+def _run(func, args, job):
+    """
+    runs func(*args) in a worker, with job as its progress callback
+    """
+    old = Utils.set_progress(job)
+    try:
+        return func(*args)
+    finally:
+        Utils.set_progress(old)
+
+
+async def _submit(func, args, progress):
+    """
+    runs func(*args) on the executor once a slot is free, returning its result
+    """
+    global _manager
+    loop = asyncio.get_running_loop()
+    sem = _limit(loop)
+    await sem.acquire()
+    try:
+        pool = _executor()
+        if EXECUTOR == "process":
+            if _manager is None:
+                _manager = multiprocessing.Manager()
+            job = _ProcessJob(_manager, progress is not None)
+        else:
+            job = _ThreadJob(loop, progress)
+        fut = pool.submit(_run, func, args, job)
+    except BaseException:
+        sem.release()
+        raise
+    fut.add_done_callback(lambda f: _call_soon(loop, sem.release))
+
+    wrapped = asyncio.wrap_future(fut)
+    try:
+        if isinstance(job, _ProcessJob):
+            return await _poll(wrapped, job, progress)
+        return await wrapped
+    except asyncio.CancelledError:
+        job.cancelled.set()
+        wrapped.cancel()    # the job itself too, if it has not started
+        raise
+
+
+async def _poll(wrapped, job, progress):
+    """
+    waits for the result of a job run in another process, passing its
+    progress updates on every INTERVAL seconds
+    """
+    while True:
+        finished, _ = await asyncio.wait({wrapped}, timeout=INTERVAL)
+        if job.updates is not None:
+            while True:
+                try:
+                    done, total = job.updates.get_nowait()
+                except queue.Empty:
+                    break
+                progress(done, total)
+        if finished:
+            return wrapped.result()
+
+
+def _mul(A, B):
+    """
+    returns A*B, computing products of matrices ROWS rows at a time
+    """
+    if not (isinstance(A, M.Matrix) and isinstance(B, M.Matrix)) or Backend.active(A, B):
+        return A * B
+    if A.n != B.m:
+        raise ValueError("Width of left matrix must match height of right matrix")
+    m, n, p = A.m, A.n, B.n
+    a, b = A._flat(), B._flat()
+    tc = Utils.join_types(A._entry_type(), B._entry_type())
+    flat = []
+    for i in Utils.steps(range(0, m, ROWS)):
+        rows = min(ROWS, m - i)
+        flat += Parallel.matmul(a[i*n:(i + rows)*n], b, rows, n, p, tc)
+    return M.Matrix._wrap(m, p, Utils.pack(flat, tc))
+
+
+async def amul(A, B, progress=None):
+    """
+    returns A*B, computed on the executor
+    """
+    return await _submit(_mul, (A, B), progress)
+
+
+async def asolve(A, b, exact=False, progress=None):
+    """
+    returns the solution of A*x = b (see Matrix.solve), computed on the executor
+    """
+    return await _submit(M.solve, (A, b, exact), progress)
+
+
+async def ainverse(A, exact=False, progress=None):
+    """
+    returns the inverse of A (see Matrix.inverse), computed on the executor
+    """
+    return await _submit(M.inverse, (A, exact), progress)
+
+
+async def arref(A, elim_matrix=False, exact=False, progress=None):
+    """
+    returns the reduced row echelon form of A (see Matrix.rref), computed on the executor
+    """
+    return await _submit(M.rref, (A, elim_matrix, exact), progress)
@@ -0,0 +1,333 @@
+"""
+Optional NumPy backend for matrices and vectors.
+
+A matrix or vector whose buffer is a NumPy array (an ndarray) uses the
+backend: its +, -, *, trans, ref, rref, inverse, det, solve and
+solve_triangular dispatch to vectorized NumPy kernels. Everything else keeps working through the
+pure-Python code, which stays the fallback when NumPy is not installed.
+
+NumPy integers wrap around silently on overflow, so sums and products of
+integer operands whose entries could overflow 64 bits are computed by the
+pure-Python code instead, which switches to generic entries when they do.
+
+The backend can be chosen per object, with to_backend(), or globally, with
+set_backend(), which decides the buffers new matrices and vectors get.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from array import array
+import Matrix as M
+import Vector as V
+import Utils
+
+BACKENDS = ("python", "numpy")
+HAS_NUMPY = np is not None
+INT64_MAX = 2**63 - 1
+
+_backend = "python"
+
+
+def set_backend(name):
+    """
+    sets the backend new matrices and vectors are created with ("python" or "numpy")
+    """
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name!r} (expected one of {BACKENDS})")
+    if name == "numpy" and not HAS_NUMPY:
+        raise ImportError("The numpy backend requires NumPy to be installed")
+    _backend = name
+
+
+def get_backend():
+    """
+    returns the backend new matrices and vectors are created with
+    """
+    return _backend
+
+
+def backend_of(A):
+    """
+    returns the backend a matrix or vector is using
+    """
+    return "numpy" if is_ndarray(_buffer(A)) else "python"
+
+
+def is_ndarray(buf):
+    """
+    returns whether buf is a NumPy array
+    """
+    return np is not None and isinstance(buf, np.ndarray)
+
+
+def active(*objs):
+    """
+    returns whether any of the matrices or vectors objs uses the numpy backend
+    """
+    if np is None:
+        return False
+    for x in objs:
+        if isinstance(_buffer(x), np.ndarray):
+            return True
+    return False
+
+
+def adopt(buf):
+    """
+    returns a newly built buffer in the form the global backend wants it
+    """
+    if _backend == "numpy" and isinstance(buf, array):
+        return _as_ndarray(buf)
+    return buf
+
+
+def _buffer(x):
+    if isinstance(x, V.Vector):
+        return x.elems
+    if isinstance(x, M.Matrix):
+        return x.data
+    return None
+
+
+def _as_ndarray(buf):
+    """
+    returns buf as a 1d ndarray, sharing memory with it unless buf is a list
+    """
+    if isinstance(buf, np.ndarray):
+        return buf
+    if isinstance(buf, array):
+        dtype = np.int64 if buf.typecode == "q" else np.float64
+        if len(buf) == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.frombuffer(buf, dtype=dtype)
+    return np.asarray(buf)
+
+
+def to_numpy(A):
+    """
+    returns a matrix as a 2d ndarray (or a vector as a 1d ndarray).
+    the result shares memory with A, except for matrices holding
+    generic entries (e.g. Fractions), which are copied
+    """
+    if np is None:
+        raise ImportError("to_numpy requires NumPy to be installed")
+    if isinstance(A, V.Vector):
+        return _as_ndarray(A.elems)
+    if not isinstance(A, M.Matrix):
+        raise TypeError("Can only convert matrices and vectors")
+    data = _as_ndarray(A.data)
+    item = data.itemsize
+    rs, cs = A.strides
+    return np.lib.stride_tricks.as_strided(data[A.offset:], shape=(A.m, A.n), strides=(rs*item, cs*item))
+
+
+def from_numpy(a, aug=0):
+    """
+    returns a 2d array as a matrix (or a 1d array as a vector) on the numpy
+    backend, sharing memory with a if it is a contiguous array of int64 or float64
+    """
+    if np is None:
+        raise ImportError("from_numpy requires NumPy to be installed")
+    a = np.asarray(a)
+    if a.dtype.kind in "biu":
+        a = a.astype(np.int64, copy=False)
+    elif a.dtype.kind == "f":
+        a = a.astype(np.float64, copy=False)
+    if a.ndim == 1:
+        return V.Vector._wrap(a)
+    if a.ndim != 2:
+        raise ValueError("Can only convert 1d and 2d arrays")
+    m, n = a.shape
+    return M.Matrix._wrap(m, n, np.ascontiguousarray(a).reshape(-1), aug=aug)
+
+
+def to_backend(A, name):
+    """
+    returns a matrix or vector on the given backend.
+    converting to numpy shares memory where possible
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name!r} (expected one of {BACKENDS})")
+    if backend_of(A) == name:
+        return A
+    if name == "numpy":
+        return from_numpy(to_numpy(A), aug=getattr(A, "aug", 0))
+    buf = Utils.make_buffer(to_numpy(A).ravel().tolist())
+    if isinstance(A, V.Vector):
+        return V.Vector._wrap(buf)
+    return M.Matrix._wrap(A.m, A.n, buf, aug=A.aug)
+
+
+def _rounded(a):
+    """
+    returns a with entries within tolerance of an integer rounded
+    """
+    r = np.round(a)
+    return np.where(np.abs(a - r) <= 1e-9, r, a) + 0.0    # + 0.0 clears negative zeros
+
+
+def _bound(a):
+    """
+    returns the largest magnitude of the entries of an int64 array,
+    or None for arrays of any other type
+    """
+    if a.dtype != np.int64:
+        return None
+    if a.size == 0:
+        return 0
+    return max(-int(a.min()), int(a.max()))
+
+
+def _may_overflow(a, b, terms=1):
+    """
+    returns whether a sum of terms products (or, with terms=0, a sum) of
+    entries of the int64 arrays a and b could overflow 64 bits
+    """
+    x, y = _bound(a), _bound(b)
+    if x is None or y is None:
+        return False
+    return (x + y if terms == 0 else terms*x*y) > INT64_MAX
+
+
+def _python(A):
+    return to_backend(A, "python")
+
+
+def add(A, B):
+    a, b = to_numpy(A), to_numpy(B)
+    if _may_overflow(a, b, 0):
+        return _python(A) + _python(B)
+    return from_numpy(a + b)
+
+
+def sub(A, B):
+    a, b = to_numpy(A), to_numpy(B)
+    if _may_overflow(a, b, 0):
+        return _python(A) - _python(B)
+    return from_numpy(a - b)
+
+
+def mul(A, B):
+    a, b = to_numpy(A), to_numpy(B)
+    if _may_overflow(a, b, a.shape[-1]):
+        return _python(A) * _python(B)
+    return from_numpy(a @ b)
+
+
+def times(v, k):
+    a = to_numpy(v)
+    if isinstance(k, int) and _bound(a) is not None and _bound(a)*abs(k) > INT64_MAX:
+        return _python(v).times(k)
+    return from_numpy(a * k)
+
+
+def dot(u, v):
+    a, b = to_numpy(u), to_numpy(v)
+    if _may_overflow(a, b, a.shape[-1]):
+        return _python(u).dot(_python(v))
+    return np.dot(a, b).item()
+
+
+def trans(A):
+    if isinstance(A, V.Vector):
+        return from_numpy(to_numpy(A).reshape(1, -1).copy())
+    return from_numpy(np.ascontiguousarray(to_numpy(A).T))
+
+
+def det(A):
+    det = np.linalg.det(to_numpy(A)).item()
+    return (round(det) if Utils.is_integer(det) else det)
+
+
+def inverse(A):
+    try:
+        inv = np.linalg.inv(to_numpy(A))
+    except np.linalg.LinAlgError:
+        raise ValueError("Matrix is not invertible") from None
+    return from_numpy(_rounded(inv))
+
+
+def solve(A, b):
+    try:
+        x = np.linalg.solve(to_numpy(A), to_numpy(b))
+    except np.linalg.LinAlgError:
+        raise ValueError("Matrix is not invertible") from None
+    return from_numpy(_rounded(x))
+
+
+def solve_triangular(A, b, lower=False, unit_diagonal=False):
+    """
+    substitution through the lower (or upper) triangle of A, a row at a
+    time, each row's update being one vectorized product
+    """
+    T = np.asarray(to_numpy(A), dtype=np.float64)
+    x = np.array(to_numpy(b), dtype=np.float64)
+    n = A.n
+    for i in (range(n) if lower else range(n-1, -1, -1)):
+        if lower:
+            x[i] -= T[i, :i] @ x[:i]
+        else:
+            x[i] -= T[i, i+1:] @ x[i+1:]
+        if not unit_diagonal:
+            x[i] /= T[i, i]
+    return from_numpy(_rounded(x))
+
+
+def _ref(U, E):
+    """
+    gaussian elimination on the float array U in place, applying every
+    row operation to E as well (if given). returns the determinant scaling factor
+    """
+    m, n = U.shape
+    d = 1
+    for j in range(min(m, n)):
+        # ensure a non-zero pivot
+        if Utils.is_zero(U[j, j]):
+            below = np.nonzero(np.abs(U[j+1:, j]) > 1e-9)[0]
+            if len(below) == 0:
+                continue
+            i = j + 1 + below[0]
+            U[[i, j]] = U[[j, i]]
+            if E is not None:
+                E[[i, j]] = E[[j, i]]
+            d = -d
+
+        # make all non-pivot points below j = 0
+        s = -U[j+1:, j] / U[j, j]
+        U[j+1:, j:] += np.outer(s, U[j, j:])
+        U[j+1:, j] = 0
+        if E is not None:
+            E[j+1:] += np.outer(s, E[j])
+    return d
+
+
+def ref(A, elim_matrix=False):
+    U = to_numpy(A).astype(np.float64)
+    E = np.eye(A.m) if elim_matrix else None
+    d = _ref(U, E)
+    return (from_numpy(_rounded(U), aug=A.aug), (from_numpy(E) if elim_matrix else None), d)
+
+
+def rref(A, elim_matrix=False):
+    U = to_numpy(A).astype(np.float64)
+    E = np.eye(A.m) if elim_matrix else None
+    _ref(U, E)
+    m, n = U.shape
+
+    # loop over columns backwards: find pivot, scale to 1, then subtract from upper rows
+    for j in range(min(m, n))[::-1]:
+        pivot = U[j, j]
+        if not Utils.is_zero(pivot):
+            U[j] /= pivot
+            U[j, j] = 1
+            s = U[:j, j].copy()
+            U[:j] -= np.outer(s, U[j])
+            U[:j, j] = 0
+            if E is not None:
+                E[j] /= pivot
+                E[:j] -= np.outer(s, E[j])
+    return from_numpy(_rounded(U), aug=A.aug), (from_numpy(E) if elim_matrix else None)
@@ -0,0 +1,260 @@
+"""
+Batches of many small matrices of the same shape.
+
+A MatrixBatch keeps N m by n matrices as a struct of arrays: one buffer in
+which each entry position (i, j) holds that entry for every matrix of the
+batch, side by side. Batched operations then run once per entry position,
+each as a single pass over the batch, instead of once per matrix. 2x2, 3x3
+and 4x4 determinants and inverses use closed forms.
+"""
+
+import operator
+import Matrix as M
+import Vector as V
+import LU
+import Utils
+
+
+class MatrixBatch:
+    """
+    N matrices of the same shape.
+
+        N = number of matrices
+        m = number of rows of each matrix
+        n = number of columns of each matrix
+        data = flat buffer, where entry (i, j) of matrix b is data[(i*n + j)*N + b]
+    """
+
+    __slots__ = ("N", "m", "n", "data")
+
+    def __init__(self, m, n, matrices):
+        mats = [(A if isinstance(A, M.Matrix) else M.Matrix(m, n, A)) for A in matrices]
+        for A in mats:
+            if A.m != m or A.n != n:
+                raise ValueError(f"Matrices of a batch must all be {m} by {n} (got {A.m} by {A.n})")
+        flats = [A._flat() for A in mats]
+        self.N = len(mats)
+        self.m = m
+        self.n = n
+        self.data = Utils.make_buffer([flat[e] for e in range(m*n) for flat in flats])
+
+
+    @classmethod
+    def _wrap(cls, N, m, n, comps):
+        """
+        returns the batch with the list of m*n component sequences comps,
+        each holding one entry position across the batch. no validation
+        """
+        B = cls.__new__(cls)
+        B.N, B.m, B.n = N, m, n
+        B.data = Utils.make_buffer([x for comp in comps for x in comp])
+        return B
+
+
+    def _components(self):
+        """
+        returns the list of m*n component buffers, in row-major entry order
+        """
+        N = self.N
+        return [self.data[e*N:(e+1)*N] for e in range(self.m*self.n)]
+
+
+    def __len__(self):
+        return self.N
+
+
+    def __getitem__(self, b):
+        """
+        returns matrix b of the batch
+        """
+        if b < 0:
+            b += self.N
+        if not 0 <= b < self.N:
+            raise IndexError("index out of range")
+        return M.Matrix._wrap(self.m, self.n, Utils.make_buffer(self.data[b::self.N]))
+
+
+    def matrices(self):
+        """
+        returns the list of matrices of the batch
+        """
+        return [self[b] for b in range(self.N)]
+
+
+    def __eq__(self, B):
+        if not isinstance(B, MatrixBatch):
+            return False
+        if (self.N, self.m, self.n) != (B.N, B.m, B.n):
+            return False
+        return all(x == y for x, y in zip(self.data, B.data))
+
+
+    def __ne__(self, B):
+        return not (self == B)
+
+
+    def __str__(self):
+        return "\n".join(str(A) for A in self.matrices())
+
+
+    def __mul__(self, B):
+        """
+        multiplies the matrices of the batch one by one with those of a batch
+        of the same size, or all with the same matrix
+        """
+        if isinstance(B, M.Matrix):
+            if self.n != B.m:
+                raise ValueError("Width of left matrix must match height of right matrix")
+            flat = B._flat()
+            b = [[flat[e]] * self.N for e in range(B.m*B.n)]
+            p = B.n
+        elif isinstance(B, MatrixBatch):
+            if self.N != B.N:
+                raise ValueError("Can only multiply batches of the same size")
+            if self.n != B.m:
+                raise ValueError("Width of left matrix must match height of right matrix")
+            b = B._components()
+            p = B.n
+        else:
+            raise TypeError("Can only multiply a batch by a batch or a matrix")
+
+        a = self._components()
+        m, n = self.m, self.n
+        mul, add = operator.mul, operator.add
+        comps = []
+        for i in range(m):
+            for j in range(p):
+                acc = list(map(mul, a[i*n], b[j])) if n else [0] * self.N
+                for k in range(1, n):
+                    acc = list(map(add, acc, map(mul, a[i*n + k], b[k*p + j])))
+                comps.append(acc)
+        return MatrixBatch._wrap(self.N, m, p, comps)
+
+
+    def matvec(self, xs):
+        """
+        returns the list of products of each matrix of the batch with the
+        corresponding vector of the list xs, or with the single vector xs
+        """
+        if isinstance(xs, V.Vector):
+            if xs.n != self.n:
+                raise ValueError("Size of vector must match width of matrix")
+            x = [[e] * self.N for e in xs.elems]
+        else:
+            if len(xs) != self.N:
+                raise ValueError("Need one vector per matrix of the batch")
+            for v in xs:
+                if v.n != self.n:
+                    raise ValueError("Size of vector must match width of matrix")
+            x = [[v.elems[k] for v in xs] for k in range(self.n)]
+
+        a = self._components()
+        n = self.n
+        mul, add = operator.mul, operator.add
+        ys = []
+        for i in range(self.m):
+            acc = list(map(mul, a[i*n], x[0])) if n else [0] * self.N
+            for k in range(1, n):
+                acc = list(map(add, acc, map(mul, a[i*n + k], x[k])))
+            ys.append(acc)
+        return [V.Vector._wrap(Utils.make_buffer([y[b] for y in ys])) for b in range(self.N)]
+
+
+    def det(self):
+        """
+        returns the list of determinants of the matrices of the batch
+        """
+        if self.m != self.n:
+            raise ValueError("Determinant can only be calculated for square matrices")
+        if self.n in _DET:
+            dets = map(_DET[self.n], *self._components())
+        else:
+            dets = (LU.lu(A).det() for A in self.matrices())
+        return [(round(d) if Utils.is_integer(d) else d) for d in dets]
+
+
+    def inverse(self):
+        """
+        returns the batch of inverses of the matrices of the batch.
+        throws an error if any of them is singular
+        """
+        if self.m != self.n:
+            raise ValueError("Non-square matrices are not invertible")
+        n = self.n
+        if n not in _INV:
+            return MatrixBatch(n, n, [M.inverse(A) for A in self.matrices()])
+
+        invs = list(map(_INV[n], *self._components()))
+        for b, inv in enumerate(invs):
+            if inv is None:
+                raise ValueError(f"Matrix {b} of the batch is not invertible")
+        comps = [[(round(x) if Utils.is_integer(x) else x) for x in comp] for comp in zip(*invs)]
+        return MatrixBatch._wrap(self.N, n, n, comps)
+
+
+def _det1(a):
+    return a
+
+
+def _det2(a, b, c, d):
+    return a*d - b*c
+
+
+def _det3(a, b, c, d, e, f, g, h, i):
+    return a*(e*i - f*h) - b*(d*i - f*g) + c*(d*h - e*g)
+
+
+def _det4(a00, a01, a02, a03, a10, a11, a12, a13, a20, a21, a22, a23, a30, a31, a32, a33):
+    s0, s1, s2 = a00*a11 - a10*a01, a00*a12 - a10*a02, a00*a13 - a10*a03
+    s3, s4, s5 = a01*a12 - a11*a02, a01*a13 - a11*a03, a02*a13 - a12*a03
+    c5, c4, c3 = a22*a33 - a32*a23, a21*a33 - a31*a23, a21*a32 - a31*a22
+    c2, c1, c0 = a20*a33 - a30*a23, a20*a32 - a30*a22, a20*a31 - a30*a21
+    return s0*c5 - s1*c4 + s2*c3 + s3*c2 - s4*c1 + s5*c0
+
+
+def _inv1(a):
+    if Utils.is_zero(a):
+        return None
+    return (1/a,)
+
+
+def _inv2(a, b, c, d):
+    det = a*d - b*c
+    if Utils.is_zero(det):
+        return None
+    k = 1/det
+    return (d*k, -b*k, -c*k, a*k)
+
+
+def _inv3(a, b, c, d, e, f, g, h, i):
+    A, B, C = e*i - f*h, f*g - d*i, d*h - e*g
+    det = a*A + b*B + c*C
+    if Utils.is_zero(det):
+        return None
+    k = 1/det
+    return (A*k, (c*h - b*i)*k, (b*f - c*e)*k,
+            B*k, (a*i - c*g)*k, (c*d - a*f)*k,
+            C*k, (b*g - a*h)*k, (a*e - b*d)*k)
+
+
+def _inv4(a00, a01, a02, a03, a10, a11, a12, a13, a20, a21, a22, a23, a30, a31, a32, a33):
+    s0, s1, s2 = a00*a11 - a10*a01, a00*a12 - a10*a02, a00*a13 - a10*a03
+    s3, s4, s5 = a01*a12 - a11*a02, a01*a13 - a11*a03, a02*a13 - a12*a03
+    c5, c4, c3 = a22*a33 - a32*a23, a21*a33 - a31*a23, a21*a32 - a31*a22
+    c2, c1, c0 = a20*a33 - a30*a23, a20*a32 - a30*a22, a20*a31 - a30*a21
+    det = s0*c5 - s1*c4 + s2*c3 + s3*c2 - s4*c1 + s5*c0
+    if Utils.is_zero(det):
+        return None
+    k = 1/det
+    return (( a11*c5 - a12*c4 + a13*c3)*k, (-a01*c5 + a02*c4 - a03*c3)*k,
+            ( a31*s5 - a32*s4 + a33*s3)*k, (-a21*s5 + a22*s4 - a23*s3)*k,
+            (-a10*c5 + a12*c2 - a13*c1)*k, ( a00*c5 - a02*c2 + a03*c1)*k,
+            (-a30*s5 + a32*s2 - a33*s1)*k, ( a20*s5 - a22*s2 + a23*s1)*k,
+            ( a10*c4 - a11*c2 + a13*c0)*k, (-a00*c4 + a01*c2 - a03*c0)*k,
+            ( a30*s4 - a31*s2 + a33*s0)*k, (-a20*s4 + a21*s2 - a23*s0)*k,
+            (-a10*c3 + a11*c1 - a12*c0)*k, ( a00*c3 - a01*c1 + a02*c0)*k,
+            (-a30*s3 + a31*s1 - a32*s0)*k, ( a20*s3 - a21*s1 + a22*s0)*k)
+
+
+_DET = {1: _det1, 2: _det2, 3: _det3, 4: _det4}
+_INV = {1: _inv1, 2: _inv2, 3: _inv3, 4: _inv4}
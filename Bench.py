@@ -0,0 +1,263 @@
+"""
+Benchmarks of the public operations over a sweep of sizes.
+
+Each operation is timed on square (n by n) and, where it applies,
+rectangular (n by 2n) matrices for each n in the sweep. For each one the
+report gives:
+    time = best time of one call, in seconds (the minimum over the repeats,
+           which is the least noisy estimate)
+    median = median time of one call over the repeats
+    throughput = work done per second (floating point operations, or entries
+                 touched for operations that only move data)
+    peak = peak memory allocated during one call, in bytes
+
+Results can be saved as JSON, and compared against a saved baseline: any
+operation more than threshold (a fraction) slower than in the baseline is a
+regression, and the script exits with status 1.
+
+    python Bench.py                                  # report only
+    python Bench.py --json base.json                 # save a baseline
+    python Bench.py --baseline base.json             # compare against it
+    python Bench.py --sizes 16 64 --only mul det     # a subset
+"""
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import Matrix as M
+import Vector as V
+import Cache
+
+SIZES = [8, 32, 64, 128]
+REPEAT = 5
+MIN_TIME = 0.05     # seconds per timing sample: short calls are looped to fill it
+THRESHOLD = 0.10
+
+
+def _matrix(m, n, seed):
+    """
+    returns an m by n matrix of random floats, diagonally dominant so square
+    ones are well conditioned
+    """
+    rng = random.Random(seed)
+    rows = [[rng.uniform(-1, 1) + (n if i == j else 0) for j in range(n)] for i in range(m)]
+    return M.Matrix(m, n, rows)
+
+
+def _vector(n, seed):
+    rng = random.Random(seed)
+    return V.Vector(n, [rng.uniform(-1, 1) for _ in range(n)])
+
+
+class Benchmark:
+    """
+    An operation to time.
+
+        name = name it is reported under
+        setup = function of (m, n) returning the arguments of a call
+        call = function timed, called on the arguments
+        work = function of (m, n) returning the work of one call
+        unit = unit of the work ("flop" or "entry")
+        square = whether it only applies to square matrices
+    """
+
+    def __init__(self, name, setup, call, work, unit="flop", square=False):
+        self.name = name
+        self.setup = setup
+        self.call = call
+        self.work = work
+        self.unit = unit
+        self.square = square
+
+
+BENCHMARKS = [
+    Benchmark("dot", lambda m, n: (_vector(m*n, 1), _vector(m*n, 2)),
+              lambda u, v: u.dot(v), lambda m, n: 2*m*n),
+    Benchmark("mul", lambda m, n: (_matrix(m, n, 1), _matrix(n, m, 2)),
+              lambda A, B: A * B, lambda m, n: 2*m*n*m),
+    Benchmark("trans", lambda m, n: (_matrix(m, n, 1),),
+              M.trans, lambda m, n: m*n, "entry"),
+    Benchmark("ref", lambda m, n: (_matrix(m, n, 1),),
+              M.ref, lambda m, n: 2*m*m*n),
+    Benchmark("rref", lambda m, n: (_matrix(m, n, 1),),
+              M.rref, lambda m, n: 2*m*m*n),
+    Benchmark("inverse", lambda m, n: (_matrix(n, n, 1),),
+              M.inverse, lambda m, n: 2*n**3, square=True),
+    Benchmark("det", lambda m, n: (_matrix(n, n, 1),),
+              lambda A: A.det(), lambda m, n: 2*n**3 // 3, square=True),
+    Benchmark("augment", lambda m, n: (_matrix(m, n, 1), _matrix(m, n, 2)),
+              M.augment, lambda m, n: 2*m*n, "entry"),
+    Benchmark("submatrix", lambda m, n: (_matrix(m, n, 1), (m // 4, n // 4), (m // 2, n // 2)),
+              M.Matrix.submatrix, lambda m, n: (m // 2)*(n // 2), "entry"),
+    Benchmark("copy", lambda m, n: (_matrix(m, n, 1),),
+              lambda A: A.copy(), lambda m, n: m*n, "entry")
+]
+
+
+def _shapes(b, sizes):
+    """
+    returns the (m, n) shapes benchmark b runs at
+    """
+    shapes = [(n, n) for n in sizes]
+    if not b.square:
+        shapes += [(n, 2*n) for n in sizes]
+    return shapes
+
+
+def _time(call, args, repeat, min_time):
+    """
+    returns the times of one call over repeat samples, each looping the call
+    enough times to last at least min_time
+    """
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            call(*args)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1 << 20:
+            break
+        loops *= 2 if elapsed == 0 else max(2, int(min_time / elapsed * 1.2))
+    times = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            call(*args)
+        times.append((time.perf_counter() - start) / loops)
+    return times
+
+
+def _peak(call, args):
+    """
+    returns the peak memory allocated (in bytes) during one call
+    """
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        call(*args)
+        return tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+
+def run(names=None, sizes=None, repeat=REPEAT, min_time=MIN_TIME):
+    """
+    runs the benchmarks named in names (all of them if None) at the given
+    sizes, returning the results as a dictionary. caching of derived
+    quantities is off meanwhile, so repeated calls measure the computation
+    """
+    sizes = sizes or SIZES
+    known = {b.name for b in BENCHMARKS}
+    unknown = set(names or []) - known
+    if unknown:
+        raise ValueError(f"Unknown benchmarks {sorted(unknown)} (expected some of {sorted(known)})")
+
+    results = {}
+    enabled, Cache.ENABLED = Cache.ENABLED, False
+    try:
+        for b in BENCHMARKS:
+            if names and b.name not in names:
+                continue
+            for m, n in _shapes(b, sizes):
+                args = b.setup(m, n)
+                times = _time(b.call, args, repeat, min_time)
+                best = min(times)
+                results[f"{b.name} {m}x{n}"] = {
+                    "name": b.name,
+                    "shape": [m, n],
+                    "time": best,
+                    "median": statistics.median(times),
+                    "throughput": b.work(m, n) / best if best else float("inf"),
+                    "unit": b.unit,
+                    "peak": _peak(b.call, args)
+                }
+    finally:
+        Cache.ENABLED = enabled
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": repeat
+        },
+        "results": results
+    }
+
+
+def compare(current, baseline, threshold=THRESHOLD):
+    """
+    returns the regressions of the results current against baseline, as a
+    list of (key, baseline time, current time, ratio) for each benchmark
+    present in both whose time grew by more than the fraction threshold
+    """
+    regressions = []
+    old = baseline["results"]
+    for key, r in current["results"].items():
+        if key in old and old[key]["time"] > 0:
+            ratio = r["time"] / old[key]["time"]
+            if ratio > 1 + threshold:
+                regressions.append((key, old[key]["time"], r["time"], ratio))
+    return regressions
+
+
+def _scaled(x, unit):
+    for prefix, scale in (("G", 1e9), ("M", 1e6), ("k", 1e3)):
+        if x >= scale:
+            return f"{x / scale:.2f} {prefix}{unit}"
+    return f"{x:.2f} {unit}"
+
+
+def report(results, baseline=None):
+    """
+    returns the results as a text table, with the ratio to baseline (if
+    given) of each time
+    """
+    lines = [f"{'benchmark':<22}{'time':>12}{'median':>12}{'throughput':>18}{'peak':>12}" + ("   vs base" if baseline else "")]
+    for key, r in results["results"].items():
+        line = (f"{key:<22}{r['time'] * 1e3:>10.3f}ms{r['median'] * 1e3:>10.3f}ms"
+                f"{_scaled(r['throughput'], r['unit'] + '/s'):>18}{_scaled(r['peak'], 'B'):>12}")
+        if baseline:
+            old = baseline["results"].get(key)
+            line += f"{r['time'] / old['time']:>9.2f}x" if old and old["time"] > 0 else "        --"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the library over a sweep of sizes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="sizes n to sweep")
+    parser.add_argument("--only", nargs="+", help="names of the benchmarks to run")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="timing samples per benchmark")
+    parser.add_argument("--json", help="file to save the results to")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="slowdown (a fraction) counted as a regression")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    results = run(args.only, args.sizes, args.repeat)
+    print(report(results, baseline))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+        for key, old, new, ratio in regressions:
+            print(f"\t{key}: {old * 1e3:.3f}ms -> {new * 1e3:.3f}ms ({ratio:.2f}x)")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
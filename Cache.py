@@ -0,0 +1,128 @@
+"""
+Caching of quantities derived from matrices: transposes, determinants, LU and QR
+factorizations, ranks, inverses and eigendecompositions.
+
+Each matrix keeps the quantities computed from it, tagged with its version:
+a counter that every mutator (swap_rows_ip, swap_cols_ip, row_add,
+row_scale, edit_entry, in-place operators and out= writes, including those
+through its row and column vectors) bumps, for the matrix and every view
+sharing its data. A cached quantity is only reused while the version it was
+computed at is current. The elements of row and column vectors are
+read-only, so they can only be written through the vector's methods; writes
+made directly to data must be followed by invalidate().
+
+Frozen matrices (see Matrix.freeze) never change, so their quantities go in
+one global LRU instead, keyed on their content: equal frozen matrices share
+them, and they outlive the matrix. The LRU is bounded by the total size of
+what it holds (the number of entries of each cached matrix or factorization,
+1 for a scalar), evicting the least recently used quantities first.
+
+    ENABLED = whether derived quantities are cached at all
+    MAX_SIZE = budget of the global LRU, in entries
+"""
+
+from collections import OrderedDict
+
+ENABLED = True
+MAX_SIZE = 1 << 22
+
+
+class LRU:
+    """
+    A least-recently-used cache bounded by the total size of its values.
+
+        max_size = largest total size held
+        size = total size held
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self._entries = OrderedDict()    # key -> (value, size), least recently used first
+
+
+    def __len__(self):
+        return len(self._entries)
+
+
+    def __contains__(self, key):
+        return key in self._entries
+
+
+    def get(self, key, default=None):
+        """
+        returns the value cached under key (marking it as just used), or default
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        self._entries.move_to_end(key)
+        return entry[0]
+
+
+    def put(self, key, value, size):
+        """
+        caches value, of the given size, under key, evicting the least recently
+        used values as needed. values larger than the whole budget are not cached
+        """
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= old[1]
+        if size > self.max_size:
+            return
+        self._entries[key] = (value, size)
+        self.size += size
+        self.evict()
+
+
+    def evict(self):
+        """
+        drops the least recently used values until the cache is within budget
+        """
+        while self.size > self.max_size:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.size -= size
+
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+
+CACHE = LRU(MAX_SIZE)
+
+
+def set_max_size(size):
+    """
+    sets the budget of the global LRU, in entries, evicting what no longer fits
+    """
+    global MAX_SIZE
+    MAX_SIZE = CACHE.max_size = size
+    CACHE.evict()
+
+
+def clear():
+    """
+    empties the global LRU
+    """
+    CACHE.clear()
+
+
+def size_of(value):
+    """
+    returns the size a cached value counts for: its number of entries for a
+    matrix or factorization, otherwise 1
+    """
+    if hasattr(value, "m") and hasattr(value, "n"):
+        return max(value.m * value.n, 1)
+    if hasattr(value, "lu"):
+        return max(len(value.lu), 1)
+    return 1
+
+
+def content_key(A, backend):
+    """
+    returns a key identifying the shape, entry type, backend and entries of
+    the matrix A
+    """
+    return (A.aug, backend, A.fingerprint())
@@ -0,0 +1,522 @@
+"""
+Eigenvalues and eigenvectors.
+
+eig and eigvals solve the whole eigenproblem of a dense square matrix A in
+two phases. A is first reduced to upper Hessenberg form H = Q^T*A*Q by
+Householder reflections, once, in O(n^3). QR iteration then drives H to
+upper triangular (Schur) form: on a Hessenberg matrix each shifted QR sweep
+costs only O(n^2), and with Wilkinson shifts the last subdiagonal entry
+vanishes in a few sweeps, deflating an eigenvalue off the bottom. The
+sweeps run in complex arithmetic, so the complex eigenvalues of a real
+matrix come out as conjugate pairs.
+
+A symmetric A reduces to tridiagonal form instead, where an implicit QR
+sweep costs O(n). Its eigenvalues are real, and its eigenvectors real and
+orthonormal.
+
+power, inverse_power and lanczos find a few eigenpairs of a large matrix.
+They only need products of A with vectors (inverse_power solves with a
+factorization of A - shift*I instead), so A can be a dense Matrix, a sparse
+matrix, or any linear operator (see Iterative). Finding k eigenpairs this
+way costs O(k * nnz * iterations) rather than O(n^3). Each returns a tuple
+containing:
+    value(s) = the eigenvalue found (lanczos: a list of them)
+    vector(s) = its unit eigenvector (lanczos: a matrix with them as columns)
+    converged = whether the tolerance was met
+    iterations = number of products with A (or solves) done
+
+    power         = the eigenvalue of largest magnitude
+    inverse_power = the eigenvalue nearest a shift
+    lanczos       = the k largest, smallest or largest-magnitude eigenvalues
+                    of a symmetric A
+"""
+
+import cmath
+import math
+import operator
+import random
+import sys
+from array import array
+import Matrix as M
+import Vector as V
+import LU
+import Sparse
+import Iterative
+import Utils
+
+EPS = sys.float_info.epsilon
+MAX_SWEEPS = 30     # QR sweeps allowed per eigenvalue before giving up
+CHECK_EVERY = 5     # Lanczos steps between convergence checks
+
+
+def _rows(A):
+    """
+    returns the rows of a square matrix A as lists of floats
+    """
+    if not isinstance(A, M.Matrix):
+        raise TypeError("Can only find the eigenvalues of matrices")
+    if A.m != A.n:
+        raise ValueError("Eigenvalues require a square matrix")
+    return [[float(x) for x in A._get(A._row_slice(i))] for i in range(A.m)]
+
+
+def _is_symmetric(rows):
+    scale = max((abs(x) for row in rows for x in row), default=0)
+    tol = 1e-12 * scale
+    n = len(rows)
+    return all(abs(rows[i][j] - rows[j][i]) <= tol for i in range(n) for j in range(i))
+
+
+def _identity(n):
+    return [[float(i == j) for j in range(n)] for i in range(n)]
+
+
+def _hessenberg(H, Z=None):
+    """
+    reduces the square list of rows H to upper Hessenberg form in place, by
+    Householder reflections P_k, applying each to the columns of Z as well
+    (so A = Z*H*Z^T if Z starts as the identity)
+    """
+    n = len(H)
+    for k in range(n - 2):
+        x = [H[i][k] for i in range(k+1, n)]
+        if not any(x[1:]):
+            continue
+        alpha = -math.copysign(math.hypot(*x), x[0])
+        v = x
+        v[0] -= alpha
+        f = 2 / Iterative._dot(v, v)
+
+        # H <- P*H: rows k+1 on change by multiples of w = v^T*H
+        w = [0.0] * (n - k)
+        for vi, row in zip(v, H[k+1:]):
+            w = list(Utils.axpy(vi, row[k:], w))
+        for vi, row in zip(v, H[k+1:]):
+            row[k:] = Utils.axpy(-f*vi, w, row[k:])
+        for i in range(k+2, n):
+            H[i][k] = 0.0
+
+        # H <- H*P (and Z <- Z*P): columns k+1 on of every row
+        for row in (H + Z) if Z is not None else H:
+            s = f * sum(map(operator.mul, v, row[k+1:]))
+            if s:
+                row[k+1:] = Utils.axpy(-s, v, row[k+1:])
+
+
+def _givens(x, y):
+    """
+    returns (c, s), c real, s.t. the rotation [[c, s], [-conj(s), c]] takes
+    the complex pair (x, y) to (r, 0)
+    """
+    ax = abs(x)
+    if ax == 0:
+        return 0.0, 1.0
+    h = math.hypot(ax, abs(y))
+    return ax / h, (x / ax) * y.conjugate() / h
+
+
+def _schur(H, Z=None):
+    """
+    reduces the upper Hessenberg list of rows H to upper triangular form in
+    place by shifted QR sweeps, applying each rotation to the columns of Z as
+    well. returns the eigenvalues, the diagonal of the result
+    """
+    n = len(H)
+    norm = max((abs(x) for row in H for x in row), default=0) or 1.0
+    hi = n - 1
+    sweeps = since_deflation = 0
+    while hi > 0:
+        # find the unreduced block lo..hi at the bottom
+        lo = hi
+        while lo > 0:
+            s = abs(H[lo-1][lo-1]) + abs(H[lo][lo])
+            if abs(H[lo][lo-1]) <= EPS * (s or norm):
+                H[lo][lo-1] = 0.0
+                break
+            lo -= 1
+        if lo == hi:
+            hi -= 1
+            since_deflation = 0
+            continue
+        if sweeps >= MAX_SWEEPS * n:
+            raise ValueError("QR iteration did not converge")
+        sweeps += 1
+        since_deflation += 1
+
+        # Wilkinson shift: the eigenvalue of the trailing 2 by 2 block nearest its last entry,
+        # with an exceptional shift now and then to break cycles
+        a, b, c, d = H[hi-1][hi-1], H[hi-1][hi], H[hi][hi-1], H[hi][hi]
+        if since_deflation % 10 == 0:
+            mu = d + abs(c)
+        else:
+            mean = (a + d) / 2
+            root = cmath.sqrt(((a - d) / 2)**2 + b*c)
+            mu = mean + root if abs(mean + root - d) <= abs(mean - root - d) else mean - root
+
+        # one QR sweep of the block: H - mu*I = G^H*R, then H <- R*G^H + mu*I
+        for k in range(lo, hi + 1):
+            H[k][k] -= mu
+        rotations = []
+        for k in range(lo, hi):
+            cs, sn = _givens(H[k][k], H[k+1][k])
+            top, bottom = H[k], H[k+1]
+            for j in range(k, n):
+                x, y = top[j], bottom[j]
+                top[j] = cs*x + sn*y
+                bottom[j] = cs*y - sn.conjugate()*x
+            rotations.append((cs, sn))
+        for k, (cs, sn) in enumerate(rotations, lo):
+            for row in H[:k+2] + (Z or []):
+                x, y = row[k], row[k+1]
+                row[k] = cs*x + sn.conjugate()*y
+                row[k+1] = cs*y - sn*x
+        for k in range(lo, hi + 1):
+            H[k][k] += mu
+    return [H[k][k] for k in range(n)]
+
+
+def _tridiagonal_qr(d, e, Z=None):
+    """
+    finds the eigenvalues of the symmetric tridiagonal matrix with diagonal d
+    and off-diagonal e, in place in d, by implicit QR sweeps with Wilkinson
+    shifts, applying each rotation to the columns of Z as well
+    """
+    n = len(d)
+    hi = n - 1
+    sweeps = 0
+    while hi > 0:
+        lo = hi
+        while lo > 0 and abs(e[lo-1]) > EPS * (abs(d[lo-1]) + abs(d[lo])):
+            lo -= 1
+        if lo > 0:
+            e[lo-1] = 0.0
+        if lo == hi:
+            hi -= 1
+            continue
+        if sweeps >= MAX_SWEEPS * n:
+            raise ValueError("QR iteration did not converge")
+        sweeps += 1
+
+        delta = (d[hi-1] - d[hi]) / 2
+        mu = d[hi] - e[hi-1]**2 / (delta + math.copysign(math.hypot(delta, e[hi-1]), delta))
+
+        # chase the bulge made by the first rotation down the block
+        x, z = d[lo] - mu, e[lo]
+        for k in range(lo, hi):
+            r = math.hypot(x, z)
+            c, s = (x / r, z / r) if r else (1.0, 0.0)
+            if k > lo:
+                e[k-1] = r
+            a, b, g = d[k], d[k+1], e[k]
+            d[k] = c*c*a + 2*c*s*g + s*s*b
+            d[k+1] = s*s*a - 2*c*s*g + c*c*b
+            e[k] = c*s*(b - a) + (c*c - s*s)*g
+            if k < hi - 1:
+                x, z = e[k], s*e[k+1]
+                e[k+1] *= c
+            if Z is not None:
+                for row in Z:
+                    p, q = row[k], row[k+1]
+                    row[k] = c*p + s*q
+                    row[k+1] = c*q - s*p
+    return d
+
+
+def _clean(x):
+    """
+    returns x rounded if within tolerance of an integer, and complex x with a
+    negligible imaginary part as a float
+    """
+    if isinstance(x, complex):
+        if abs(x.imag) > 1e-9 * max(1.0, abs(x.real)):
+            return complex(_clean(x.real), _clean(x.imag))
+        x = x.real
+    return (round(x) if Utils.is_integer(x) else x)
+
+
+def _unit(v):
+    """
+    returns v scaled to a magnitude of 1, with its largest entry made real
+    and positive
+    """
+    big = max(v, key=abs, default=0)
+    if big == 0:
+        return v
+    f = (abs(big) / big) / math.sqrt(sum(abs(x)**2 for x in v))
+    return [x * f for x in v]
+
+
+def _from_cols(cols, n):
+    """
+    returns the matrix with the given list of columns (each of size n)
+    """
+    flat = [_clean(col[i]) for i in range(n) for col in cols]
+    return M.Matrix._wrap(n, len(cols), Utils.make_buffer(flat))
+
+
+def _symmetric(rows, vectors):
+    """
+    returns the eigenvalues, in ascending order, and the eigenvectors (a list
+    of columns, or None) of a symmetric matrix
+    """
+    n = len(rows)
+    Z = _identity(n) if vectors else None
+    _hessenberg(rows, Z)
+    d = [rows[i][i] for i in range(n)]
+    e = [rows[i+1][i] for i in range(n - 1)]
+    _tridiagonal_qr(d, e, Z)
+    order = sorted(range(n), key=d.__getitem__)
+    values = [_clean(d[i]) for i in order]
+    if not vectors:
+        return values, None
+    return values, [_unit([row[i] for row in Z]) for i in order]
+
+
+def _general(rows, vectors):
+    """
+    returns the eigenvalues, ordered by real then imaginary part, and the
+    eigenvectors (a list of columns, or None) of a matrix
+    """
+    n = len(rows)
+    Z = _identity(n) if vectors else None
+    _hessenberg(rows, Z)
+    T = rows
+    values = _schur(T, Z)
+    # the two values of a conjugate pair have real parts equal only to rounding
+    order = sorted(range(n), key=lambda i: (round(values[i].real, 9), values[i].imag))
+    if not vectors:
+        return [_clean(values[i]) for i in order], None
+
+    # eigenvectors of the triangular T by back substitution, mapped back through Z
+    small = EPS * (max((abs(x) for row in T for x in row), default=0) or 1.0)
+    cols = []
+    for k in order:
+        lam = T[k][k]
+        x = [0.0] * (k + 1)
+        x[k] = 1.0
+        for i in range(k - 1, -1, -1):
+            s = sum(T[i][j] * x[j] for j in range(i + 1, k + 1))
+            d = T[i][i] - lam
+            x[i] = -s / (d if abs(d) > small else small)
+        cols.append(_unit([sum(map(operator.mul, row, x)) for row in Z]))
+    return [_clean(values[i]) for i in order], cols
+
+
+def _decompose(A, symmetric, vectors):
+    rows = _rows(A)
+    if symmetric is None:
+        symmetric = _is_symmetric(rows)
+    solve = _symmetric if symmetric else _general
+    return solve(rows, vectors)
+
+
+def eigvals(A, symmetric=None):
+    """
+    returns the eigenvalues of a square matrix A as a list, complex ones as
+    complex numbers: ascending for a symmetric A, otherwise ordered by real
+    then imaginary part. symmetric says whether to treat A as symmetric (by
+    default, whether it is)
+    """
+    if isinstance(A, M.Matrix):
+        return list(A._cached(("eigvals", symmetric), lambda: _decompose(A, symmetric, False)[0]))
+    return _decompose(A, symmetric, False)[0]
+
+
+def eig(A, symmetric=None):
+    """
+    returns the eigenvalues of a square matrix A (as eigvals does) and a
+    matrix whose columns are the corresponding unit eigenvectors, as a tuple.
+    eigenvectors of a symmetric A are real and orthonormal
+    """
+    def compute():
+        values, cols = _decompose(A, symmetric, True)
+        return values, _from_cols(cols, A.n)
+
+    if isinstance(A, M.Matrix):
+        values, vectors = A._cached(("eig", symmetric), compute)
+        return list(values), vectors.copy()
+    return compute()
+
+
+def _operator(A):
+    """
+    returns a function computing the product of a square A with a list, as a
+    list, and the size of A
+    """
+    if not all(hasattr(A, attr) for attr in ("m", "n", "__mul__")):
+        raise TypeError("Need a matrix or linear operator")
+    if A.m != A.n:
+        raise ValueError("Eigenvalues require a square matrix")
+    matvec = Iterative._matvec(A)
+    return (lambda x: [float(e) for e in matvec(x)]), A.n
+
+
+def _start(n, x0, seed=0):
+    """
+    returns the unit starting vector x0 (a Vector) as a list, or a random one
+    """
+    if x0 is None:
+        rng = random.Random(seed)
+        x = [rng.uniform(-1, 1) for _ in range(n)]
+    else:
+        if x0.n != n:
+            raise ValueError("Size of starting point must match size of matrix")
+        x = [float(e) for e in x0.elems]
+    norm = Iterative._norm(x)
+    if norm == 0:
+        raise ValueError("Starting point must not be zero")
+    return [e / norm for e in x]
+
+
+def _vector(x):
+    return V.Vector._wrap(Utils.make_buffer([_clean(e) for e in x]))
+
+
+def _iterate(apply, n, x0, tol, maxiter):
+    """
+    runs power iteration x <- apply(x) / ||apply(x)||, returning the Rayleigh
+    quotient, the vector, whether the relative residual reached tol, and the
+    number of iterations
+    """
+    x = _start(n, x0)
+    mu = 0.0
+    for k in range(1, maxiter + 1):
+        y = apply(x)
+        mu = Iterative._dot(x, y)
+        ny = Iterative._norm(y)
+        if Iterative._norm(list(Utils.axpy(-mu, x, y))) <= tol * ny or ny == 0:
+            return mu, x, True, k
+        x = [e / ny for e in y]
+    return mu, x, False, maxiter
+
+
+def power(A, x0=None, tol=1e-10, maxiter=1000):
+    """
+    finds the eigenvalue of largest magnitude of a square A and its
+    eigenvector by power iteration, stopping once ||A*x - value*x|| is at most
+    tol*||A*x||. converges at the rate of the ratio of the two largest
+    eigenvalue magnitudes
+    """
+    matvec, n = _operator(A)
+    value, x, converged, k = _iterate(matvec, n, x0, tol, maxiter)
+    return _clean(value), _vector(_unit(x)), converged, k
+
+
+def _shifted_solver(A, shift):
+    """
+    returns a function solving (A - shift*I)*x = b for a list b, as a list,
+    for a dense or sparse A
+    """
+    n = A.n
+    if isinstance(A, Sparse.SparseMatrix):
+        F = Sparse.lu(A - Sparse.CSRMatrix(n, n, range(n + 1), range(n), [shift] * n))
+        if F.singular:
+            return None
+        return lambda b: [float(e) for e in F.solve(V.Vector._wrap(array("d", b))).elems]
+    if isinstance(A, M.Matrix):
+        rows = _rows(A)
+        for i in range(n):
+            rows[i][i] -= shift
+        F = LU.LUFactorization(M.Matrix._wrap(n, n, array("d", [x for row in rows for x in row])))
+        if F.singular:
+            return None
+        return F._solve
+    raise TypeError("Inverse iteration needs a dense or sparse matrix to factor")
+
+
+def inverse_power(A, shift=0, x0=None, tol=1e-10, maxiter=1000):
+    """
+    finds the eigenvalue of a square dense or sparse A nearest shift, and its
+    eigenvector, by power iteration with (A - shift*I)^-1, factored once.
+    converges fast for a shift close to an eigenvalue
+    """
+    if not isinstance(A, (M.Matrix, Sparse.SparseMatrix)):
+        raise TypeError("Inverse iteration needs a dense or sparse matrix to factor")
+    if A.m != A.n:
+        raise ValueError("Eigenvalues require a square matrix")
+    solve = _shifted_solver(A, shift)
+    if solve is None:
+        # shift is an eigenvalue: move it off, so A - shift*I can be factored
+        shift += 1e-7 * max(1.0, abs(shift))
+        solve = _shifted_solver(A, shift)
+        if solve is None:
+            raise ValueError("Shifted matrix is not invertible")
+    mu, x, converged, k = _iterate(solve, A.n, x0, tol, maxiter)
+    value = shift + 1/mu if mu else shift
+    return _clean(value), _vector(_unit(x)), converged, k
+
+
+def _select(theta, k, which):
+    """
+    returns the indices of the k eigenvalues in theta (ascending) wanted
+    """
+    indices = range(len(theta))
+    if which == "largest":
+        return list(reversed(indices))[:k]
+    if which == "smallest":
+        return list(indices)[:k]
+    if which == "magnitude":
+        return sorted(indices, key=lambda i: -abs(theta[i]))[:k]
+    raise ValueError(f"Unknown selection {which!r} (expected \"largest\", \"smallest\" or \"magnitude\")")
+
+
+def lanczos(A, k=1, which="largest", x0=None, tol=1e-10, maxiter=None):
+    """
+    finds k eigenvalues of a symmetric A ("largest", "smallest" or largest in
+    "magnitude", per which, the first most extreme) and their eigenvectors
+    by the Lanczos process: A is projected onto a growing Krylov subspace,
+    where it is tridiagonal, and the eigenpairs of the projection (Ritz
+    pairs) converge to the extreme eigenpairs of A. stops once the residual
+    of each Ritz pair is at most tol*||A||, or after maxiter products (at
+    most n). the basis is kept orthogonal by full reorthogonalization
+    """
+    matvec, n = _operator(A)
+    if not 0 < k <= n:
+        raise ValueError(f"Number of eigenvalues must be between 1 and {n}")
+    _select([0.0], 1, which)
+    limit = n if maxiter is None else max(k, min(maxiter, n))
+
+    rng = random.Random(1)
+    basis = [_start(n, x0)]
+    alpha, beta = [], []
+    scale = 0.0
+    for j in range(limit):
+        q = basis[j]
+        w = matvec(q)
+        a = Iterative._dot(w, q)
+        alpha.append(a)
+        w = list(Utils.axpy(-a, q, w))
+        if j > 0:
+            w = list(Utils.axpy(-beta[j-1], basis[j-1], w))
+        for p in basis:
+            w = list(Utils.axpy(-Iterative._dot(w, p), p, w))
+        b = Iterative._norm(w)
+        scale = max(scale, abs(a), b)
+        m = j + 1
+        breakdown = b <= 1e-12 * scale
+
+        if m >= k and (breakdown or m == limit or (m - k) % CHECK_EVERY == 0):
+            # the residual of a Ritz pair is b times the last entry of its eigenvector
+            # of T, so only the last row of the eigenvectors is needed to check
+            d, last = list(alpha), [[0.0] * (m - 1) + [1.0]]
+            _tridiagonal_qr(d, beta[:m-1], last)
+            order = sorted(range(m), key=d.__getitem__)
+            chosen = [order[i] for i in _select([d[i] for i in order], k, which)]
+            residual = 0.0 if breakdown else b
+            converged = all(residual * abs(last[0][i]) <= tol * scale for i in chosen)
+            if converged or m == limit:
+                S = _identity(m)
+                _tridiagonal_qr(list(alpha), beta[:m-1], S)
+                cols = [_unit([sum(S[l][i] * basis[l][r] for l in range(m)) for r in range(n)]) for i in chosen]
+                return [_clean(d[i]) for i in chosen], _from_cols(cols, n), converged, m
+
+        if breakdown:
+            # the basis spans an invariant subspace: carry on from a new random direction
+            w = [rng.uniform(-1, 1) for _ in range(n)]
+            for p in basis:
+                w = list(Utils.axpy(-Iterative._dot(w, p), p, w))
+            b = Iterative._norm(w)
+            beta.append(0.0)
+        else:
+            beta.append(b)
+        basis.append([e / b for e in w])
@@ -0,0 +1,202 @@
+"""
+Exact elimination.
+
+Matrices of integers are eliminated with Bareiss' fraction-free algorithm:
+every update is a 2x2 cross product divided exactly by the previous pivot,
+so all intermediate entries stay integers (minors of the matrix, so their
+size stays bounded) and no rounding is ever needed. Matrices holding floats
+or Fractions run the same algorithm on Fractions.
+
+rref, inverse and solve use the fraction-free Gauss-Jordan variant, which
+also eliminates above each pivot, and divide by the pivots only once, at the
+end.
+"""
+
+from fractions import Fraction
+import operator
+import Matrix as M
+import Vector as V
+import Utils
+
+
+def _rows(A, extra=0):
+    """
+    returns (rows, div): the rows of A as lists of exact numbers (ints, or
+    Fractions if any entry is not an integer), each followed by the row of an
+    identity matrix of size extra (if non-zero), and the exact division to use
+    """
+    flat = Utils.to_list(A._flat())
+    if not all(type(x) is int for x in flat):
+        flat = [Fraction(x) for x in flat]
+        div = operator.truediv
+    else:
+        div = operator.floordiv
+    n = A.n
+    rows = [flat[i*n:(i+1)*n] for i in range(A.m)]
+    for i in range(extra):
+        e = [0] * extra
+        e[i] = 1
+        rows[i] += e
+    return rows, div
+
+
+def _bareiss(rows, ncols, div, reduce=False):
+    """
+    fraction-free elimination of the list of rows in place, taking pivots from
+    the first ncols columns. with reduce, the rows above each pivot are
+    eliminated too. returns (pivots, sign), pivots being the list of pivot
+    (row, column) positions and sign that of the row permutation
+    """
+    m = len(rows)
+    prev = 1
+    sign = 1
+    r = 0
+    pivots = []
+    for j in Utils.steps(range(ncols)):
+        if r == m:
+            break
+        p = next((i for i in range(r, m) if rows[i][j] != 0), None)
+        if p is None:
+            continue
+        if p != r:
+            rows[r], rows[p] = rows[p], rows[r]
+            sign = -sign
+
+        prow = rows[r]
+        pivot = prow[j]
+        for i in range(m):
+            if i == r or (i < r and not reduce):
+                continue
+            row = rows[i]
+            f = row[j]
+            k = 0 if i < r else j + 1    # rows below are already zero left of column j
+            row[k:] = [div(pivot*x - f*y, prev) for x, y in zip(row[k:], prow[k:])]
+            row[j] = 0
+        prev = pivot
+        pivots.append((r, j))
+        r += 1
+    return pivots, sign
+
+
+def _exact(x):
+    """
+    returns x as an int if it is a whole Fraction
+    """
+    if type(x) is Fraction and x.denominator == 1:
+        return x.numerator
+    return x
+
+
+def _matrix(rows, start, stop, aug=0):
+    flat = [_exact(x) for row in rows for x in row[start:stop]]
+    return M.Matrix._wrap(len(rows), stop - start, Utils.make_buffer(flat), aug=aug)
+
+
+def _divide_pivots(rows, pivots):
+    """
+    divides each pivot row by its pivot, in place, leaving Fractions
+    """
+    for r, j in pivots:
+        pivot = rows[r][j]
+        rows[r] = [Fraction(x, pivot) for x in rows[r]]
+
+
+def det(A):
+    """
+    returns the exact determinant of a square matrix A
+    """
+    if A.m != A.n:
+        raise ValueError("Determinant can only be calculated for square matrices")
+    n = A.n
+    if n == 0:
+        return 1
+    rows, div = _rows(A)
+    pivots, sign = _bareiss(rows, n, div)
+    if len(pivots) < n:
+        return 0
+    return _exact(sign * rows[n-1][n-1])
+
+
+def rank(A):
+    """
+    returns the exact rank of A
+    """
+    rows, div = _rows(A)
+    pivots, _ = _bareiss(rows, A.n, div)
+    return len(pivots)
+
+
+def ref(A, elim_matrix=False):
+    """
+    returns (U, E, d) as Matrix.ref does, computed exactly: U is the
+    fraction-free row echelon form of A, E (if elim_matrix) is the matrix
+    with E*A = U, and det(A) = (product of the diagonal of U) / d
+    """
+    rows, div = _rows(A, A.m if elim_matrix else 0)
+    pivots, sign = _bareiss(rows, A.n, div)
+    d = sign
+    for r, j in pivots[:-1]:
+        d *= rows[r][j]
+    U = _matrix(rows, 0, A.n, aug=A.aug)
+    E = _matrix(rows, A.n, A.n + A.m) if elim_matrix else None
+    return (U, E, _exact(d))
+
+
+def rref(A, elim_matrix=False):
+    """
+    returns (U, E) as Matrix.rref does, computed exactly: U is the reduced
+    row echelon form of A and E (if elim_matrix) is the matrix with E*A = U
+    """
+    rows, div = _rows(A, A.m if elim_matrix else 0)
+    pivots, _ = _bareiss(rows, A.n, div, reduce=True)
+    _divide_pivots(rows, pivots)
+    U = _matrix(rows, 0, A.n, aug=A.aug)
+    E = _matrix(rows, A.n, A.n + A.m) if elim_matrix else None
+    return U, E
+
+
+def inverse(A):
+    """
+    returns the exact inverse of a square matrix A, with Fraction entries
+    where they are not whole. throws an error for singular matrices
+    """
+    if A.m != A.n:
+        raise ValueError("Non-square matrices are not invertible")
+    n = A.n
+    rows, div = _rows(A, n)
+    pivots, _ = _bareiss(rows, n, div, reduce=True)
+    if len(pivots) < n:
+        raise ValueError("Matrix is not invertible")
+    _divide_pivots(rows, pivots)
+    return _matrix(rows, n, 2*n)
+
+
+def solve(A, b):
+    """
+    returns the exact solution x of A*x = b for a square nonsingular matrix A
+    and a vector b (or the matrix X s.t. A*X = b for a matrix b), with
+    Fraction entries where they are not whole. the right-hand side is
+    carried through the fraction-free elimination of A
+    """
+    if A.m != A.n:
+        raise ValueError("Can only solve square systems")
+    n = A.n
+    rows, div = _rows(A)
+    if isinstance(b, M.Matrix):
+        rhs = [Utils.to_list(b._get(b._row_slice(i))) for i in range(b.m)]
+        width = b.n
+    else:
+        rhs = [[x] for x in b.elems]
+        width = 1
+    if div is operator.floordiv and not all(type(x) is int for row in rhs for x in row):
+        rows = [[Fraction(x) for x in row] for row in rows]
+        div = operator.truediv
+    for row, extra in zip(rows, rhs):
+        row += [Fraction(x) if div is operator.truediv else x for x in extra]
+    pivots, _ = _bareiss(rows, n, div, reduce=True)
+    if len(pivots) < n:
+        raise ValueError("Matrix is not invertible")
+    _divide_pivots(rows, pivots)
+    if isinstance(b, M.Matrix):
+        return _matrix(rows, n, n + width)
+    return V.Vector._wrap(Utils.make_buffer([_exact(row[n]) for row in rows]))
@@ -0,0 +1,156 @@
+"""
+Text rendering of matrices.
+
+str() of a matrix shows every entry while it has at most THRESHOLD of them.
+Past that it is summarized: only the first and last EDGEITEMS rows and
+columns are formatted, with ellipses standing for the rest, so printing or
+logging a large matrix costs the same whatever its size. write_to streams
+the whole matrix to a file a row at a time, for when a full dump is needed.
+
+    THRESHOLD = most entries shown in full
+    EDGEITEMS = rows and columns shown at each edge of a summarized matrix
+    PRECISION = decimal places shown for floats
+"""
+
+import contextlib
+import math
+import Utils
+
+THRESHOLD = 1000
+EDGEITEMS = 3
+PRECISION = 2
+
+
+def set_printoptions(threshold=None, edgeitems=None, precision=None):
+    """
+    sets the options given (see above), leaving the others as they are
+    """
+    global THRESHOLD, EDGEITEMS, PRECISION
+    if threshold is not None:
+        THRESHOLD = threshold
+    if edgeitems is not None:
+        EDGEITEMS = edgeitems
+    if precision is not None:
+        PRECISION = precision
+
+
+def get_printoptions():
+    """
+    returns the current options as a dictionary
+    """
+    return {"threshold": THRESHOLD, "edgeitems": EDGEITEMS, "precision": PRECISION}
+
+
+@contextlib.contextmanager
+def printoptions(**options):
+    """
+    sets the options given for the length of a with block
+    """
+    old = get_printoptions()
+    set_printoptions(**options)
+    try:
+        yield
+    finally:
+        set_printoptions(**old)
+
+
+def _cell(x, precision):
+    if isinstance(x, float):
+        return f"{x:.{precision}f}"
+    return str(x)
+
+
+def _indices(size, edgeitems, summarize):
+    """
+    returns the indices shown along a dimension of the given size, None
+    standing for the ellipsis
+    """
+    if not summarize or size <= 2*edgeitems:
+        return list(range(size))
+    return list(range(edgeitems)) + [None] + list(range(size - edgeitems, size))
+
+
+def _line(cells, cols, aug_index, width):
+    """
+    returns the text of a row of formatted cells (in columns cols), with a
+    bar before the first augmented column shown
+    """
+    parts = ["["]
+    bar = aug_index is None
+    for j, cell in zip(cols, cells):
+        if not bar and j is not None and j >= aug_index:
+            parts.append(" |")
+            bar = True
+        parts.append(cell.rjust(width))
+    parts.append(" ]")
+    return "".join(parts)
+
+
+def format_matrix(A, threshold=None, edgeitems=None, precision=None):
+    """
+    returns the text of the matrix A, summarized if it has more than
+    threshold entries. options not given take their current values
+    """
+    threshold = THRESHOLD if threshold is None else threshold
+    edgeitems = EDGEITEMS if edgeitems is None else edgeitems
+    precision = PRECISION if precision is None else precision
+
+    summarize = A.m * A.n > threshold
+    rows = _indices(A.m, edgeitems, summarize)
+    cols = _indices(A.n, edgeitems, summarize)
+    data, rs, cs = A.data, A.strides[0], A.strides[1]
+    grid = []
+    for i in rows:
+        if i is None:
+            grid.append(None)
+            continue
+        start = A.offset + i*rs
+        grid.append(["..." if j is None else _cell(data[start + j*cs], precision) for j in cols])
+
+    width = 1 + max((len(cell) for cells in grid if cells for cell in cells), default=1)
+    width = max(width, 2)
+    aug_index = A.n - A.aug if A.aug else None
+    dots = ["..."] * len(cols)
+    return "".join(_line(dots if cells is None else cells, cols, aug_index, width) + "\n" for cells in grid)
+
+
+def _width(A, precision):
+    """
+    returns the widest formatted entry of A. fixed-point numbers are widest
+    at the largest or smallest value, so only those are formatted for
+    integer and float matrices
+    """
+    width = 1
+    floats = A._entry_type() == "d"
+    for i in range(A.m):
+        row = A._get(A._row_slice(i))
+        if len(row) == 0:
+            continue
+        if Utils.typecode(row) is None:
+            width = max(width, max(len(_cell(x, precision)) for x in row))
+            continue
+        if floats and any(map(math.isnan, row)):
+            width = max(width, 3)
+            row = [x for x in row if x == x]
+            if len(row) == 0:
+                continue
+        width = max(width, len(_cell(min(row), precision)), len(_cell(max(row), precision)))
+    return width
+
+
+def write_to(A, file, precision=None):
+    """
+    writes every entry of the matrix A, as str() lays them out, to file (a
+    path or a text file object), a row at a time
+    """
+    precision = PRECISION if precision is None else precision
+    if not hasattr(file, "write"):
+        with open(file, "w") as f:
+            return write_to(A, f, precision)
+
+    width = max(_width(A, precision) + 1, 2)
+    cols = range(A.n)
+    aug_index = A.n - A.aug if A.aug else None
+    for i in range(A.m):
+        row = A._get(A._row_slice(i))
+        file.write(_line([_cell(x, precision) for x in row], cols, aug_index, width) + "\n")
@@ -0,0 +1,284 @@
+"""
+Saving and loading matrices and vectors in a binary format.
+
+Files use the .npy format (version 1.0), so NumPy can read them with
+numpy.load and they can load files NumPy wrote. The number of augmented
+columns of a matrix is kept in a comment at the end of the header, which
+NumPy ignores.
+
+load(path, mmap_mode=...) maps the file into memory instead of reading it:
+the matrix is then backed directly by the file, opening it takes no time
+whatever its size, and processes mapping the same file share its pages.
+The entries keep the file's type, so writing ones that need a wider type
+(e.g. floats into a matrix of integers) throws a TypeError.
+
+Text (CSV/TSV) and raw binary row streams are read a row at a time straight
+into the flat buffer of the matrix, so no list of rows is ever built:
+
+    read_csv, read_tsv = the whole file as one matrix
+    iter_csv           = the file as a sequence of matrices of at most chunk rows
+    read_rows          = a stream of raw 64-bit entries, n to a row
+"""
+
+from array import array
+import ast
+import csv
+import mmap
+import re
+import sys
+import Matrix as M
+import Vector as V
+import Backend
+import Utils
+
+MAGIC = b"\x93NUMPY"
+
+_DESCRS = {"q": "<i8", "d": "<f8"}
+_TYPECODES = {"i8": "q", "f8": "d", "i4": "i", "f4": "f", "i2": "h", "u1": "B", "i1": "b", "b1": "B"}
+_MMAP_MODES = {"r": mmap.ACCESS_READ, "r+": mmap.ACCESS_WRITE, "c": mmap.ACCESS_COPY}
+_AUG = re.compile(r"#\s*aug:\s*(\d+)")
+CHUNK = 65536         # rows per chunk of iter_csv
+READ_SIZE = 1 << 16   # bytes read from a raw row stream at a time
+
+
+def save(file, A):
+    """
+    writes the matrix or vector A to file (a path or a binary file object).
+    A must hold 64-bit integers or floats
+    """
+    if isinstance(A, M.Matrix):
+        shape, aug, buf = (A.m, A.n), A.aug, A._flat()
+    elif isinstance(A, V.Vector):
+        shape, aug, buf = (A.n,), 0, A.elems
+    else:
+        raise TypeError("Can only save matrices and vectors")
+    tc = Utils.typecode(buf)
+    if tc is None:
+        raise TypeError("Can only save matrices and vectors of 64-bit integers or floats")
+
+    buf = array(tc, buf) if not isinstance(buf, array) else buf
+    if sys.byteorder == "big":
+        buf = buf[:]
+        buf.byteswap()
+    header = _header(_DESCRS[tc], shape, aug)
+    if hasattr(file, "write"):
+        file.write(header)
+        buf.tofile(file)
+    else:
+        with open(file, "wb") as f:
+            f.write(header)
+            buf.tofile(f)
+
+
+def load(file, mmap_mode=None):
+    """
+    returns the matrix (or vector, for 1d data) stored in file (a path or a
+    binary file object). with mmap_mode, maps the file rather than reading it:
+        "r"  = read-only
+        "r+" = writes to the matrix go to the file
+        "c"  = copy-on-write: writes stay in memory
+    memory-mapped files must hold 64-bit integers or floats in the native byte order
+    """
+    if mmap_mode is not None and mmap_mode not in _MMAP_MODES:
+        raise ValueError(f"Unknown mmap mode {mmap_mode!r} (expected one of {tuple(_MMAP_MODES)})")
+    if hasattr(file, "read"):
+        return _load(file, mmap_mode)
+    with open(file, "rb" if mmap_mode in (None, "r", "c") else "r+b") as f:
+        return _load(f, mmap_mode)
+
+
+def _header(descr, shape, aug):
+    """
+    returns the .npy header for data of type descr and the given shape,
+    padded so the data starts at a multiple of 64 bytes
+    """
+    d = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': {shape!r}, }}"
+    if aug:
+        d += f"  # aug: {aug}"
+    pad = -(len(MAGIC) + 4 + len(d) + 1) % 64
+    d += " " * pad + "\n"
+    return MAGIC + b"\x01\x00" + len(d).to_bytes(2, "little") + d.encode("latin1")
+
+
+def _read_header(f):
+    """
+    returns (descr, fortran_order, shape, aug) read from the header of the
+    .npy file f, leaving f at the start of the data
+    """
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a .npy file")
+    major = f.read(2)[0]
+    size = 2 if major == 1 else 4
+    header = f.read(int.from_bytes(f.read(size), "little")).decode("latin1" if major < 3 else "utf8")
+    try:
+        d = ast.literal_eval(header)
+        descr, fortran_order, shape = d["descr"], d["fortran_order"], tuple(d["shape"])
+    except (ValueError, SyntaxError, KeyError, TypeError):
+        raise ValueError("Invalid .npy header") from None
+    match = _AUG.search(header)
+    return descr, fortran_order, shape, (int(match.group(1)) if match else 0)
+
+
+def _load(f, mmap_mode):
+    descr, fortran_order, shape, aug = _read_header(f)
+    if not isinstance(descr, str) or descr[1:] not in _TYPECODES:
+        raise ValueError(f"Unsupported data type {descr!r}")
+    if len(shape) not in (1, 2):
+        raise ValueError("Can only load 1d and 2d data")
+    tc = _TYPECODES[descr[1:]]
+    size = 1
+    for k in shape:
+        size *= k
+    swap = (descr[0] == "<" and sys.byteorder == "big") or (descr[0] == ">" and sys.byteorder == "little")
+
+    if mmap_mode is not None:
+        if tc not in ("q", "d") or swap:
+            raise ValueError("Can only memory-map 64-bit integers or floats in the native byte order")
+        start = f.tell()
+        if size == 0:
+            buf = array(tc)
+        else:
+            mm = mmap.mmap(f.fileno(), 0, access=_MMAP_MODES[mmap_mode])
+            buf = memoryview(mm)[start:start + size*8].cast(tc)
+    else:
+        buf = array(tc)
+        buf.frombytes(f.read(size * buf.itemsize))
+        if len(buf) != size:
+            raise ValueError("File holds less data than its header says")
+        if swap:
+            buf.byteswap()
+        if tc not in ("q", "d"):
+            buf = array("d" if tc == "f" else "q", buf)
+        buf = Backend.adopt(buf)
+
+    if len(shape) == 1:
+        return V.Vector._wrap(buf)
+    m, n = shape
+    if fortran_order:    # column-major data: a transposed view of it
+        return M.Matrix._wrap(n, m, buf)._view(0, m, n, (1, m), aug)
+    return M.Matrix._wrap(m, n, buf, aug=aug)
+
+
+def _number(field):
+    """
+    returns the number written in the text field
+    """
+    try:
+        return int(field)
+    except ValueError:
+        return float(field)
+
+
+def _csv_rows(f, delimiter, skip):
+    """
+    returns an iterator over the rows of numbers of the delimited text file f,
+    after skipping skip lines, ignoring blank lines
+    """
+    for _ in range(skip):
+        f.readline()
+    for fields in csv.reader(f, delimiter=delimiter):
+        if fields:
+            yield map(_number, fields)
+
+
+def _text(file, read):
+    """
+    returns read(f) for file, opening it as f first if it is a path
+    """
+    if hasattr(file, "read"):
+        return read(file)
+    with open(file, newline="") as f:
+        return read(f)
+
+
+def read_csv(file, delimiter=",", skip=0, m=None):
+    """
+    returns the matrix in the delimited text file (a path or a text file
+    object), one row per line, after skipping skip lines (e.g. a header).
+    if the number of rows m is given, the matrix is allocated once up front
+    """
+    def read(f):
+        builder = M._RowBuilder(m)
+        for row in _csv_rows(f, delimiter, skip):
+            builder.append(row)
+        return builder.build()
+    return _text(file, read)
+
+
+def read_tsv(file, skip=0, m=None):
+    """
+    returns the matrix in the tab-separated text file (see read_csv)
+    """
+    return read_csv(file, "\t", skip, m)
+
+
+def iter_csv(file, chunk=None, delimiter=",", skip=0):
+    """
+    returns a generator of matrices of at most chunk consecutive rows of the
+    delimited text file (see read_csv), so only one chunk is in memory at a time
+    """
+    chunk = chunk or CHUNK
+    if chunk < 1:
+        raise ValueError("Chunks must hold at least one row")
+    f = file if hasattr(file, "read") else open(file, newline="")
+    try:
+        builder = M._RowBuilder()
+        for row in _csv_rows(f, delimiter, skip):
+            builder.append(row)
+            if builder.count == chunk:
+                yield builder.build()
+                builder = M._RowBuilder(n=builder.n)
+        if builder.count:
+            yield builder.build()
+    finally:
+        if f is not file:
+            f.close()
+
+
+def read_rows(file, n, tc="d", m=None):
+    """
+    returns the matrix of rows of n raw 64-bit entries of type tc ("q" or
+    "d", in the native byte order) read from file (a path or a binary file
+    object) until its end, or until m rows if m is given. the stream is read
+    READ_SIZE bytes at a time, each appended to the buffer of the matrix, so
+    it only ever grows (geometrically) with the rows that actually arrive
+    """
+    if tc not in _DESCRS:
+        raise ValueError("Row streams must hold 64-bit integers (\"q\") or floats (\"d\")")
+    if hasattr(file, "read"):
+        return _read_rows(file, n, tc, m)
+    with open(file, "rb") as f:
+        return _read_rows(f, n, tc, m)
+
+
+def _read_rows(f, n, tc, m):
+    row_bytes = n*8
+    if n == 0:
+        return M.Matrix._wrap(m or 0, 0, array(tc))
+    buf = array(tc)
+    left = None if m is None else m*row_bytes    # bytes still wanted
+    scratch = bytearray(max(READ_SIZE, 8))
+    held = 0    # bytes in scratch not yet appended (a partial entry)
+    used = 0    # bytes read so far
+    with memoryview(scratch) as raw:
+        while left is None or left > 0:
+            stop = len(raw) if left is None else min(len(raw), held + left)
+            k = f.readinto(raw[held:stop])
+            if not k:
+                break
+            used += k
+            if left is not None:
+                left -= k
+            held += k
+            whole = held - held % 8
+            buf.frombytes(raw[:whole])
+            raw[:held - whole] = raw[whole:held]
+            held -= whole
+
+    if used % row_bytes:
+        raise ValueError("Stream ended in the middle of a row")
+    rows = used // row_bytes
+    if m is not None and rows != m:
+        raise ValueError(f"Stream holds fewer rows than expected (expected {m}, got {rows})")
+    del buf[rows*n:]
+    return M.Matrix._wrap(rows, n, Backend.adopt(buf))
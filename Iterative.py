@@ -0,0 +1,350 @@
+"""
+Iterative solvers for A*x = b.
+
+These only need products of A with vectors, so A can be a dense Matrix, a
+sparse matrix, or any linear operator (an object with m, n and a * that
+takes a Vector). Each one stops once the residual ||b - A*x|| is at most
+tol*||b||, or after maxiter iterations, and starts from x0 if given (a warm
+start), otherwise from zero. Each returns a list containing:
+    x = the solution found (a Vector)
+    converged = whether the tolerance was met
+    iterations = number of iterations run
+
+    cg           = conjugate gradient, for symmetric positive definite A
+    gmres        = restarted GMRES, for any square nonsingular A
+    jacobi       = Jacobi iteration, for diagonally dominant A
+    gauss_seidel = Gauss-Seidel iteration, for diagonally dominant or SPD A
+
+cg and gmres take a preconditioner: "diagonal", "ilu0", or any object whose
+solve(r) returns (an approximation of) A^-1 * r for a list r.
+"""
+
+import math
+import operator
+import Matrix as M
+import Vector as V
+import Sparse
+import Kernels
+import Backend
+import Utils
+
+
+class LinearOperator:
+    """
+    A matrix known only through its products with vectors.
+
+        m = number of rows
+        n = number of columns
+        matvec = function taking a Vector of size n to a Vector of size m
+    """
+
+    def __init__(self, m, n, matvec):
+        self.m = m
+        self.n = n
+        self.matvec = matvec
+
+
+    def __mul__(self, v):
+        if not isinstance(v, V.Vector):
+            raise TypeError("Can only multiply a linear operator by a vector")
+        if v.n != self.n:
+            raise ValueError("Size of vector must match width of matrix")
+        return self.matvec(v)
+
+
+class DiagonalPreconditioner:
+    """
+    The Jacobi preconditioner, D^-1 for the diagonal D of A.
+
+        inv = list of the reciprocals of the diagonal entries
+    """
+
+    def __init__(self, A):
+        self.inv = [1/d for d in _diagonal(A)]
+
+
+    def solve(self, r):
+        return list(map(operator.mul, self.inv, r))
+
+
+class ILU0:
+    """
+    The incomplete LU factorization of A with no fill-in: L and U keep exactly
+    the sparsity pattern of A, so the factors cost no more memory than A.
+
+        lower = list of (columns, values) of the strictly lower part of each row of L
+        upper = list of (columns, values) of the strictly upper part of each row of U
+        diag = list of the diagonal entries of U
+    """
+
+    def __init__(self, A):
+        if isinstance(A, M.Matrix):
+            A = Sparse.from_dense(A)
+        if not isinstance(A, Sparse.SparseMatrix):
+            raise TypeError("ILU(0) needs a dense or sparse matrix")
+        if A.m != A.n:
+            raise ValueError("ILU(0) requires a square matrix")
+
+        rows = A.tocsr()._row_dicts()
+        for i, row in enumerate(rows):
+            for k in sorted(c for c in row if c < i):
+                pivot = rows[k].get(k, 0)
+                if pivot == 0:
+                    raise ValueError("ILU(0) met a zero pivot")
+                f = row[k] = row[k] / pivot
+                for j, u in rows[k].items():
+                    if j > k and j in row:
+                        row[j] -= f*u
+
+        self.lower, self.upper, self.diag = [], [], []
+        for i, row in enumerate(rows):
+            if row.get(i, 0) == 0:
+                raise ValueError("ILU(0) met a zero pivot")
+            self.lower.append(([j for j in row if j < i], [x for j, x in row.items() if j < i]))
+            self.upper.append(([j for j in row if j > i], [x for j, x in row.items() if j > i]))
+            self.diag.append(row[i])
+
+
+    def solve(self, r):
+        n = len(self.diag)
+        mul = operator.mul
+        y = list(r)
+        for i in range(n):
+            cols, vals = self.lower[i]
+            if cols:
+                y[i] -= sum(map(mul, vals, [y[j] for j in cols]))
+        for i in range(n-1, -1, -1):
+            cols, vals = self.upper[i]
+            s = sum(map(mul, vals, [y[j] for j in cols])) if cols else 0
+            y[i] = (y[i] - s) / self.diag[i]
+        return y
+
+
+def _matvec(A):
+    """
+    returns a function computing the product of A with a list, as a list
+    """
+    if isinstance(A, Sparse.SparseMatrix):
+        return A.tocsr()._matvec
+    if isinstance(A, M.Matrix) and not Backend.active(A):
+        flat, m, n = A._flat(), A.m, A.n
+        return lambda x: Kernels.matvec(flat, x, m, n)
+    return lambda x: Utils.to_list((A * V.Vector._wrap(Utils.make_buffer(x))).elems)
+
+
+def _diagonal(A):
+    """
+    returns the diagonal of a dense or sparse matrix A, as a list
+    """
+    if isinstance(A, M.Matrix):
+        return [A.at(i, i) for i in range(min(A.m, A.n))]
+    if isinstance(A, Sparse.SparseMatrix):
+        S = A.tocsr()
+        return [S.at(i, i) for i in range(min(S.m, S.n))]
+    raise TypeError("Need a dense or sparse matrix to find its diagonal")
+
+
+def _row_entries(A):
+    """
+    returns the rows of a dense or sparse matrix A as a list of (columns, values)
+    """
+    if isinstance(A, M.Matrix):
+        cols = range(A.n)
+        return [(cols, A._get(A._row_slice(i))) for i in range(A.m)]
+    if isinstance(A, Sparse.SparseMatrix):
+        S = A.tocsr()
+        indptr = S.indptr
+        return [(S.indices[indptr[i]:indptr[i+1]], S.data[indptr[i]:indptr[i+1]]) for i in range(S.m)]
+    raise TypeError("Gauss-Seidel needs a dense or sparse matrix")
+
+
+def _preconditioner(A, precond):
+    if precond is None:
+        return None
+    if precond in ("diagonal", "jacobi"):
+        return DiagonalPreconditioner(A)
+    if precond in ("ilu0", "ilu"):
+        return ILU0(A)
+    if hasattr(precond, "solve"):
+        return precond
+    raise ValueError(f"Unknown preconditioner {precond!r}")
+
+
+def _setup(A, b, x0, maxiter):
+    """
+    checks the arguments of a solver, returning (b, x, maxiter) with b and
+    the starting point x as lists of floats
+    """
+    if A.m != A.n:
+        raise ValueError("Iterative solvers require a square matrix")
+    if not isinstance(b, V.Vector):
+        raise TypeError("Can only solve for a vector right-hand side")
+    if b.n != A.n:
+        raise ValueError("Size of vector must match size of matrix")
+    if x0 is None:
+        x = [0.0] * A.n
+    else:
+        if x0.n != A.n:
+            raise ValueError("Size of starting point must match size of matrix")
+        x = [float(e) for e in x0.elems]
+    if maxiter is None:
+        maxiter = 10 * A.n
+    return [float(e) for e in b.elems], x, maxiter
+
+
+def _dot(u, v):
+    return sum(map(operator.mul, u, v))
+
+
+def _norm(u):
+    return math.sqrt(_dot(u, u))
+
+
+def _result(x, converged, iterations):
+    return (V.Vector._wrap(Utils.pack(x, "d")), converged, iterations)
+
+
+def cg(A, b, x0=None, tol=1e-8, maxiter=None, precond=None, callback=None):
+    """
+    solves A*x = b for a symmetric positive definite A by the (preconditioned)
+    conjugate gradient method. callback, if given, is called with the
+    current x (a list) after every iteration
+    """
+    b, x, maxiter = _setup(A, b, x0, maxiter)
+    matvec = _matvec(A)
+    P = _preconditioner(A, precond)
+    target = tol * _norm(b)
+
+    r = list(map(operator.sub, b, matvec(x)))
+    z = P.solve(r) if P else r
+    p = list(z)
+    rz = _dot(r, z)
+    k = 0
+    while k < maxiter and _norm(r) > target:
+        Ap = matvec(p)
+        pAp = _dot(p, Ap)
+        if pAp == 0:
+            break
+        alpha = rz / pAp
+        x = list(Utils.axpy(alpha, p, x))
+        r = list(Utils.axpy(-alpha, Ap, r))
+        z = P.solve(r) if P else r
+        rz, rz_old = _dot(r, z), rz
+        p = list(Utils.axpy(rz / rz_old, p, z))
+        k += 1
+        if callback:
+            callback(x)
+    return _result(x, _norm(r) <= target, k)
+
+
+def gmres(A, b, x0=None, tol=1e-8, restart=20, maxiter=None, precond=None, callback=None):
+    """
+    solves A*x = b by GMRES, restarted every restart iterations, with right
+    preconditioning (so the residual tested is that of the original system).
+    callback, if given, is called with the current x (a list) after every restart
+    """
+    b, x, maxiter = _setup(A, b, x0, maxiter)
+    matvec = _matvec(A)
+    P = _preconditioner(A, precond)
+    target = tol * _norm(b)
+    k = 0
+
+    while True:
+        r = list(map(operator.sub, b, matvec(x)))
+        beta = _norm(r)
+        if beta <= target:
+            return _result(x, True, k)
+        if k >= maxiter:
+            return _result(x, False, k)
+
+        # Arnoldi process, with Givens rotations keeping H upper triangular
+        basis = [[e / beta for e in r]]
+        R, cs, sn = [], [], []
+        g = [beta]
+        for j in range(restart):
+            w = matvec(P.solve(basis[j]) if P else basis[j])
+            h = []
+            for q in basis:
+                hq = _dot(w, q)
+                w = list(Utils.axpy(-hq, q, w))
+                h.append(hq)
+            hn = _norm(w)
+            for i in range(j):
+                h[i], h[i+1] = cs[i]*h[i] + sn[i]*h[i+1], -sn[i]*h[i] + cs[i]*h[i+1]
+            d = math.hypot(h[j], hn)
+            c, s = (h[j]/d, hn/d) if d else (1.0, 0.0)
+            cs.append(c)
+            sn.append(s)
+            h[j] = d
+            g.append(-s*g[j])
+            g[j] *= c
+            R.append(h)
+            k += 1
+            if abs(g[j+1]) <= target or hn == 0 or k >= maxiter:
+                break
+            basis.append([e / hn for e in w])
+
+        # solve the triangular system R*y = g, then x += P^-1 * (basis*y)
+        m = len(R)
+        y = [0.0] * m
+        for i in range(m-1, -1, -1):
+            y[i] = (g[i] - sum(R[l][i]*y[l] for l in range(i+1, m))) / R[i][i]
+        dx = [0.0] * len(x)
+        for i in range(m):
+            dx = list(Utils.axpy(y[i], basis[i], dx))
+        x = list(map(operator.add, x, P.solve(dx) if P else dx))
+        if callback:
+            callback(x)
+
+
+def jacobi(A, b, x0=None, tol=1e-8, maxiter=None, callback=None):
+    """
+    solves A*x = b by Jacobi iteration, x <- x + D^-1 * (b - A*x).
+    converges for strictly diagonally dominant A. callback, if given, is
+    called with the current x (a list) after every iteration
+    """
+    b, x, maxiter = _setup(A, b, x0, maxiter)
+    matvec = _matvec(A)
+    diag = _diagonal(A)
+    if not all(diag):
+        raise ValueError("Jacobi iteration needs a diagonal with no zeros")
+    inv = [1/d for d in diag]
+    target = tol * _norm(b)
+
+    for k in range(maxiter):
+        r = list(map(operator.sub, b, matvec(x)))
+        if _norm(r) <= target:
+            return _result(x, True, k)
+        x = list(map(operator.add, x, map(operator.mul, inv, r)))
+        if callback:
+            callback(x)
+    r = list(map(operator.sub, b, matvec(x)))
+    return _result(x, _norm(r) <= target, maxiter)
+
+
+def gauss_seidel(A, b, x0=None, tol=1e-8, maxiter=None, callback=None):
+    """
+    solves A*x = b by Gauss-Seidel iteration, sweeping through the rows and
+    using each updated entry of x immediately. converges for strictly
+    diagonally dominant or symmetric positive definite A. callback, if
+    given, is called with the current x (a list) after every sweep
+    """
+    b, x, maxiter = _setup(A, b, x0, maxiter)
+    matvec = _matvec(A)
+    diag = _diagonal(A)
+    if not all(diag):
+        raise ValueError("Gauss-Seidel iteration needs a diagonal with no zeros")
+    rows = _row_entries(A)
+    target = tol * _norm(b)
+    mul = operator.mul
+
+    for k in range(maxiter):
+        r = list(map(operator.sub, b, matvec(x)))
+        if _norm(r) <= target:
+            return _result(x, True, k)
+        for i, (cols, vals) in enumerate(rows):
+            x[i] += (b[i] - sum(map(mul, vals, [x[j] for j in cols]))) / diag[i]
+        if callback:
+            callback(x)
+    r = list(map(operator.sub, b, matvec(x)))
+    return _result(x, _norm(r) <= target, maxiter)
@@ -0,0 +1,199 @@
+"""
+Multiplication, substitution and elimination kernels working directly on
+flat, row-major buffers.
+
+    BLOCK_SIZE = edge length of the tiles the blocked product works on
+    STRASSEN_THRESHOLD = smallest dimension at which matmul switches to Strassen's
+                         recursion (None to never use it)
+"""
+
+from array import array
+import operator
+import Utils
+
+BLOCK_SIZE = 64
+STRASSEN_THRESHOLD = None
+
+
+def matmul(a, b, m, n, p, threshold=None):
+    """
+    returns the m by p product of the m by n buffer a and the n by p buffer b,
+    as a flat row-major list.
+    uses Strassen's recursion once every dimension is at least threshold
+    (STRASSEN_THRESHOLD if not given), and the blocked product otherwise
+    """
+    if threshold is None:
+        threshold = STRASSEN_THRESHOLD
+    if threshold is not None and min(m, n, p) >= max(threshold, 2):
+        return _strassen(list(a), list(b), m, n, p, threshold)
+    return blocked_matmul(a, b, m, n, p)
+
+
+def blocked_matmul(a, b, m, n, p, bs=None):
+    """
+    returns the m by p product of the m by n buffer a and the n by p buffer b,
+    as a flat row-major list.
+    works through bs by bs tiles, each an inner product between contiguous
+    slices of a row of a and a column of b
+    """
+    if bs is None:
+        bs = BLOCK_SIZE
+    if n == 0:
+        return [0] * (m*p)
+    mul = operator.mul
+    rows = [a[i*n:(i+1)*n] for i in range(m)]
+    cols = [b[j::p] for j in range(p)]
+    if n <= bs:
+        return [sum(map(mul, row, col)) for row in rows for col in cols]
+
+    c = [0] * (m*p)
+    for k0 in range(0, n, bs):
+        k1 = min(k0 + bs, n)
+        row_tiles = [row[k0:k1] for row in rows]
+        col_tiles = [col[k0:k1] for col in cols]
+        for i0 in range(0, m, bs):
+            for j0 in range(0, p, bs):
+                j1 = min(j0 + bs, p)
+                for i in range(i0, min(i0 + bs, m)):
+                    row = row_tiles[i]
+                    base = i*p
+                    for j in range(j0, j1):
+                        c[base + j] += sum(map(mul, row, col_tiles[j]))
+    return c
+
+
+def matvec(a, x, m, n):
+    """
+    returns the product of the m by n buffer a and the size n buffer x, as a list
+    """
+    mul = operator.mul
+    return [sum(map(mul, a[i*n:(i+1)*n], x)) for i in range(m)]
+
+
+def forward_substitution(a, x, n, unit=False):
+    """
+    solves L*y = x for the lower triangle L of the n by n buffer a (entries
+    above the diagonal are not read), overwriting the list x with y. with
+    unit, the diagonal of L is taken to be all ones and is not read either
+    """
+    mul = operator.mul
+    for i in range(n):
+        s = sum(map(mul, a[i*n:i*n + i], x[:i]))
+        x[i] = x[i] - s if unit else (x[i] - s) / a[i*n + i]
+    return x
+
+
+def back_substitution(a, x, n, unit=False):
+    """
+    solves U*y = x for the upper triangle U of the n by n buffer a (entries
+    below the diagonal are not read), overwriting the list x with y. with
+    unit, the diagonal of U is taken to be all ones and is not read either
+    """
+    mul = operator.mul
+    for i in range(n-1, -1, -1):
+        s = sum(map(mul, a[i*n + i+1:(i+1)*n], x[i+1:]))
+        x[i] = x[i] - s if unit else (x[i] - s) / a[i*n + i]
+    return x
+
+
+def eliminate_rows(data, n, j, start, stop):
+    """
+    subtracts multiples of row j of the n-column row-major buffer data from
+    rows start to stop, in place, making their entries in column j zero.
+    row j must be zero left of column j, so only the columns from j on take
+    part. data must hold floats or generic entries.
+    returns the list of (row, multiplier) pairs applied
+    """
+    tc = Utils.typecode(data)
+    pivot = data[j*n + j]
+    tail = data[j*n + j:(j+1)*n]
+    applied = []
+    for i in range(start, stop):
+        elem = data[i*n + j]
+        if elem != 0:
+            s = -elem/pivot
+            row = slice(i*n + j, (i+1)*n)
+            values = Utils.axpy(s, tail, data[row])
+            data[row] = array(tc, values) if tc is not None else list(values)
+            data[i*n + j] = 0
+            applied.append((i, s))
+    return applied
+
+
+def _strassen(a, b, m, n, p, threshold):
+    """
+    Strassen's recursion on row-major lists. odd dimensions are padded with a
+    row or column of zeros, which is stripped from the result
+    """
+    if min(m, n, p) < threshold:
+        return blocked_matmul(a, b, m, n, p)
+
+    if m % 2 or n % 2 or p % 2:
+        m2, n2, p2 = m + m % 2, n + n % 2, p + p % 2
+        c = _strassen(_pad(a, m, n, m2, n2), _pad(b, n, p, n2, p2), m2, n2, p2, threshold)
+        return _crop(c, p2, m, p)
+
+    hm, hn, hp = m // 2, n // 2, p // 2
+    a11, a12, a21, a22 = _quadrants(a, m, n)
+    b11, b12, b21, b22 = _quadrants(b, n, p)
+    add, sub = _add, _sub
+
+    m1 = _strassen(add(a11, a22), add(b11, b22), hm, hn, hp, threshold)
+    m2 = _strassen(add(a21, a22), b11, hm, hn, hp, threshold)
+    m3 = _strassen(a11, sub(b12, b22), hm, hn, hp, threshold)
+    m4 = _strassen(a22, sub(b21, b11), hm, hn, hp, threshold)
+    m5 = _strassen(add(a11, a12), b22, hm, hn, hp, threshold)
+    m6 = _strassen(sub(a21, a11), add(b11, b12), hm, hn, hp, threshold)
+    m7 = _strassen(sub(a12, a22), add(b21, b22), hm, hn, hp, threshold)
+
+    c11 = add(sub(add(m1, m4), m5), m7)
+    c12 = add(m3, m5)
+    c21 = add(m2, m4)
+    c22 = add(add(sub(m1, m2), m3), m6)
+
+    c = []
+    for i in range(hm):
+        c.extend(c11[i*hp:(i+1)*hp])
+        c.extend(c12[i*hp:(i+1)*hp])
+    for i in range(hm):
+        c.extend(c21[i*hp:(i+1)*hp])
+        c.extend(c22[i*hp:(i+1)*hp])
+    return c
+
+
+def _quadrants(a, m, n):
+    hm, hn = m // 2, n // 2
+    top = [a[i*n:(i+1)*n] for i in range(hm)]
+    bottom = [a[i*n:(i+1)*n] for i in range(hm, m)]
+    return ([x for row in top for x in row[:hn]], [x for row in top for x in row[hn:]],
+            [x for row in bottom for x in row[:hn]], [x for row in bottom for x in row[hn:]])
+
+
+def _add(a, b):
+    return list(map(operator.add, a, b))
+
+
+def _sub(a, b):
+    return list(map(operator.sub, a, b))
+
+
+def _pad(a, m, n, m2, n2):
+    """
+    returns the m by n matrix a padded with zeros to m2 by n2
+    """
+    out = []
+    for i in range(m):
+        out.extend(a[i*n:(i+1)*n])
+        out.extend([0] * (n2 - n))
+    out.extend([0] * ((m2 - m) * n2))
+    return out
+
+
+def _crop(a, n, m2, n2):
+    """
+    returns the top-left m2 by n2 corner of a matrix a with n columns
+    """
+    out = []
+    for i in range(m2):
+        out.extend(a[i*n:i*n + n2])
+    return out
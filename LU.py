@@ -0,0 +1,177 @@
+import Matrix as M
+import Vector as V
+import Kernels
+import Utils
+
+class LUFactorization:
+    """
+    An LU factorization with partial pivoting of a square matrix A, P*A = L*U.
+    Computed once, then reused for any number of determinants, solves and inverses.
+
+        n = size of the factored matrix
+        lu = flat row-major buffer holding U on and above the diagonal, and the
+             multipliers of L below it (L has an implied unit diagonal)
+        perm = list of row indices, where perm[i] is the row of A moved to row i
+        sign = sign of the permutation P (1 or -1)
+        singular = whether A is singular (a zero pivot was met)
+    """
+
+    __slots__ = ("n", "lu", "perm", "sign", "singular")
+
+    def __init__(self, A):
+        if not isinstance(A, M.Matrix):
+            raise TypeError("Can only factor matrices")
+        if A.m != A.n:
+            raise ValueError("LU factorization requires a square matrix")
+
+        n = A.n
+        flat = A._flat()
+        rows = [list(flat[i*n:(i+1)*n]) for i in range(n)]
+        perm = list(range(n))
+        sign = 1
+        singular = False
+
+        for k in Utils.steps(range(n)):
+            # partial pivoting: bring up the row with the largest entry in column k
+            p = max(range(k, n), key=lambda i: abs(rows[i][k]))
+            if Utils.is_zero(rows[p][k]):
+                singular = True
+                continue
+            if p != k:
+                rows[k], rows[p] = rows[p], rows[k]
+                perm[k], perm[p] = perm[p], perm[k]
+                sign = -sign
+
+            pivot_row = rows[k]
+            pivot = pivot_row[k]
+            tail = pivot_row[k+1:]
+            for i in range(k+1, n):
+                row = rows[i]
+                f = row[k] / pivot
+                row[k] = f
+                if f:
+                    row[k+1:] = [x - f*y for x, y in zip(row[k+1:], tail)]
+
+        tc = "d" if A._entry_type() is not None else None
+        self.n = n
+        self.lu = Utils.pack([x for row in rows for x in row], tc)
+        self.perm = perm
+        self.sign = sign
+        self.singular = singular
+
+
+    def det(self):
+        """
+        returns the determinant of the factored matrix
+        """
+        if self.singular:
+            return 0
+        n, lu = self.n, self.lu
+        det = self.sign
+        for i in range(n):
+            det *= lu[i*n + i]
+        return (round(det) if Utils.is_integer(det) else det)
+
+
+    def _solve(self, b):
+        """
+        returns the solution x of A*x = b as a list, by forward substitution
+        through L and back substitution through U
+        """
+        n, lu = self.n, self.lu
+        x = [b[p] for p in self.perm]
+        Kernels.forward_substitution(lu, x, n, unit=True)
+        return Kernels.back_substitution(lu, x, n)
+
+
+    def _check_invertible(self):
+        if self.singular:
+            raise ValueError("Matrix is not invertible")
+
+
+    def solve(self, b):
+        """
+        returns the vector x s.t. A*x = b
+        """
+        if not isinstance(b, V.Vector):
+            raise TypeError("Can only solve for a vector right-hand side")
+        if b.n != self.n:
+            raise ValueError("Size of vector must match size of matrix")
+        self._check_invertible()
+        x = self._solve(b.elems)
+        return V.Vector._wrap(Utils.make_buffer([(round(e) if Utils.is_integer(e) else e) for e in x]))
+
+
+    def solve_many(self, B):
+        """
+        returns the matrix X s.t. A*X = B, solving for every column of B
+        """
+        if not isinstance(B, M.Matrix):
+            raise TypeError("Can only solve for a matrix right-hand side")
+        if B.m != self.n:
+            raise ValueError("Height of right-hand side must match size of matrix")
+        self._check_invertible()
+        cols = [self._solve(B._get(B._col_slice(j))) for j in range(B.n)]
+        return _from_cols(cols, self.n, B.n)
+
+
+    def inverse(self):
+        """
+        returns the inverse of the factored matrix
+        """
+        self._check_invertible()
+        n = self.n
+        cols = []
+        for j in Utils.steps(range(n)):
+            e = [0] * n
+            e[j] = 1
+            cols.append(self._solve(e))
+        return _from_cols(cols, n, n)
+
+
+    def get_L(self):
+        """
+        returns the unit lower triangular factor L
+        """
+        n, lu = self.n, self.lu
+        rows = [[(lu[i*n + j] if j < i else int(i == j)) for j in range(n)] for i in range(n)]
+        return M.Matrix(n, n, rows)
+
+
+    def get_U(self):
+        """
+        returns the upper triangular factor U
+        """
+        n, lu = self.n, self.lu
+        rows = [[(lu[i*n + j] if j >= i else 0) for j in range(n)] for i in range(n)]
+        return M.Matrix(n, n, rows)
+
+
+    def get_P(self):
+        """
+        returns the permutation matrix P
+        """
+        n = self.n
+        P = M.Matrix(n, n)
+        for i, p in enumerate(self.perm):
+            P.edit_entry(i, p, 1)
+        return P
+
+
+def _from_cols(cols, m, n):
+    """
+    returns the m by n matrix with the given list of columns,
+    rounding entries within tolerance of an integer
+    """
+    flat = [(round(x) if Utils.is_integer(x) else x) for i in range(m) for x in (col[i] for col in cols)]
+    return M.Matrix._wrap(m, n, Utils.make_buffer(flat))
+
+
+def lu(A):
+    """
+    returns the LU factorization (with partial pivoting) of a square matrix A,
+    cached until A next changes
+    """
+    if isinstance(A, M.Matrix):
+        return A._cached("lu", lambda: LUFactorization(A))
+    return LUFactorization(A)
@@ -0,0 +1,244 @@
+"""
+Lazy matrix expressions.
+
+Wrapping a matrix with lazy() makes +, -, * and scalar multiplication build
+an expression tree instead of computing a new matrix after every operator.
+Nothing is computed until evaluate() is called, which
+
+    - multiplies each chain of matrix products in the order needing the fewest
+      flops, found from the shapes of its factors (matrix chain ordering)
+    - computes each sum of scaled terms (e.g. 2*A + B - C) in one pass over
+      the entries, without building the intermediate sums
+
+    E = lazy(A)*B*C + D - E
+    result = E.evaluate()
+"""
+
+import operator
+import Matrix as M
+import Vector as V
+import Utils
+
+
+class Expr:
+    """
+    A node of a lazy matrix expression.
+
+        m = number of rows of the result
+        n = number of columns of the result
+    """
+
+    def evaluate(self):
+        """
+        computes the expression, returning a Matrix (or a Vector, for
+        products ending in a vector)
+        """
+        raise NotImplementedError
+
+
+    def __add__(self, A):
+        return _lincomb(self, _node(A), 1)
+
+
+    def __radd__(self, A):
+        return _lincomb(_node(A), self, 1)
+
+
+    def __sub__(self, A):
+        return _lincomb(self, _node(A), -1)
+
+
+    def __rsub__(self, A):
+        return _lincomb(_node(A), self, -1)
+
+
+    def __mul__(self, A):
+        if type(A) == int or type(A) == float:
+            return _scale(self, A)
+        return _matmul(self, _node(A))
+
+
+    def __rmul__(self, A):
+        if type(A) == int or type(A) == float:
+            return _scale(self, A)
+        return _matmul(_node(A), self)
+
+
+    def __neg__(self):
+        return _scale(self, -1)
+
+
+class Leaf(Expr):
+    """
+    A matrix (or a vector, as a matrix of width 1) at a leaf of an expression.
+    """
+
+    def __init__(self, A):
+        if isinstance(A, V.Vector):
+            self.m, self.n = A.n, 1
+        elif isinstance(A, M.Matrix):
+            self.m, self.n = A.m, A.n
+        else:
+            raise TypeError("Can only build lazy expressions from matrices and vectors")
+        self.value = A
+
+
+    def evaluate(self):
+        return self.value
+
+
+    def __str__(self):
+        return f"<{self.m}x{self.n}>"
+
+
+class LinComb(Expr):
+    """
+    A sum of scaled terms, c_1*X_1 + c_2*X_2 + ...
+
+        terms = list of (coefficient, node) pairs
+    """
+
+    def __init__(self, terms):
+        self.terms = terms
+        self.m, self.n = terms[0][1].m, terms[0][1].n
+
+
+    def evaluate(self):
+        results = [node.evaluate() for _, node in self.terms]
+        values = [_as_matrix(x) for x in results]
+        coefs = [c for c, _ in self.terms]
+        flats = [A._flat() for A in values]
+        mul = operator.mul
+        if len(flats) == 1:
+            c = coefs[0]
+            out = [c*x for x in flats[0]]
+        else:
+            out = [sum(map(mul, coefs, xs)) for xs in zip(*flats)]
+        tc = Utils.join_types(*[A._entry_type() for A in values], *[Utils.scalar_type(c) for c in coefs])
+        if all(isinstance(x, V.Vector) for x in results):
+            return V.Vector._wrap(Utils.pack(out, tc))
+        return M.Matrix._wrap(self.m, self.n, Utils.pack(out, tc))
+
+
+    def __str__(self):
+        return "(" + " + ".join((str(node) if c == 1 else f"{c}*{node}") for c, node in self.terms) + ")"
+
+
+class MatMul(Expr):
+    """
+    A chain of matrix products, X_1*X_2*...*X_k.
+
+        factors = list of nodes
+    """
+
+    def __init__(self, factors):
+        self.factors = factors
+        self.m, self.n = factors[0].m, factors[-1].n
+
+
+    def order(self):
+        """
+        returns (flops, split), where flops is the number of multiplications
+        the cheapest order needs and split[i][j] is the factor after which
+        the product of factors i to j is split in that order
+        """
+        k = len(self.factors)
+        dims = [f.m for f in self.factors] + [self.factors[-1].n]
+        cost = [[0] * k for _ in range(k)]
+        split = [[0] * k for _ in range(k)]
+        for length in range(2, k+1):
+            for i in range(k - length + 1):
+                j = i + length - 1
+                best = None
+                for s in range(i, j):
+                    c = cost[i][s] + cost[s+1][j] + dims[i]*dims[s+1]*dims[j+1]
+                    if best is None or c < best:
+                        best, split[i][j] = c, s
+                cost[i][j] = best
+        return cost[0][k-1], split
+
+
+    def evaluate(self):
+        results = [f.evaluate() for f in self.factors]
+        values = [_as_matrix(x) for x in results]
+        _, split = self.order()
+
+        def product(i, j):
+            if i == j:
+                return values[i]
+            s = split[i][j]
+            return product(i, s) * product(s+1, j)
+
+        result = product(0, len(values) - 1)
+        if isinstance(results[-1], V.Vector):
+            return V.Vector._wrap(result._flat_copy())
+        return result
+
+
+    def __str__(self):
+        return "*".join(str(f) for f in self.factors)
+
+
+def lazy(A):
+    """
+    returns a matrix or vector as the leaf of a lazy expression
+    """
+    return Leaf(A)
+
+
+def evaluate(E):
+    """
+    returns the value of a lazy expression (anything else is returned as is)
+    """
+    if isinstance(E, Expr):
+        return E.evaluate()
+    return E
+
+
+def _node(A):
+    if isinstance(A, Expr):
+        return A
+    if isinstance(A, (M.Matrix, V.Vector)):
+        return Leaf(A)
+    raise TypeError("Can only combine lazy expressions with matrices, vectors and scalars")
+
+
+def _as_matrix(A):
+    if isinstance(A, V.Vector):
+        return M.Matrix._wrap(A.n, 1, A.elems)
+    return A
+
+
+def _terms(E):
+    if isinstance(E, LinComb):
+        return E.terms
+    return [(1, E)]
+
+
+def _lincomb(A, B, sign):
+    if A.m != B.m or A.n != B.n:
+        raise ValueError("Can only add matrices of same dimensions")
+    return LinComb(_terms(A) + [(sign*c, node) for c, node in _terms(B)])
+
+
+def _scale(A, k):
+    return LinComb([(k*c, node) for c, node in _terms(A)])
+
+
+def _matmul(A, B):
+    """
+    returns the lazy product A*B, flattening chains and pulling scalar
+    factors out of single-term sums
+    """
+    if A.n != B.m:
+        raise ValueError("Width of left matrix must match height of right matrix")
+    coef = 1
+    factors = []
+    for X in (A, B):
+        if isinstance(X, LinComb) and len(X.terms) == 1:
+            c, X = X.terms[0]
+            coef *= c
+        factors.extend(X.factors if isinstance(X, MatMul) else [X])
+    if coef == 1:
+        return MatMul(factors)
+    return LinComb([(coef, MatMul(factors))])
@@ -1,5 +1,18 @@
+from array import array
+from itertools import chain, repeat
+import operator
 import Vector as V
 import Utils
+import Kernels
+import LU
+import Exact
+import Backend
+import Sparse
+import Lazy
+import Structured
+import Parallel
+import Cache
+import Format
 
 class Matrix:
     """
@@ -7,61 +20,330 @@ class Matrix:
     
         m = number of rows
         n = number of columns
-        rows = list of m vectors of size n
         aug = number of augmented columns (0 if matrix is not augmented)
+        data = flat buffer holding the entries, shared with any views of the matrix
+        offset = position of entry (0, 0) in data
+        strides = steps through data between consecutive rows and columns, so
+                  entry (i, j) is data[offset + i*strides[0] + j*strides[1]]
+        base = the matrix that owns data (the matrix itself, unless it is a view)
+
+    Rows, columns, submatrices and the halves of an augmented matrix are views:
+    they share data with the matrix they came from, and writing to one writes
+    to the other. Use copy() to get an independent matrix.
+
+    Transposes, determinants, LU factorizations, ranks and inverses are cached
+    until the matrix next changes (see Cache). A transpose or inverse served
+    from the cache is a copy, so callers never share a mutable result.
     """
 
+    __slots__ = ("m", "n", "aug", "offset", "strides", "base", "_data", "_version", "_cache", "_key")
+
     def __init__(self, m, n, lst=None, aug=0):
         
         self.m = m
         self.n = n
         self.aug = aug
+        self.offset = 0
+        self.strides = (n, 1)
+        self.base = self
+        self._version = 0
+        self._cache = None
+        self._key = None
 
         if lst:
             if m != len(lst):
                 raise ValueError(f"Number of row vectors does not match matrix dimension (expected {m}, got {len(lst)})")
 
-
-        self.rows = []
         if lst:
+            flat = []
             for i in range(m):
                 if isinstance(lst[i], V.Vector):
                     if lst[i].n != n:
-                        raise ValueError(f"Length of matrix rows does not match provided dimension (expected {n}, got {len(lst[i])})")
-                    self.rows.append(lst[i].copy())
+                        raise ValueError(f"Length of matrix rows does not match provided dimension (expected {n}, got {lst[i].n})")
+                    flat.extend(lst[i].elems)
                 else:
                     if len(lst[i]) != n:
                         raise ValueError(f"Length of matrix rows does not match provided dimension (expected {n}, got {len(lst[i])})")
-                    self.rows.append(V.Vector(n, lst[i]))
+                    flat.extend([(round(x) if Utils.is_integer(x) else x) for x in lst[i]])
+            self._data = Backend.adopt(Utils.make_buffer(flat))
         else:
-            for i in range(m):
-                self.rows.append(V.Vector(n))
+            self._data = Backend.adopt(Utils.zeros(m*n))
+
+
+    @classmethod
+    def _wrap(cls, m, n, buf, aug=0):
+        """
+        returns an m by n matrix backed directly by the row-major buffer buf,
+        skipping validation and rounding. only for trusted results; buf is not copied
+        """
+        A = cls.__new__(cls)
+        A.m, A.n, A.aug = m, n, aug
+        A.offset = 0
+        A.strides = (n, 1)
+        A.base = A
+        A._data = buf
+        A._version = 0
+        A._cache = None
+        A._key = None
+        return A
+
+
+    @classmethod
+    def from_rows(cls, rows, m=None, n=None, aug=0):
+        """
+        returns the matrix with the rows (vectors or iterables of numbers) of
+        the iterable rows, which is consumed one row at a time. each row is
+        appended straight into the flat buffer: one of m*n entries if m is
+        given, otherwise one that grows as rows arrive
+        """
+        builder = _RowBuilder(m, n)
+        for row in rows:
+            builder.append(row.elems if isinstance(row, V.Vector) else row)
+        return builder.build(aug)
+
+
+    def _view(self, offset, m, n, strides, aug=0):
+        """
+        returns an m by n matrix sharing data with this one
+        """
+        A = Matrix.__new__(Matrix)
+        A.m, A.n, A.aug = m, n, aug
+        A.offset = offset
+        A.strides = strides
+        A.base = self.base
+        A._version = 0
+        A._cache = None
+        A._key = None
+        return A
+
+
+    @property
+    def data(self):
+        return self.base._data
+
+
+    @property
+    def backend(self):
+        """
+        the backend the matrix is using ("python" or "numpy")
+        """
+        return Backend.backend_of(self)
+
+
+    @property
+    def frozen(self):
+        """
+        whether the matrix (or the matrix it is a view of) is frozen
+        """
+        return self.base._key is not None
+
+
+    def freeze(self):
+        """
+        makes a matrix, and every matrix sharing its data, immutable: mutators
+        throw an error from then on. returns the matrix. the derived
+        quantities of frozen matrices are kept in the global cache, shared by
+        all frozen matrices with the same entries (see Cache)
+        """
+        base = self.base
+        if base._key is None:
+            base._key = Cache.content_key(base, self.backend)
+        if self._key is None:
+            self._key = Cache.content_key(self, self.backend)
+        return self
+
+
+    def invalidate(self):
+        """
+        drops the cached quantities of a matrix and every matrix sharing its
+        data. needed only after writing to the entries other than through the
+        mutators or a row or column vector (e.g. through data)
+        """
+        self._modified()
+
+
+    def _modified(self):
+        """
+        records that the entries are about to change, so quantities cached
+        from them are no longer used. throws an error for frozen matrices
+        """
+        base = self.base
+        if base._key is not None:
+            raise ValueError("Cannot modify a frozen matrix")
+        base._version += 1
+
+
+    def _cached(self, key, compute, copy=False):
+        """
+        returns compute(), cached under key until the matrix next changes.
+        with copy, a matrix served again from the cache is a copy of it, so
+        no two callers ever hold the same mutable result (the results of
+        frozen matrices are frozen, and shared)
+        """
+        if not Cache.ENABLED:
+            return compute()
+        if self._key is not None:
+            full_key = (self._key, key)
+            value = Cache.CACHE.get(full_key, Cache)    # the module stands in for a miss
+            if value is Cache:
+                value = compute()
+                if isinstance(value, Matrix):
+                    value.freeze()
+                Cache.CACHE.put(full_key, value, Cache.size_of(value))
+            return value
+
+        version = self.base._version
+        entry = self._cache.get(key) if self._cache is not None else None
+        if entry is not None and entry[0] == version and entry[2] == _version_of(entry[1]):
+            return entry[1].copy() if copy else entry[1]
+        value = compute()
+        if self._cache is None:
+            self._cache = {}
+        self._cache[key] = (version, value, _version_of(value))
+        return value
+
+
+    def _widen(self, x):
+        """
+        makes sure the data buffer can store the scalar x
+        """
+        self.base._data = Utils.widen(self.base._data, x)
+
+
+    def is_contiguous(self):
+        """
+        returns whether the entries of a matrix are laid out row after row,
+        with no gaps, in its data buffer
+        """
+        return self.strides[1] == 1 and (self.strides[0] == self.n or self.m <= 1)
+
+
+    def _row_slice(self, i):
+        """
+        returns the slice of the data buffer holding row i
+        """
+        if i < 0:
+            i += self.m
+        if not 0 <= i < self.m:
+            raise IndexError("index out of range")
+        rs, cs = self.strides
+        start = self.offset + i*rs
+        return slice(start, start + (self.n - 1)*cs + 1, cs)
+
+
+    def _col_slice(self, j):
+        """
+        returns the slice of the data buffer holding column j
+        """
+        if j < 0:
+            j += self.n
+        if not 0 <= j < self.n:
+            raise IndexError("index out of range")
+        rs, cs = self.strides
+        start = self.offset + j*cs
+        return slice(start, start + (self.m - 1)*rs + 1, rs)
+
+
+    def _get(self, sl):
+        """
+        returns a copy of the entries in the slice sl of the data buffer
+        """
+        seg = self.data[sl]
+        if isinstance(seg, (array, list)):
+            return seg
+        return Utils.copy_buffer(seg)
+
+
+    def _set(self, sl, values):
+        """
+        writes the trusted values into the slice sl of the data buffer,
+        switching to a generic buffer if they overflow it
+        """
+        data = self.data
+        tc = Utils.typecode(data)
+        if tc is None:
+            data[sl] = list(values)
+            return
+        buf = Utils.pack(values, tc)
+        if Utils.typecode(buf) != tc:
+            data = self.base._data = Utils.to_generic(data)
+        data[sl] = buf
+
+
+    def _assign(self, values, tc):
+        """
+        writes the trusted row-major values, of typecode tc, over the entries
+        of a matrix in place (so a view writes through to the matrix it came from)
+        """
+        self._modified()
+        self.base._data = Utils.widen_to(self.base._data, tc)
+        if self.is_contiguous():
+            self._set(slice(self.offset, self.offset + self.m*self.n), values)
+            return
+        values = list(values)
+        n = self.n
+        for i in range(self.m):
+            self._set(self._row_slice(i), values[i*n:(i+1)*n])
+
+
+    def _flat(self):
+        """
+        returns the entries of a matrix in row-major order. may return the data
+        buffer itself, so the result must not be modified
+        """
+        data = self.data
+        if self.is_contiguous():
+            if self.offset == 0 and len(data) == self.m*self.n:
+                return data
+            return data[self.offset:self.offset + self.m*self.n]
+        return Utils.concat((data[self._row_slice(i)] for i in range(self.m)), Utils.typecode(data))
+
+
+    def _flat_copy(self):
+        """
+        returns a new buffer holding the entries of a matrix in row-major order
+        """
+        data = self.data
+        if self.is_contiguous():
+            seg = data[self.offset:self.offset + self.m*self.n]
+            if isinstance(seg, (array, list)):
+                return seg
+            return Utils.copy_buffer(seg)
+        return Utils.concat((data[self._row_slice(i)] for i in range(self.m)), Utils.typecode(data))
+
+
+    def _entry_type(self):
+        return Utils.typecode(self.data)
 
 
     def __add__(self, A):
         if not isinstance(A, Matrix):
+            if isinstance(A, (Lazy.Expr, Sparse.SparseMatrix, Structured.StructuredMatrix)):
+                return NotImplemented
             raise TypeError("Can only add matrices to matrices")
 
         if self.m != A.m or self.n != A.n:
             raise ValueError("Can only add matrices of same dimensions")
         
-        B = []
-        for i in range(self.m):
-            B.append(self.rows[i] + A.rows[i])
-        return Matrix(self.m, self.n, B)
+        if Backend.active(self, A):
+            return Backend.add(self, A)
+        tc = Utils.join_types(self._entry_type(), A._entry_type())
+        return Matrix._wrap(self.m, self.n, Utils.pack(map(operator.add, self._flat(), A._flat()), tc))
     
 
     def __sub__(self, A):
         if not isinstance(A, Matrix):
+            if isinstance(A, (Lazy.Expr, Sparse.SparseMatrix, Structured.StructuredMatrix)):
+                return NotImplemented
             raise TypeError("Can only subtract matrices from matrices")
         
         if self.m != A.m or self.n != A.n:
             raise ValueError("Can only subtract matrices of same dimensions.")
         
-        B = []
-        for i in range(self.m):
-            B.append(self.rows[i] - A.rows[i])
-        return Matrix(self.m, self.n, B)
+        if Backend.active(self, A):
+            return Backend.sub(self, A)
+        tc = Utils.join_types(self._entry_type(), A._entry_type())
+        return Matrix._wrap(self.m, self.n, Utils.pack(map(operator.sub, self._flat(), A._flat()), tc))
     
 
     def __mul__(self, A):
@@ -69,34 +351,75 @@ class Matrix:
             m, p = self.m, A.n
             if self.n != A.m:
                 raise ValueError("Width of left matrix must match height of right matrix")
-            B = [[] for i in range(m)]
-            At = trans(A)
-            for i in range(m):
-                for j in range(p):
-                    B[i].append(self.rows[i].dot(At.rows[j]))
-            return Matrix(m, p, B)
+            if Backend.active(self, A):
+                return Backend.mul(self, A)
+            tc = Utils.join_types(self._entry_type(), A._entry_type())
+            B = Parallel.matmul(self._flat(), A._flat(), m, self.n, p, tc)
+            return Matrix._wrap(m, p, Utils.pack(B, tc))
         elif isinstance(A, V.Vector):
             if self.n != A.n:
                 raise ValueError("Size of vector must match width of matrix")
-            return V.Vector(self.m, [row.dot(A) for row in self.rows])
+            if Backend.active(self, A):
+                return Backend.mul(self, A)
+            v = Kernels.matvec(self._flat(), A.elems, self.m, self.n)
+            tc = Utils.join_types(self._entry_type(), Utils.typecode(A.elems))
+            return V.Vector._wrap(Utils.pack(v, tc))
+        elif isinstance(A, Sparse.SparseMatrix):
+            return A.__rmul__(self)
+        elif isinstance(A, (Lazy.Expr, Structured.StructuredMatrix)):
+            return NotImplemented
         raise TypeError("Can only multiply a matrix by a matrix or a vector")       
         
 
+    def __iadd__(self, A):
+        if isinstance(A, Lazy.Expr):
+            return NotImplemented
+        return add(self, A, out=self)
+
+
+    def __isub__(self, A):
+        if isinstance(A, Lazy.Expr):
+            return NotImplemented
+        return sub(self, A, out=self)
+
+
+    def __imul__(self, A):
+        """
+        scales a matrix by a scalar, or multiplies it by a square matrix, in place
+        """
+        if type(A) == int or type(A) == float:
+            tc = Utils.join_types(self._entry_type(), Utils.scalar_type(A))
+            self._assign([x*A for x in self._flat()], tc)
+            return self
+        if isinstance(A, Matrix):
+            if A.m != A.n:
+                raise ValueError("Can only multiply a matrix in place by a square matrix")
+            return mul(self, A, out=self)
+        if isinstance(A, Lazy.Expr):
+            return NotImplemented
+        raise TypeError("Can only multiply a matrix in place by a scalar or a matrix")
+
+
     def __eq__(self, A):
         if isinstance(A, Matrix):
             if (self.m != A.m) or (self.n != A.n):
                 return False
-            for i in range(self.m):
-                if self.rows[i] != A.rows[i]:
+            a, b = self._flat(), A._flat()
+            if isinstance(a, array) and isinstance(b, array):
+                return a == b    # compared without leaving C
+            for x, y in zip(a, b):
+                if x != y:
                     return False
             return True
         if isinstance(A, V.Vector):   # treats vectors as a matrix of width 1
             if (self.m != A.n) or (self.n != 1):
                 return False
-            for i in range(self.m):
-                if self.rows[i].elems[0] != A.elems[i]:
+            for x, y in zip(self._get(self._col_slice(0)), A.elems):
+                if x != y:
                     return False
             return True
+        if isinstance(A, (Sparse.SparseMatrix, Structured.StructuredMatrix)):
+            return NotImplemented
         return False
 
 
@@ -105,35 +428,79 @@ class Matrix:
 
 
     def __str__(self):
-        # find max number of digits in any number
-        c = 2
-        for i in range(self.m):
-            for j in range(self.n):
-                elem = self.rows[i].elems[j]
-                if type(elem) != float:
-                    l = len(str(elem)) + 1
-                else:
-                    s = str(elem)
-                    s = s[:s.index(".")+3]
-                    l = len(s) + 1
-                if l > c:
-                    c = l
-        
-        # print each row vector
-        aug_index = self.n - self.aug
-        s = ""
-        for i in range(self.m):
-            s += "["
-            for j in range(self.n):
-                if j == aug_index:
-                    s += " |"
-                elem = self.rows[i].elems[j]
-                if type(elem) == float:
-                    s += f"{elem:>{c}.{2}f}"
-                else:
-                    s += f"{elem:>{c}}"
-            s += " ]\n"
-        return s
+        return Format.format_matrix(self)
+
+
+    def write_to(self, file):
+        """
+        writes the whole matrix, however large, to file (a path or a text file
+        object) a row at a time, laid out as str() lays it out
+        """
+        Format.write_to(self, file)
+
+
+    @property
+    def rows(self):
+        """
+        sequence of the m rows of a matrix, as vector views.
+        assigning a vector to one of them writes it into the matrix
+        """
+        return _Rows(self)
+
+
+    def row(self, i):
+        """
+        returns row i of a matrix as a vector sharing its data.
+        (matrices holding generic entries, e.g. Fractions, return a copy)
+        """
+        return self._vector_view(self._row_slice(i))
+
+
+    def col(self, j):
+        """
+        returns column j of a matrix as a vector sharing its data.
+        (matrices holding generic entries, e.g. Fractions, return a copy)
+        """
+        return self._vector_view(self._col_slice(j))
+
+
+    def _vector_view(self, sl):
+        data = self.data
+        if isinstance(data, list):
+            return V.Vector._wrap(data[sl])
+        v = V.Vector._wrap(self._view_elems(sl))
+        v.base, v._slice, v._source = self.base, sl, data
+        return v
+
+
+    def _view_elems(self, sl):
+        """
+        returns the elements of the slice sl of the data buffer, shared with it
+        unless the matrix holds generic entries. shared elements are read-only,
+        so writes go through the vector's methods, which invalidate the cache
+        """
+        data = self.data
+        if isinstance(data, (array, memoryview)):    # memoryviews of memory-mapped files too
+            return memoryview(data)[sl].toreadonly()
+        elems = data[sl]
+        if not isinstance(data, list):    # NumPy arrays
+            elems.flags.writeable = False
+        return elems
+
+
+    def _write_view(self, sl, values, tc):
+        """
+        writes the trusted values, of typecode tc, into the slice sl of the
+        data buffer for a row or column view, widening the buffer if needed.
+        throws an error for values that overflow 64 bits, which no view can hold
+        """
+        data = Utils.widen_to(self.data, tc)
+        buf = Utils.pack(values, Utils.typecode(data))
+        if Utils.typecode(buf) != Utils.typecode(data):
+            raise TypeError("Entries beyond 64 bits cannot be written through a row or column vector")
+        self._modified()
+        self.base._data = data
+        data[sl] = buf
 
 
     def at(self, i, j):
@@ -142,14 +509,20 @@ class Matrix:
         """
         if i >= self.m:
             raise ValueError("index out of range")
-        return self.rows[i].at(j)
+        if i < 0:
+            i += self.m
+        if j < 0:
+            j += self.n
+        if i < 0 or not 0 <= j < self.n:
+            raise IndexError("index out of range")
+        return self.data[self.offset + i*self.strides[0] + j*self.strides[1]]
 
 
     def copy(self):
         """
         returns a deep copy of a matrix
         """
-        return Matrix(self.m, self.n, lst=self.rows, aug=self.aug)
+        return Matrix._wrap(self.m, self.n, self._flat_copy(), aug=self.aug)
 
 
     def swap_rows_ip(self, a, b):
@@ -158,9 +531,11 @@ class Matrix:
         """
         if (type(a) != int) or (type(b) != int):
             raise TypeError("Row numbers must be ints")
-        temp = self.rows[a]
-        self.rows[a] = self.rows[b]
-        self.rows[b] = temp
+        sa, sb = self._row_slice(a), self._row_slice(b)
+        self._modified()
+        row_a, row_b = self._get(sa), self._get(sb)
+        self.data[sa] = row_b
+        self.data[sb] = row_a
     
 
     def swap_cols_ip(self, a, b):
@@ -169,10 +544,11 @@ class Matrix:
         """
         if (type(a) != int) or (type(b) != int):
             raise TypeError("Row numbers must be ints")
-        col_a = [row.elems[a] for row in self.rows]
-        for i in range(self.m):
-            self.rows[i].elems[a] = self.rows[i].elems[b]
-            self.rows[i].elems[b] = col_a[i]
+        sa, sb = self._col_slice(a), self._col_slice(b)
+        self._modified()
+        col_a, col_b = self._get(sa), self._get(sb)
+        self.data[sa] = col_b
+        self.data[sb] = col_a
 
 
     def row_add(self, a, b, s=1):
@@ -183,7 +559,11 @@ class Matrix:
             raise TypeError("Row numbers must be ints")
         if (type(s) != int) and (type(s) != float):
             raise TypeError("Scaling factor must be a number")
-        self.rows[b] += self.rows[a].times(s)
+        sa, sb = self._row_slice(a), self._row_slice(b)
+        self._modified()
+        self._widen(s)
+        data = self.data
+        self._set(sb, Utils.axpy(s, data[sa], data[sb]))
 
 
     def row_scale(self, a, s):
@@ -194,7 +574,10 @@ class Matrix:
             raise TypeError("Row number must be int")
         if (type(s) != int) and (type(s) != float):
             raise TypeError("Scaling factor must be a number")
-        self.rows[a] = self.rows[a].times(s)
+        sa = self._row_slice(a)
+        self._modified()
+        self._widen(s)
+        self._set(sa, [x*s for x in self.data[sa]])
 
 
     def edit_entry(self, i, j, k):
@@ -203,13 +586,20 @@ class Matrix:
         """
         if (type(i) != int) or (type(j) != int):
             raise TypeError("Row and column numbers must be ints")
-        self.rows[i].elems[j] = k
+        sl = self._row_slice(i)
+        if j < 0:
+            j += self.n
+        if not 0 <= j < self.n:
+            raise IndexError("index out of range")
+        self._modified()
+        self._widen(k)
+        self.data[sl.start + j*self.strides[1]] = k
 
 
     def submatrix(self, pos, size):
         """
-        grabs a submatrix of a matrix starting at entry (pos[0], pos[1])
-        and of size size[0] by size[1]
+        returns a view of the submatrix of a matrix starting at entry
+        (pos[0], pos[1]) and of size size[0] by size[1]
         """
         x, y = pos[0], pos[1]
         dx, dy = size[0], size[1]
@@ -219,32 +609,70 @@ class Matrix:
             x + dx > self.m or y + dy > self.n):
             raise ValueError("Cannot grab submatrix that exceeds matrix bounds")
         
-        lst = []
-        for i in range(x, x+dx):
-            lst.append(self.rows[i].elems[y:y+dy])
-        
-        return Matrix(dx, dy, lst)
+        rs, cs = self.strides
+        return self._view(self.offset + x*rs + y*cs, dx, dy, self.strides)
 
 
-    def det(self):
+    def det(self, exact=None):
         """
-        returns the determinant of a matrix
+        returns the determinant of a matrix. exact picks fraction-free
+        elimination with no rounding; by default it is used for matrices
+        of integers (or other exact entries, e.g. Fractions)
         """
         if self.m != self.n:
             raise ValueError("Determinant can only be calculated for square matrices")
         
-        U, _, d = ref(self)
-        det = 1
-        for i in range(self.m):
-            det *= U.at(i,i)
-        
-        det /= d
-        return (round(det) if Utils.is_integer(det) else det)
+        if exact is None:
+            exact = self._entry_type() != "d" and not Backend.active(self)
+        return self._cached(("det", exact), lambda: _det(self, exact))
+
+
+    def is_zero(self, tol=1e-9):
+        """
+        returns whether every entry of a matrix is within tol of zero,
+        stopping at the first row that isn't
+        """
+        return all(Utils.all_zero(self._get(self._row_slice(i)), tol) for i in range(self.m))
+
+
+    def is_identity(self, tol=1e-9):
+        """
+        returns whether a matrix is within tol of an identity matrix, entry by
+        entry, stopping at the first row that isn't. no identity matrix is built
+        """
+        if self.m != self.n:
+            return False
+        n = self.n
+        for i in range(n):
+            row = self._get(self._row_slice(i))
+            if not abs(row[i] - 1) <= tol:
+                return False
+            if not (Utils.all_zero(row[:i], tol) and Utils.all_zero(row[i+1:], tol)):
+                return False
+        return True
+
+
+    def fingerprint(self):
+        """
+        returns a stable hash (a hex string) of the shape, entry type and
+        entries of a matrix: the same for equal entries however they are
+        stored (views, backends) and across runs, so it can key caches or
+        find duplicates without comparing entries
+        """
+        return self._cached("fingerprint", lambda: Utils.fingerprint(self._flat(), (self.m, self.n)))
+
+
+    def rank(self):
+        """
+        returns the rank of a matrix: the number of pivots of its row echelon
+        form, found exactly for matrices of integers (or other exact entries)
+        """
+        return self._cached("rank", lambda: _rank(self))
 
 
     def get_non_augmented(self):
         """
-        returns the first half of an augmented matrix
+        returns a view of the first half of an augmented matrix
         """
         if self.aug == 0:
             raise ValueError("Matrix is not augmented")
@@ -253,36 +681,267 @@ class Matrix:
 
     def get_augmented(self):
         """
-        returns the second half of an augmented matrix
+        returns a view of the second half of an augmented matrix
         """
         if self.aug == 0:
             raise ValueError("Matrix is not augmented")
         return self.submatrix((0, self.n-self.aug), (self.m, self.aug))
 
 
-def trans(A):
+def _version_of(value):
     """
-    returns the transpose of A
+    returns the version of a cached matrix (None for other values), to tell
+    whether it has been modified since it was cached
     """
-    if isinstance(A, Matrix):
-        rows = [[] for _ in range(A.n)]
-        for i in range(A.m):
-            for j in range(A.n):
-                rows[j].append(A.rows[i].elems[j])
-        return Matrix(A.n, A.m, rows)
-    if isinstance(A, V.Vector):
-        return Matrix(1, A.n, [V.Vector(1, [elem]) for elem in A.elems])
-    raise TypeError("Transpose can only be found for matrices and vectors")
+    return value.base._version if isinstance(value, Matrix) else None
+
+
+def _det(A, exact):
+    if exact:
+        return Exact.det(A)
+    if Backend.active(A):
+        return Backend.det(A)
+    return LU.lu(A).det()
+
+
+def _rank(A):
+    if A._entry_type() != "d" and not Backend.active(A):
+        return Exact.rank(A)
+    U = ref(A)[0]
+    return sum(1 for i in range(U.m) if not all(Utils.is_zero(x) for x in U._get(U._row_slice(i))))
+
+
+class _Rows:
+    """
+    The rows of a matrix, as returned by Matrix.rows: indexing gives a row
+    as a vector view, and assigning a vector to an index overwrites that row.
+    """
+
+    __slots__ = ("A",)
+
+    def __init__(self, A):
+        self.A = A
+
+
+    def __len__(self):
+        return self.A.m
+
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.A.row(k) for k in range(*i.indices(self.A.m))]
+        return self.A.row(i)
+
+
+    def __setitem__(self, i, v):
+        A = self.A
+        if not isinstance(v, V.Vector):
+            raise TypeError("Rows can only be set to vectors")
+        if v.n != A.n:
+            raise ValueError("Vector length must match width of matrix")
+        sl = A._row_slice(i)
+        A._modified()
+        A.base._data = Utils.widen_to(A.base._data, Utils.typecode(v.elems))
+        A._set(sl, v.elems)
+
+
+    def __iter__(self):
+        return (self.A.row(i) for i in range(self.A.m))
+
+
+class _RowBuilder:
+    """
+    Collects rows one at a time into a single flat buffer, widening its type
+    as entries need it.
+
+        m = number of rows expected (None if unknown)
+        n = length of the rows (None until the first row arrives)
+        count = number of rows so far
+        buf = flat buffer of the rows so far: preallocated for m rows if m is
+              known, otherwise grown on every append
+    """
+
+    def __init__(self, m=None, n=None):
+        self.m = m
+        self.n = n
+        self.count = 0
+        self.buf = Utils.zeros(m*n) if (m is not None and n is not None) else array("q")
+
+
+    def append(self, row):
+        """
+        appends a row of numbers, rounding entries within tolerance of an integer
+        """
+        vals = [(round(x) if Utils.is_integer(x) else x) for x in row]
+        if self.n is None:
+            self.n = len(vals)
+            if self.m is not None:
+                self.buf = Utils.zeros(self.m*self.n)
+        elif len(vals) != self.n:
+            raise ValueError(f"Length of matrix rows does not match provided dimension (expected {self.n}, got {len(vals)})")
+        if self.m is not None and self.count >= self.m:
+            raise ValueError(f"Number of row vectors does not match matrix dimension (expected {self.m}, got more)")
+
+        buf = self.buf = Utils.widen_to(self.buf, Utils.join_types(*{Utils.scalar_type(x) for x in vals}))
+        tc = Utils.typecode(buf)
+        if self.m is None:
+            try:
+                buf.extend(vals)
+            except OverflowError:
+                self.buf = list(buf)
+                self.buf.extend(vals)
+        else:
+            sl = slice(self.count*self.n, (self.count + 1)*self.n)
+            new = Utils.pack(vals, tc)
+            if tc is not None and Utils.typecode(new) != tc:    # overflowed 64 bits
+                buf = self.buf = list(buf)
+            buf[sl] = new
+        self.count += 1
+
+
+    def build(self, aug=0):
+        """
+        returns the matrix of the rows appended
+        """
+        if self.m is not None and self.count != self.m:
+            raise ValueError(f"Number of row vectors does not match matrix dimension (expected {self.m}, got {self.count})")
+        return Matrix._wrap(self.count, self.n or 0, Backend.adopt(self.buf), aug=aug)
+
+
+def _normalize(A):
+    """
+    rounds entries of A that are within tolerance of an integer, in place.
+    done in one pass at the end of an elimination, rather than on every row operation.
+    A must own its data
+    """
+    A._data = Utils.make_buffer([(round(x) if Utils.is_integer(x) else x) for x in A._flat()])
+
+
+def trans(A, out=None):
+    """
+    returns the transpose of A, written into the matrix out if given
+    """
+    if isinstance(A, (Sparse.SparseMatrix, Structured.StructuredMatrix)) and out is None:
+        return A.trans()
+    if out is not None or not Backend.active(A):
+        if isinstance(A, Matrix):
+            if out is None:
+                return A._cached("trans", lambda: Matrix._wrap(A.n, A.m, Parallel.trans(A._flat(), A.m, A.n)), copy=True)
+            T = Matrix._wrap(A.n, A.m, Parallel.trans(A._flat(), A.m, A.n))
+            return _into(out, T)
+        if isinstance(A, V.Vector):   # treats vectors as a matrix of width 1
+            return _into(out, Matrix._wrap(1, A.n, Utils.copy_buffer(A.elems)))
+        raise TypeError("Transpose can only be found for matrices and vectors")
+    return A._cached("trans", lambda: Backend.trans(A), copy=True)
+
+
+def add(A, B, out=None):
+    """
+    returns A + B, written into the matrix out if given (which may be A or B)
+    """
+    if out is None or Backend.active(A, B):
+        return _into(out, A + B)
+    if not isinstance(A, Matrix) or not isinstance(B, Matrix):
+        raise TypeError("Can only add matrices to matrices")
+    if A.m != B.m or A.n != B.n:
+        raise ValueError("Can only add matrices of same dimensions")
+    _check_out(out, A.m, A.n)
+    out._assign(map(operator.add, A._flat(), B._flat()), Utils.join_types(A._entry_type(), B._entry_type()))
+    return out
+
+
+def sub(A, B, out=None):
+    """
+    returns A - B, written into the matrix out if given (which may be A or B)
+    """
+    if out is None or Backend.active(A, B):
+        return _into(out, A - B)
+    if not isinstance(A, Matrix) or not isinstance(B, Matrix):
+        raise TypeError("Can only subtract matrices from matrices")
+    if A.m != B.m or A.n != B.n:
+        raise ValueError("Can only subtract matrices of same dimensions.")
+    _check_out(out, A.m, A.n)
+    out._assign(map(operator.sub, A._flat(), B._flat()), Utils.join_types(A._entry_type(), B._entry_type()))
+    return out
+
+
+def mul(A, B, out=None):
+    """
+    returns A*B, written into out if given (a matrix, or a vector when B is a
+    vector). out may be A or B: the product is computed before it is written
+    """
+    if out is None or Backend.active(A, B) or not isinstance(A, Matrix):
+        return _into(out, A * B)
+    if isinstance(B, Matrix):
+        if A.n != B.m:
+            raise ValueError("Width of left matrix must match height of right matrix")
+        _check_out(out, A.m, B.n)
+        tc = Utils.join_types(A._entry_type(), B._entry_type())
+        out._assign(Parallel.matmul(A._flat(), B._flat(), A.m, A.n, B.n, tc), tc)
+        return out
+    if isinstance(B, V.Vector):
+        if A.n != B.n:
+            raise ValueError("Size of vector must match width of matrix")
+        V._check_out(out, A.m)
+        values = Kernels.matvec(A._flat(), B.elems, A.m, A.n)
+        out._assign(values, Utils.join_types(A._entry_type(), Utils.typecode(B.elems)))
+        return out
+    return _into(out, A * B)
+
+
+def _check_out(out, m, n):
+    if not isinstance(out, Matrix):
+        raise TypeError("out must be a matrix")
+    if out.m != m or out.n != n:
+        raise ValueError(f"out must be {m} by {n} (got {out.m} by {out.n})")
+
+
+def _into(out, R):
+    """
+    returns the result R, or writes it into out (if given) and returns out
+    """
+    if out is None:
+        return R
+    if isinstance(R, V.Vector):
+        V._check_out(out, R.n)
+        out._assign(R.elems, Utils.typecode(R.elems))
+        return out
+    if not isinstance(R, Matrix):
+        raise TypeError("out is only supported for dense results")
+    _check_out(out, R.m, R.n)
+    out._assign(R._flat(), R._entry_type())
+    return out
+
+
+def allclose(A, B, rtol=1e-05, atol=1e-08):
+    """
+    returns whether A and B (both matrices or both vectors) have the same
+    shape and every pair of entries is close, |a - b| <= atol + rtol*|b|.
+    stops at the first pair that isn't
+    """
+    if isinstance(A, Matrix) and isinstance(B, Matrix):
+        if A.m != B.m or A.n != B.n:
+            return False
+        a, b = A._flat(), B._flat()
+    elif isinstance(A, V.Vector) and isinstance(B, V.Vector):
+        if A.n != B.n:
+            return False
+        a, b = A.elems, B.elems
+    else:
+        raise TypeError("Can only compare two matrices or two vectors")
+    if isinstance(a, array) and isinstance(b, array) and a == b:
+        return True
+    return all(map(Utils.isclose, a, b, repeat(rtol), repeat(atol)))
 
 
 def identity_matrix(n):
     """
-    returns an identity matrix of size n
+    returns an identity matrix of size n (see Structured.identity for one
+    storing only its diagonal)
     """
-    rows = []
-    for i in range(n):
-        rows.append([(1 if i==j else 0) for j in range(n)])
-    return Matrix(n, n, rows)
+    I = Matrix(n, n)
+    I.data[::n+1] = array("q", [1]) * n
+    return I
 
 
 def swap_rows(M, a, b):
@@ -311,26 +970,98 @@ def augment(A, b):
     """
     if not isinstance(A, Matrix):
         raise TypeError("Can only augment matrices")
-    lst = []
     if isinstance(b, Matrix):
         if A.m != b.m:
             raise ValueError("Can only augment using matrices with same number of rows")
-        for i in range(A.m):
-            lst.append(A.rows[i].elems + b.rows[i].elems)
         aug = b.n
+        rows = (A._get(A._row_slice(i)) for i in range(A.m))
+        extra = (b._get(b._row_slice(i)) for i in range(A.m))
+        tc = Utils.join_types(A._entry_type(), b._entry_type())
     elif isinstance(b, V.Vector):
         if A.m != b.n:
             raise ValueError("Can only augment matrix of size m by n with vector of size m")
-        for i in range(A.m):
-            lst.append(A.rows[i].elems + [b.elems[i]])
         aug = 1
+        rows = (A._get(A._row_slice(i)) for i in range(A.m))
+        extra = ([x] for x in b.elems)
+        tc = Utils.join_types(A._entry_type(), Utils.typecode(b.elems))
     else:
         raise TypeError("Can only augment using matrices or vectors")
-        
-    return Matrix(A.m, A.n + aug, lst, aug=aug)
+
+    lst = Utils.concat(chain.from_iterable(zip(rows, extra)), tc)
+    return Matrix._wrap(A.m, A.n + aug, lst, aug=aug)
 
 
-def ref(A, elim_matrix=False):
+def _eliminate(U, E=None, reduce=False):
+    """
+    gaussian elimination on U in place, updating its flat buffer directly
+    rather than through row operations. with reduce, goes on to the reduced
+    row echelon form. U must own its data. returns (E, d), E having every
+    forward row operation applied to it (if given) and d being the
+    determinant scaling factor.
+    the row updates run across worker processes for large enough float
+    matrices (see Parallel), and progress is reported at each pivot column
+    (see Utils.set_progress)
+    """
+    m, n = U.m, U.n
+    data = U._data = Utils.widen_to(U._data, "d")
+    shared = None
+    if E is None and Parallel.split(m) and Utils.typecode(data) == "d":
+        shared = Parallel.SharedRows(data, m, n)
+        data = shared.data
+        eliminate_rows = shared.eliminate_rows
+    else:
+        eliminate_rows = lambda j, start, stop: Kernels.eliminate_rows(data, n, j, start, stop)
+
+    d = 1
+    try:
+        for j in Utils.steps(range(min(m, n))):
+            # ensure a non-zero pivot
+            if Utils.is_zero(data[j*n + j]):
+                found_new_pivot = False
+                for i in range(j+1, m):
+                    if not Utils.is_zero(data[i*n + j]):
+                        row_i = Utils.copy_buffer(data[i*n:(i+1)*n])
+                        data[i*n:(i+1)*n] = data[j*n:(j+1)*n]
+                        data[j*n:(j+1)*n] = row_i
+                        d = -d
+                        if E is not None:
+                            E.swap_rows_ip(i, j)
+                        found_new_pivot = True
+                        break
+                if not found_new_pivot:
+                    continue
+        
+            # make all non-pivot points below j = 0 (entries left of column j already are)
+            # the row operations are applied to E directly, rather than multiplying
+            # in an elementary matrix for each (O(m) per operation instead of O(m^3))
+            for i, s in eliminate_rows(j, j+1, m):
+                if E is not None:
+                    E.row_add(j, i, s)
+
+        if reduce:
+            # loop over columns backwards: find pivot, scale to 1, then subtract from upper rows.
+            # row j is zero left of column j, so only its tail takes part
+            for j in Utils.steps(range(min(m,n))[::-1]):
+                pivot = data[j*n + j]
+                if not Utils.is_zero(pivot):
+                    tail = slice(j*n + j, (j+1)*n)
+                    k = 1/pivot
+                    row = [x*k for x in data[tail]]
+                    data[tail] = array("d", row) if Utils.typecode(data) is not None else row
+                    data[j*n + j] = 1
+                    if E is not None:
+                        E.row_scale(j, k)
+                    for i, s in eliminate_rows(j, 0, j):
+                        if E is not None:
+                            E.row_add(j, i, s)
+    finally:
+        # frees the shared memory even when the elimination is aborted (see Utils.set_progress)
+        if shared is not None:
+            U._data = shared.close()
+    return E, d
+
+
+def ref(A, elim_matrix=False, exact=False):
     """
     returns a list containing:
         U = upper triangular matrix in row echelon form, result of gaussian elimination on A
@@ -338,78 +1069,132 @@ def ref(A, elim_matrix=False):
         E = elimination matrix (product of elementary matrices, E*A = U)
     and:
         d = determinant scaling factor (used in calculating determinant from gaussian elimination)
+    with exact, uses fraction-free (Bareiss) elimination, so U holds the
+    exact, unscaled integer echelon form of an integer matrix
     """
-    U, m, n = A.copy(), A.m, A.n
-    d = 1
-    if elim_matrix:
-        E = identity_matrix(m)
-    else:
-        E = None
-    for j in range(min(m, n)):
-        # ensure a non-zero pivot
-        if U.rows[j].elems[j] == 0:
-            found_new_pivot = False
-            for i in range(j+1, m):
-                if U.rows[i].elems[j] != 0:
-                    U.swap_rows_ip(i, j)
-                    d = -d
-                    if elim_matrix:
-                        elem_matrix = identity_matrix(m).swap_rows(i, j)
-                        E = elem_matrix * E
-                    found_new_pivot = True
-                    break
-            if not found_new_pivot:
-                continue
-        pivot = U.rows[j].elems[j]
-        
-        # make all non-pivot points below j = 0
-        for i in range(j+1, m):
-            elem = U.rows[i].elems[j]
-            if elem != 0:
-                s = -elem/pivot
-                U.row_add(j, i, s)
-                if elim_matrix:
-                    elem_matrix = identity_matrix(m)
-                    elem_matrix.edit_entry(i, j, s)
-                    E = elem_matrix * E  
-
+    if exact:
+        return Exact.ref(A, elim_matrix)
+    if Backend.active(A):
+        return Backend.ref(A, elim_matrix)
+    U = A.copy()
+    E, d = _eliminate(U, identity_matrix(A.m) if elim_matrix else None)
+    _normalize(U)
     return (U, E, d)
 
 
-def rref(A, elim_matrix=False):
+def rref(A, elim_matrix=False, exact=False):
     """
     returns a list containing:
         U = upper triangular matrix in reduced row echelon form, result of gaussian elimination on A
     and, if elim_matrix:
         E = elimination matrix (product of elementary matrices, E*A = U)
+    with exact, entries are computed exactly, as Fractions where not whole
     """
-    U, E, _ = ref(A, elim_matrix)   # TODO: keep track of E
-    m, n = A.m, A.n
-
-    # loop over columns backwards: find pivot, scale to 1, then subtract from upper rows
-    for j in range(min(m,n))[::-1]:
-        pivot = U.at(j, j)
-        if pivot:
-            U.row_scale(j, 1/pivot)
-            for i in range(0, j):
-                U.row_add(j, i, -U.at(i, j))
+    if exact:
+        return Exact.rref(A, elim_matrix)
+    if Backend.active(A):
+        return Backend.rref(A, elim_matrix)
+    U = A.copy()
+    E, _ = _eliminate(U, identity_matrix(A.m) if elim_matrix else None, reduce=True)
+    _normalize(U)
     return U, E
 
 
-def inverse(A):
+def inverse(A, exact=False):
     """
     returns a matrix A_inv, s.t. A*A_inv = A_inv*A = I_n.
     throws an error for non-square or singular matrices.
+    with exact, entries are computed exactly, as Fractions where not whole
     """
     if A.m != A.n:
         raise ValueError("Non-square matrices are not invertible")
+    if isinstance(A, Structured.StructuredMatrix):
+        return A.inverse()
+    return A._cached(("inverse", exact), lambda: _inverse(A, exact), copy=True)
+
+
+def _inverse(A, exact):
+    if exact:
+        return Exact.inverse(A)
+    if Backend.active(A):
+        return Backend.inverse(A)
+    return LU.lu(A).inverse()
+
+
+def solve(A, b, exact=False):
+    """
+    returns the vector x s.t. A*x = b, or for a matrix b, the matrix X s.t.
+    A*X = b, for a square nonsingular A. solves by substitution through the
+    LU factorization of A, which is cached, so later solves with the same A
+    only substitute; neither the inverse nor an augmented matrix is built.
+    throws an error for singular matrices.
+    with exact, entries are computed exactly, as Fractions where not whole
+    """
+    if isinstance(A, Structured.StructuredMatrix):
+        return A.solve(b)
+    if isinstance(A, Sparse.SparseMatrix):
+        if isinstance(b, Matrix) and b.m != A.n:
+            raise ValueError("Height of right-hand side must match size of matrix")
+        F = Sparse.lu(A)
+        if isinstance(b, Matrix):
+            cols = [F.solve(V.Vector._wrap(b._get(b._col_slice(j)))).elems for j in range(b.n)]
+            return LU._from_cols(cols, A.n, b.n)
+        return F.solve(b)
+    if not isinstance(A, Matrix):
+        raise TypeError("Can only solve systems of matrices")
+    if A.m != A.n:
+        raise ValueError("Can only solve square systems (see QR.lstsq for least squares)")
+    if isinstance(b, Matrix):
+        if b.m != A.n:
+            raise ValueError("Height of right-hand side must match size of matrix")
+    elif isinstance(b, V.Vector):
+        if b.n != A.n:
+            raise ValueError("Size of vector must match size of matrix")
+    else:
+        raise TypeError("Can only solve for a vector or matrix right-hand side")
+
+    if exact:
+        return Exact.solve(A, b)
+    if Backend.active(A, b):
+        return Backend.solve(A, b)
+    F = LU.lu(A)
+    return F.solve_many(b) if isinstance(b, Matrix) else F.solve(b)
+
+
+def solve_triangular(A, b, lower=False, unit_diagonal=False):
+    """
+    returns the vector x s.t. T*x = b, or for a matrix b, the matrix X s.t.
+    T*X = b, where T is the upper (or with lower, the lower) triangle of the
+    square matrix A, by back (or forward) substitution in O(n^2) per
+    right-hand side. entries of A outside the triangle are not read, nor its
+    diagonal if unit_diagonal (taken to be all ones)
+    """
+    if not isinstance(A, Matrix):
+        raise TypeError("Can only solve systems of matrices")
+    if A.m != A.n:
+        raise ValueError("Triangular systems must be square")
     n = A.n
-    I = identity_matrix(n)
-    augmented = augment(A, I)
-    U = rref(augmented)[0]
-    if U.get_non_augmented() != I:
+    if isinstance(b, Matrix):
+        if b.m != n:
+            raise ValueError("Height of right-hand side must match size of matrix")
+        rhs = [b._get(b._col_slice(j)) for j in range(b.n)]
+    elif isinstance(b, V.Vector):
+        if b.n != n:
+            raise ValueError("Size of vector must match size of matrix")
+        rhs = [b.elems]
+    else:
+        raise TypeError("Can only solve for a vector or matrix right-hand side")
+
+    flat = A._flat()
+    if not unit_diagonal and any(Utils.is_zero(flat[i*n + i]) for i in range(n)):
         raise ValueError("Matrix is not invertible")
-    return U.get_augmented()
+    if Backend.active(A, b):
+        return Backend.solve_triangular(A, b, lower, unit_diagonal)
+    substitute = Kernels.forward_substitution if lower else Kernels.back_substitution
+    cols = [substitute(flat, Utils.to_list(col), n, unit_diagonal) for col in rhs]
+    if isinstance(b, Matrix):
+        return LU._from_cols(cols, n, b.n)
+    return V.Vector._wrap(Utils.make_buffer([(round(x) if Utils.is_integer(x) else x) for x in cols[0]]))
 
 
 
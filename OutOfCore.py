@@ -0,0 +1,345 @@
+"""
+Out-of-core matrix products and LU factorization, for matrices too big for memory.
+
+A TiledMatrix keeps its entries in a .npy file (see IO) and is worked on a
+tile at a time: a block of at most tile by tile entries is read into memory,
+used or updated, and written back. matmul and lu stream tiles through memory,
+so their peak memory is a few tiles whatever the size of the matrices:
+
+    matmul = a tile of each operand, plus the result tile being accumulated
+    lu     = three tiles at a time, plus the permutation and one pivot row
+
+    TILE = default tile edge length
+"""
+
+from array import array
+import operator
+import sys
+import Vector as V
+import Kernels
+import IO
+import Utils
+
+TILE = 256
+
+
+class TiledMatrix:
+    """
+    A matrix stored in a .npy file of 64-bit integers or floats.
+
+        path = file holding the matrix
+        m = number of rows
+        n = number of columns
+        tc = typecode of the entries ("q" or "d")
+        tile = edge length of the tiles it is worked on in
+    """
+
+    def __init__(self, path, tile=None):
+        self._file = open(path, "r+b")
+        descr, fortran_order, shape, _ = IO._read_header(self._file)
+        if descr not in IO._DESCRS.values() or sys.byteorder == "big":
+            raise ValueError("Tiled matrices must hold 64-bit integers or floats in little-endian order")
+        if fortran_order or len(shape) != 2:
+            raise ValueError("Tiled matrices must be 2d and stored in row-major order")
+        self._start = self._file.tell()
+        self.path = path
+        self.m, self.n = shape
+        self.tc = "q" if descr == "<i8" else "d"
+        self.tile = tile or TILE
+
+
+    @classmethod
+    def create(cls, path, m, n, tc="d", tile=None):
+        """
+        returns a new m by n tiled matrix of zeros, stored at path
+        """
+        header = IO._header(IO._DESCRS[tc], (m, n), 0)
+        with open(path, "wb") as f:
+            f.write(header)
+            f.truncate(len(header) + m*n*8)
+        return cls(path, tile)
+
+
+    @classmethod
+    def from_matrix(cls, path, A, tile=None):
+        """
+        returns the matrix A saved at path as a tiled matrix
+        """
+        IO.save(path, A)
+        return cls(path, tile)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def close(self):
+        self._file.close()
+
+
+    def to_matrix(self):
+        """
+        returns the whole matrix, read into memory
+        """
+        self._file.flush()
+        return IO.load(self.path)
+
+
+    def read_tile(self, i0, j0, h, w):
+        """
+        returns the h by w block with top-left entry (i0, j0), as a row-major array
+        """
+        out = array(self.tc)
+        f, n = self._file, self.n
+        if w == n:
+            f.seek(self._start + i0*n*8)
+            out.frombytes(f.read(h*w*8))
+            return out
+        for i in range(i0, i0 + h):
+            f.seek(self._start + (i*n + j0)*8)
+            out.frombytes(f.read(w*8))
+        return out
+
+
+    def write_tile(self, i0, j0, h, w, buf):
+        """
+        writes the h by w row-major buffer buf as the block with top-left entry (i0, j0)
+        """
+        if not (isinstance(buf, array) and buf.typecode == self.tc):
+            buf = array(self.tc, buf)
+        f, n = self._file, self.n
+        if w == n:
+            f.seek(self._start + i0*n*8)
+            buf.tofile(f)
+            return
+        for r, i in enumerate(range(i0, i0 + h)):
+            f.seek(self._start + (i*n + j0)*8)
+            buf[r*w:(r+1)*w].tofile(f)
+
+
+    def at(self, i, j):
+        """
+        returns the (i,j) entry
+        """
+        if not (0 <= i < self.m and 0 <= j < self.n):
+            raise IndexError("index out of range")
+        return self.read_tile(i, j, 1, 1)[0]
+
+
+    def _swap_rows(self, a, b, skip):
+        """
+        swaps rows a and b, outside of the columns in range skip, a tile width at a time
+        """
+        for j0 in range(0, self.n, self.tile):
+            j1 = min(j0 + self.tile, self.n)
+            for c0, c1 in ((j0, min(j1, skip.start)), (max(j0, skip.stop), j1)):
+                if c0 < c1:
+                    row_a, row_b = self.read_tile(a, c0, 1, c1 - c0), self.read_tile(b, c0, 1, c1 - c0)
+                    self.write_tile(a, c0, 1, c1 - c0, row_b)
+                    self.write_tile(b, c0, 1, c1 - c0, row_a)
+
+
+def _spans(n, b, start=0):
+    """
+    returns the (start, size) of each tile along a dimension of size n
+    """
+    return [(i, min(b, n - i)) for i in range(start, n, b)]
+
+
+def matmul(A, B, path, tile=None):
+    """
+    returns A*B, for tiled matrices A and B, as a tiled matrix stored at path.
+    integer products must fit in 64 bits
+    """
+    if A.n != B.m:
+        raise ValueError("Width of left matrix must match height of right matrix")
+    b = tile or min(A.tile, B.tile)
+    C = TiledMatrix.create(path, A.m, B.n, Utils.join_types(A.tc, B.tc), b)
+    add = operator.add
+    for i0, h in _spans(A.m, b):
+        for j0, w in _spans(B.n, b):
+            acc = [0] * (h*w)
+            for k0, d in _spans(A.n, b):
+                prod = Kernels.matmul(A.read_tile(i0, k0, h, d), B.read_tile(k0, j0, d, w), h, d, w)
+                acc = list(map(add, acc, prod))
+            C.write_tile(i0, j0, h, w, acc)
+    return C
+
+
+class TiledLU:
+    """
+    An out-of-core LU factorization with partial pivoting of a tiled square
+    matrix A, P*A = L*U, computed by blocks of tile columns (panels).
+
+        lu = tiled matrix holding U on and above the diagonal, and the
+             multipliers of L below it (L has an implied unit diagonal)
+        perm = list of row indices, where perm[i] is the row of A moved to row i
+        sign = sign of the permutation P (1 or -1)
+        singular = whether A is singular (a zero pivot was met)
+    """
+
+    def __init__(self, A, path, tile=None):
+        if A.m != A.n:
+            raise ValueError("LU factorization requires a square matrix")
+        n = A.n
+        b = tile or A.tile
+        LU = self.lu = TiledMatrix.create(path, n, n, "d", b)
+        for i0, h in _spans(n, b):
+            for j0, w in _spans(n, b):
+                LU.write_tile(i0, j0, h, w, A.read_tile(i0, j0, h, w))
+        self.perm = list(range(n))
+        self.sign = 1
+        self.singular = False
+
+        for k0, w in _spans(n, b):
+            k1 = k0 + w
+            swaps = self._factor_panel(k0, k1)
+            for j, p in swaps:
+                LU._swap_rows(j, p, range(k0, k1))
+
+            # U12 = L11^-1 * A12, by forward substitution through the unit lower L11
+            L11 = LU.read_tile(k0, k0, w, w)
+            for c0, cw in _spans(n, b, k1):
+                T = LU.read_tile(k0, c0, w, cw)
+                for r in range(1, w):
+                    for s in range(r):
+                        f = L11[r*w + s]
+                        if f:
+                            T[r*cw:(r+1)*cw] = array("d", Utils.axpy(-f, T[s*cw:(s+1)*cw], T[r*cw:(r+1)*cw]))
+                LU.write_tile(k0, c0, w, cw, T)
+
+            # A22 -= L21 * U12
+            for r0, h in _spans(n, b, k1):
+                L21 = LU.read_tile(r0, k0, h, w)
+                for c0, cw in _spans(n, b, k1):
+                    prod = Kernels.matmul(L21, LU.read_tile(k0, c0, w, cw), h, w, cw)
+                    T = LU.read_tile(r0, c0, h, cw)
+                    LU.write_tile(r0, c0, h, cw, array("d", map(operator.sub, T, prod)))
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.lu.close()
+
+
+    def _factor_panel(self, k0, k1):
+        """
+        factors the columns k0 to k1 of the rows k0 on, streaming the panel a
+        tile of rows at a time once per column. returns the row swaps made
+        """
+        LU, n, b, w = self.lu, self.lu.n, self.lu.tile, k1 - k0
+        swaps = []
+        p = None
+        for j in range(k0, k1):
+            jj = j - k0
+            if p is None:
+                p = self._find_pivot(j, k0, k1)
+            if Utils.is_zero(LU.at(p, j)):
+                self.singular = True
+                p = None
+                continue
+            if p != j:
+                row_j, row_p = LU.read_tile(j, k0, 1, w), LU.read_tile(p, k0, 1, w)
+                LU.write_tile(j, k0, 1, w, row_p)
+                LU.write_tile(p, k0, 1, w, row_j)
+                self.perm[j], self.perm[p] = self.perm[p], self.perm[j]
+                self.sign = -self.sign
+                swaps.append((j, p))
+
+            # compute the multipliers of column j and update the rest of the
+            # panel, finding the pivot of column j+1 on the way
+            pivot_row = LU.read_tile(j, k0, 1, w)
+            pivot, tail = pivot_row[jj], pivot_row[jj+1:]
+            best, p = -1, None
+            for r0, h in _spans(n, b, j+1):
+                T = LU.read_tile(r0, k0, h, w)
+                for t in range(h):
+                    base = t*w
+                    f = T[base + jj] / pivot
+                    T[base + jj] = f
+                    if f:
+                        T[base + jj+1:base + w] = array("d", Utils.axpy(-f, tail, T[base + jj+1:base + w]))
+                    if jj + 1 < w and abs(T[base + jj+1]) > best:
+                        best, p = abs(T[base + jj+1]), r0 + t
+                LU.write_tile(r0, k0, h, w, T)
+        return swaps
+
+
+    def _find_pivot(self, j, k0, k1):
+        """
+        returns the row, from j on, with the largest entry in column j
+        """
+        LU = self.lu
+        best, p = -1, j
+        for r0, h in _spans(LU.n, LU.tile, j):
+            col = LU.read_tile(r0, k0, h, k1 - k0)[j - k0::k1 - k0]
+            for t, x in enumerate(col):
+                if abs(x) > best:
+                    best, p = abs(x), r0 + t
+        return p
+
+
+    def det(self):
+        """
+        returns the determinant of the factored matrix
+        """
+        if self.singular:
+            return 0
+        det = self.sign
+        for i in range(self.lu.n):
+            det *= self.lu.at(i, i)
+        return (round(det) if Utils.is_integer(det) else det)
+
+
+    def solve(self, b):
+        """
+        returns the vector x s.t. A*x = b, streaming the factors a tile at a time
+        """
+        if not isinstance(b, V.Vector):
+            raise TypeError("Can only solve for a vector right-hand side")
+        LU, n, t = self.lu, self.lu.n, self.lu.tile
+        if b.n != n:
+            raise ValueError("Size of vector must match size of matrix")
+        if self.singular:
+            raise ValueError("Matrix is not invertible")
+        mul = operator.mul
+        x = [b.elems[p] for p in self.perm]
+
+        # forward substitution through L
+        for r0, h in _spans(n, t):
+            for c0, w in _spans(r0, t):
+                T = LU.read_tile(r0, c0, h, w)
+                xs = x[c0:c0 + w]
+                for i in range(h):
+                    x[r0 + i] -= sum(map(mul, T[i*w:(i+1)*w], xs))
+            D = LU.read_tile(r0, r0, h, h)
+            for i in range(1, h):
+                x[r0 + i] -= sum(map(mul, D[i*h:i*h + i], x[r0:r0 + i]))
+
+        # back substitution through U
+        for r0, h in reversed(_spans(n, t)):
+            for c0, w in _spans(n, t, r0 + h):
+                T = LU.read_tile(r0, c0, h, w)
+                xs = x[c0:c0 + w]
+                for i in range(h):
+                    x[r0 + i] -= sum(map(mul, T[i*w:(i+1)*w], xs))
+            D = LU.read_tile(r0, r0, h, h)
+            for i in range(h-1, -1, -1):
+                s = sum(map(mul, D[i*h + i+1:(i+1)*h], x[r0 + i+1:r0 + h]))
+                x[r0 + i] = (x[r0 + i] - s) / D[i*h + i]
+        return V.Vector._wrap(Utils.make_buffer([(round(e) if Utils.is_integer(e) else e) for e in x]))
+
+
+def lu(A, path, tile=None):
+    """
+    returns the out-of-core LU factorization of the tiled square matrix A,
+    with the factors stored at path
+    """
+    return TiledLU(A, path, tile)
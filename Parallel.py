@@ -0,0 +1,235 @@
+"""
+Multi-core execution of the heavy loops, on a pool of worker processes.
+
+Matrix products, transposes and the row-update phase of ref/rref are split
+into blocks of rows (or columns), each run by a worker of a
+ProcessPoolExecutor. The operands and results live in shared memory blocks
+that the workers map directly, so no matrix data is pickled: the workers are
+only sent the names of the blocks and the bounds of their share of the work.
+
+    WORKERS = number of worker processes (1 keeps everything serial)
+    THRESHOLD = number of rows (or columns) below which work stays serial
+
+Only matrices of integers or floats (array buffers) are shared; others
+always run serially.
+"""
+
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import atexit
+import os
+import Kernels
+import Utils
+
+WORKERS = 1
+THRESHOLD = 256
+
+_pool = None
+_pool_size = 0
+_attached = {}    # in the workers: name -> (shared memory block, view)
+_MAX_ATTACHED = 4
+
+
+def set_workers(n=None):
+    """
+    sets the number of worker processes (all cores if n is None)
+    """
+    global WORKERS
+    WORKERS = n or os.cpu_count() or 1
+
+
+def split(size):
+    """
+    returns whether work over size rows (or columns) is split across the workers
+    """
+    return WORKERS > 1 and size >= THRESHOLD
+
+
+def shutdown():
+    """
+    stops the worker processes. they are started again when next needed
+    """
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+atexit.register(shutdown)
+
+
+def _executor():
+    global _pool, _pool_size
+    if _pool is None or _pool_size != WORKERS:
+        shutdown()
+        _pool = ProcessPoolExecutor(WORKERS)
+        _pool_size = WORKERS
+    return _pool
+
+
+def _blocks(start, stop, count):
+    """
+    returns range(start, stop) split into at most count (start, stop) blocks
+    """
+    size = max(-(-(stop - start) // count), 1)
+    return [(i, min(i + size, stop)) for i in range(start, stop, size)]
+
+
+class _Shared:
+    """
+    A flat buffer in a shared memory block, owned by the calling process.
+
+        tc = typecode of the entries
+        size = number of entries
+        view = memoryview of the entries
+    """
+
+    def __init__(self, tc, size, buf=None):
+        self.tc = tc
+        self.size = size
+        self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1)*8)
+        self.view = self.shm.buf[:size*8].cast(tc)
+        if buf is not None:
+            self.view[:] = buf if isinstance(buf, array) and buf.typecode == tc else array(tc, buf)
+
+
+    @property
+    def name(self):
+        return self.shm.name
+
+
+    def read(self):
+        """
+        returns a copy of the entries, as an array
+        """
+        out = array(self.tc)
+        with self.shm.buf[:self.size*8] as raw:
+            out.frombytes(raw)
+        return out
+
+
+    def close(self):
+        self.view.release()
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _attach(name, tc, size):
+    """
+    returns a view of the shared memory block name, in a worker. blocks stay
+    mapped for the next tasks of the same operation
+    """
+    entry = _attached.get(name)
+    if entry is None:
+        if len(_attached) >= _MAX_ATTACHED:    # unmap the oldest block
+            shm, view = _attached.pop(next(iter(_attached)))
+            view.release()
+            shm.close()
+        shm = shared_memory.SharedMemory(name=name)
+        entry = _attached[name] = (shm, shm.buf[:size*8].cast(tc))
+    return entry[1]
+
+
+def _close(*blocks):
+    for block in blocks:
+        block.close()
+
+
+def _matmul_rows(a, b, c, m, n, p, i0, i1):
+    A, B, C = _attach(*a, m*n), _attach(*b, n*p), _attach(*c, m*p)
+    rows = Kernels.matmul(A[i0*n:i1*n], B, i1 - i0, n, p)
+    try:
+        C[i0*p:i1*p] = array(c[1], rows)
+    except OverflowError:
+        return False
+    return True
+
+
+def matmul(a, b, m, n, p, tc):
+    """
+    returns the m by p product of the m by n buffer a and the n by p buffer b
+    (see Kernels.matmul), with its rows split across the workers when there
+    are enough of them. tc is the typecode of the result
+    """
+    tc_a, tc_b = Utils.typecode(a), Utils.typecode(b)
+    if not split(m) or None in (tc, tc_a, tc_b):
+        return Kernels.matmul(a, b, m, n, p)
+    A, B, C = _Shared(tc_a, m*n, a), _Shared(tc_b, n*p, b), _Shared(tc, m*p)
+    try:
+        args = ((A.name, tc_a), (B.name, tc_b), (C.name, tc), m, n, p)
+        futures = [_executor().submit(_matmul_rows, *args, i0, i1) for i0, i1 in _blocks(0, m, WORKERS)]
+        if all([f.result() for f in futures]):
+            return C.read()
+    finally:
+        _close(A, B, C)
+    return Kernels.matmul(a, b, m, n, p)    # a product overflowed 64 bits
+
+
+def _trans_cols(a, t, m, n, j0, j1):
+    A, T = _attach(*a, m*n), _attach(*t, m*n)
+    for j in range(j0, j1):
+        T[j*m:(j+1)*m] = A[j:m*n:n]
+
+
+def trans(a, m, n):
+    """
+    returns the transpose of the m by n buffer a, as an n by m buffer, with
+    its rows split across the workers when there are enough of them
+    """
+    tc = Utils.typecode(a)
+    if not split(n) or tc is None:
+        return Utils.concat((a[j:m*n:n] for j in range(n)), tc)
+    A, T = _Shared(tc, m*n, a), _Shared(tc, m*n)
+    try:
+        futures = [_executor().submit(_trans_cols, (A.name, tc), (T.name, tc), m, n, j0, j1)
+                   for j0, j1 in _blocks(0, n, WORKERS)]
+        for f in futures:
+            f.result()
+        return T.read()
+    finally:
+        _close(A, T)
+
+
+def _eliminate_rows(d, m, n, j, start, stop):
+    return Kernels.eliminate_rows(_attach(*d, m*n), n, j, start, stop)
+
+
+class SharedRows:
+    """
+    The entries of an m by n float matrix copied into shared memory for the
+    length of an elimination.
+
+        m = number of rows
+        n = number of columns
+        data = memoryview of the row-major entries
+    """
+
+    def __init__(self, buf, m, n):
+        self.m = m
+        self.n = n
+        self._block = _Shared("d", m*n, buf)
+        self.data = self._block.view
+
+
+    def eliminate_rows(self, j, start, stop):
+        """
+        as Kernels.eliminate_rows on data, with the rows split across the
+        workers when there are enough of them
+        """
+        if not split(stop - start):
+            return Kernels.eliminate_rows(self.data, self.n, j, start, stop)
+        d = (self._block.name, "d")
+        futures = [_executor().submit(_eliminate_rows, d, self.m, self.n, j, i0, i1)
+                   for i0, i1 in _blocks(start, stop, WORKERS)]
+        return [x for f in futures for x in f.result()]
+
+
+    def close(self):
+        """
+        frees the shared memory, returning a copy of the entries as an array
+        """
+        out = self._block.read()
+        self.data = None
+        self._block.close()
+        return out
@@ -0,0 +1,302 @@
+"""
+Instrumentation of the library's operations.
+
+    with Profile.profile() as p:
+        M.inverse(A)
+    print(p.report())
+
+While a profile is active, each operation in OPERATIONS is counted:
+    calls = number of calls
+    flops = arithmetic operations done by the kernels (classical counts:
+            2*m*n*p for a product, whatever algorithm runs it)
+    copies = entries copied into new buffers
+    allocations = Matrix and Vector objects created
+    time = wall time spent in it, in seconds
+Counts are inclusive: the flops, copies and allocations of everything an
+operation calls are counted for it too (and once in the totals). Where a
+counted operation runs inside another counting the same thing (e.g.
+Kernels.matmul inside Parallel.matmul), the outer one's count stands for both.
+
+The operations are wrapped when the first profile starts and unwrapped when
+the last one ends, so outside of a profile the library runs its plain
+functions and instrumentation costs nothing.
+
+hooks, for external tracers, are called as hook(event, name, elapsed) when
+each operation starts (event "start", elapsed None) and ends (event "end").
+
+Operations are counted whichever thread runs them (e.g. the workers of
+Async's thread executor). Each thread keeps its own stack of running
+operations, so concurrent calls on different threads are each an outermost
+operation: their times add up in the totals, which can then exceed the wall
+time of the profile. Hooks may be called from any of those threads.
+"""
+
+import functools
+import threading
+import time
+import Matrix as M
+import Vector as V
+import LU
+import Exact
+import Kernels
+import Parallel
+import Utils
+
+KINDS = ("flops", "copies", "allocations")
+
+_profiles = []      # active profiles, outermost first
+_threads = threading.local()    # per thread: the operations running (see _running)
+_lock = threading.Lock()        # guards the counts of the profiles
+_originals = []     # (owner, attribute, original) of the wrapped operations
+
+
+def _length(x):
+    return len(x) if hasattr(x, "__len__") else 0
+
+
+# (owner, attribute, {kind: function of (result, *args) returning the count})
+OPERATIONS = [
+    (M.Matrix, "__init__", {"allocations": lambda r, *a, **k: 1}),
+    (M.Matrix, "_wrap", {"allocations": lambda r, *a, **k: 1}),
+    (M.Matrix, "_view", {"allocations": lambda r, *a, **k: 1}),
+    (M.Matrix, "__add__", {}),
+    (M.Matrix, "__sub__", {}),
+    (M.Matrix, "__mul__", {}),
+    (M.Matrix, "__iadd__", {}),
+    (M.Matrix, "__isub__", {}),
+    (M.Matrix, "__imul__", {}),
+    (M.Matrix, "copy", {"copies": lambda r, A: A.m*A.n}),
+    (M.Matrix, "submatrix", {}),
+    (M.Matrix, "det", {}),
+    (M.Matrix, "swap_rows_ip", {}),
+    (M.Matrix, "swap_cols_ip", {}),
+    (M.Matrix, "row_add", {}),
+    (M.Matrix, "row_scale", {}),
+    (M, "trans", {}),
+    (M, "add", {}),
+    (M, "sub", {}),
+    (M, "mul", {}),
+    (M, "identity_matrix", {}),
+    (M, "swap_rows", {}),
+    (M, "swap_cols", {}),
+    (M, "augment", {}),
+    (M, "ref", {}),
+    (M, "rref", {}),
+    (M, "inverse", {}),
+    (M, "solve", {}),
+    (M, "solve_triangular", {}),
+
+    (V.Vector, "__init__", {"allocations": lambda r, *a, **k: 1}),
+    (V.Vector, "_wrap", {"allocations": lambda r, *a, **k: 1}),
+    (V.Vector, "__add__", {}),
+    (V.Vector, "__sub__", {}),
+    (V.Vector, "times", {}),
+    (V.Vector, "dot", {"flops": lambda r, u, v: 2*u.n}),
+    (V, "normalize", {}),
+
+    (LU, "lu", {"flops": lambda r, A: 2*A.n**3 // 3}),
+    (LU.LUFactorization, "det", {}),
+    (LU.LUFactorization, "solve", {}),
+    (LU.LUFactorization, "inverse", {}),
+    (Exact, "det", {}),
+    (Exact, "ref", {}),
+    (Exact, "rref", {}),
+    (Exact, "inverse", {}),
+
+    (Kernels, "matmul", {"flops": lambda r, a, b, m, n, p, *x, **k: 2*m*n*p}),
+    (Kernels, "matvec", {"flops": lambda r, a, x, m, n: 2*m*n}),
+    (Kernels, "forward_substitution", {"flops": lambda r, a, x, n, unit=False: n*n - (n if unit else 0)}),
+    (Kernels, "back_substitution", {"flops": lambda r, a, x, n, unit=False: n*n - (n if unit else 0)}),
+    (Kernels, "eliminate_rows", {"flops": lambda r, data, n, j, *x: (2*(n - j) + 1) * len(r)}),
+    (Parallel, "matmul", {"flops": lambda r, a, b, m, n, p, tc: 2*m*n*p}),
+    (Parallel, "trans", {"copies": lambda r, *a: len(r)}),
+    (Parallel.SharedRows, "eliminate_rows", {"flops": lambda r, self, j, *x: (2*(self.n - j) + 1) * len(r)}),
+    (Utils, "axpy", {"flops": lambda r, a, x, y: 2*_length(x)}),
+    (Utils, "make_buffer", {"copies": lambda r, *a: len(r)}),
+    (Utils, "copy_buffer", {"copies": lambda r, *a: len(r)}),
+    (Utils, "concat", {"copies": lambda r, *a: len(r)})
+]
+
+
+class OpStats:
+    """
+    The counts of one operation (or of a whole profile).
+    """
+
+    __slots__ = ("calls", "flops", "copies", "allocations", "time")
+
+    def __init__(self):
+        self.calls = 0
+        self.flops = 0
+        self.copies = 0
+        self.allocations = 0
+        self.time = 0.0
+
+
+    def __repr__(self):
+        return (f"OpStats(calls={self.calls}, flops={self.flops}, copies={self.copies}, "
+                f"allocations={self.allocations}, time={self.time:.6f})")
+
+
+class Profile:
+    """
+    The counts collected while a profile is active.
+
+        ops = dictionary from operation name (e.g. "Matrix.ref") to its OpStats
+        totals = OpStats of the whole profile: calls and time of the outermost
+                 operations, and all flops, copies and allocations
+        hooks = functions called as each operation starts and ends
+    """
+
+    def __init__(self, hooks=None):
+        self.ops = {}
+        self.totals = OpStats()
+        self.hooks = list(hooks or [])
+
+
+    def __enter__(self):
+        if not _profiles:
+            _install()
+        _profiles.append(self)
+        return self
+
+
+    def __exit__(self, *exc):
+        _profiles.remove(self)
+        if not _profiles:
+            _uninstall()
+
+
+    def __getitem__(self, name):
+        """
+        returns the OpStats of the operation name (all zeros if it never ran)
+        """
+        return self.ops.get(name) or OpStats()
+
+
+    def _stats(self, name):
+        stats = self.ops.get(name)
+        if stats is None:
+            stats = self.ops[name] = OpStats()
+        return stats
+
+
+    def report(self):
+        """
+        returns the counts as a text table, slowest operations first
+        """
+        lines = [f"{'operation':<32}{'calls':>8}{'flops':>12}{'copies':>10}{'allocs':>8}{'time (ms)':>12}"]
+        rows = sorted(self.ops.items(), key=lambda item: -item[1].time)
+        for name, s in rows + [("total", self.totals)]:
+            lines.append(f"{name:<32}{s.calls:>8}{s.flops:>12}{s.copies:>10}{s.allocations:>8}{s.time * 1e3:>12.3f}")
+        return "\n".join(lines)
+
+
+def profile(hooks=None):
+    """
+    returns a profile to use as a context manager: operations run inside
+    the with block are counted in it. hooks is a list of functions called
+    as hook(event, name, elapsed) (see above)
+    """
+    return Profile(hooks)
+
+
+def _name(owner, attr):
+    return f"{owner.__name__}.{attr}"
+
+
+def _running():
+    """
+    returns (stack, costing) for the calling thread: the names of the
+    operations it is running, outermost first, and how many of them count
+    each kind
+    """
+    try:
+        return _threads.stack, _threads.costing
+    except AttributeError:
+        _threads.stack, _threads.costing = [], dict.fromkeys(KINDS, 0)
+        return _threads.stack, _threads.costing
+
+
+def _instrument(func, name, costs):
+    """
+    returns func wrapped to count its calls and costs in the active profiles
+    """
+    kinds = tuple(costs)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stack, costing = _running()
+        outermost = name not in stack
+        stack.append(name)
+        for k in kinds:
+            costing[k] += 1
+        for p in _profiles:
+            for hook in p.hooks:
+                hook("start", name, None)
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+            for k in kinds:
+                # an enclosing operation counting the same kind counts it for the others
+                _record(stack, k, costs[k](result, *args, **kwargs), name if costing[k] > 1 else None)
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            for k in kinds:
+                costing[k] -= 1
+            stack.pop()
+            with _lock:
+                for p in _profiles:
+                    stats = p._stats(name)
+                    stats.calls += 1
+                    if outermost:
+                        stats.time += elapsed
+                    if not stack:
+                        p.totals.calls += 1
+                        p.totals.time += elapsed
+            for p in _profiles:
+                for hook in p.hooks:
+                    hook("end", name, elapsed)
+
+    return wrapper
+
+
+def _record(stack, kind, count, only=None):
+    """
+    adds count to kind for every operation in stack (those the calling
+    thread is running), and to the totals, or only to the operation named
+    only if given
+    """
+    if not count:
+        return
+    with _lock:
+        if only is not None:
+            for p in _profiles:
+                stats = p._stats(only)
+                setattr(stats, kind, getattr(stats, kind) + count)
+            return
+        names = set(stack)
+        for p in _profiles:
+            for name in names:
+                stats = p._stats(name)
+                setattr(stats, kind, getattr(stats, kind) + count)
+            setattr(p.totals, kind, getattr(p.totals, kind) + count)
+
+
+def _install():
+    for owner, attr, costs in OPERATIONS:
+        original = vars(owner)[attr]
+        name = _name(owner, attr)
+        if isinstance(original, classmethod):
+            wrapped = classmethod(_instrument(original.__func__, name, costs))
+        else:
+            wrapped = _instrument(original, name, costs)
+        _originals.append((owner, attr, original))
+        setattr(owner, attr, wrapped)
+
+
+def _uninstall():
+    while _originals:
+        owner, attr, original = _originals.pop()
+        setattr(owner, attr, original)
@@ -0,0 +1,302 @@
+"""
+QR factorization and least squares.
+
+Householder QR reduces an m by n matrix A (m >= n) to an upper triangular R
+with n reflections H_k = I - tau_k * v_k * v_k^T, so A = Q*R with
+Q = H_0 * H_1 * ... * H_{n-1}. The reflectors are kept compactly below R and
+applied one at a time, so Q is only formed if asked for (get_Q).
+
+lstsq(A, b) finds the x minimizing ||A*x - b|| by solving R*x = Q^T*b. It
+never forms A^T*A, which would square the condition number of A.
+
+GivensLeastSquares solves the same problem a row at a time: each row of
+[A | b] is rotated into a running n by n triangle with Givens rotations, so
+any number of rows can be streamed through it in one pass, in O(n^2) memory.
+"""
+
+import math
+import operator
+import Matrix as M
+import Vector as V
+import Utils
+
+TOL = 1e-12     # diagonal entries of R this small relative to the largest make A rank deficient
+
+
+class QRFactorization:
+    """
+    A Householder QR factorization of an m by n matrix A (m >= n), A = Q*R.
+
+        m = number of rows of A
+        n = number of columns of A
+        qr = list of the n columns of the compact factorization: R on and
+             above the diagonal, and below it the Householder vectors v_k
+             (whose first entry, 1, is implied)
+        tau = list of the scaling factors of the reflectors
+        rank_deficient = whether the columns of A are (numerically) dependent
+    """
+
+    __slots__ = ("m", "n", "qr", "tau", "rank_deficient")
+
+    def __init__(self, A):
+        if not isinstance(A, M.Matrix):
+            raise TypeError("Can only factor matrices")
+        if A.m < A.n:
+            raise ValueError("QR factorization requires at least as many rows as columns")
+
+        m, n = A.m, A.n
+        mul = operator.mul
+        cols = [[float(x) for x in A._get(A._col_slice(j))] for j in range(n)]
+        tau = []
+        for k in range(n):
+            col = cols[k]
+            x = col[k:]
+            norm = math.hypot(*x)
+            if norm == 0:
+                tau.append(0.0)
+                continue
+            # reflect x onto beta*e_1, choosing the sign of beta to avoid cancellation
+            beta = -math.copysign(norm, x[0])
+            f = 1 / (x[0] - beta)
+            v = [1.0] + [e*f for e in x[1:]]
+            t = (beta - x[0]) / beta
+            col[k] = beta
+            col[k+1:] = v[1:]
+            for j in range(k+1, n):
+                y = cols[j]
+                s = t * sum(map(mul, v, y[k:]))
+                if s:
+                    y[k:] = Utils.axpy(-s, v, y[k:])
+            tau.append(t)
+
+        diag = [abs(cols[k][k]) for k in range(n)]
+        largest = max(diag, default=0)
+        self.m = m
+        self.n = n
+        self.qr = cols
+        self.tau = tau
+        self.rank_deficient = any(d <= TOL * largest for d in diag) or (n > 0 and largest == 0)
+
+
+    def _reflect(self, y, order):
+        """
+        applies the reflectors, in the given order of k, to the list y in place
+        """
+        mul = operator.mul
+        for k in order:
+            t = self.tau[k]
+            if not t:
+                continue
+            v = [1.0] + self.qr[k][k+1:]
+            s = t * sum(map(mul, v, y[k:]))
+            if s:
+                y[k:] = Utils.axpy(-s, v, y[k:])
+
+
+    def _qt(self, b):
+        """
+        returns Q^T*b for a sequence b of size m, as a list
+        """
+        y = [float(x) for x in b]
+        self._reflect(y, range(self.n))
+        return y
+
+
+    def _solve(self, b):
+        """
+        returns the least squares solution x of A*x = b as a list, by back
+        substitution through R*x = (Q^T*b)[:n]
+        """
+        n, qr = self.n, self.qr
+        x = self._qt(b)[:n]
+        for i in range(n-1, -1, -1):
+            s = sum(qr[j][i] * x[j] for j in range(i+1, n))
+            x[i] = (x[i] - s) / qr[i][i]
+        return x
+
+
+    def _check_rank(self):
+        if self.rank_deficient:
+            raise ValueError("Matrix does not have full column rank")
+
+
+    def solve(self, b):
+        """
+        returns the vector x minimizing ||A*x - b|| (the solution of A*x = b
+        when there is one)
+        """
+        if not isinstance(b, V.Vector):
+            raise TypeError("Can only solve for a vector right-hand side")
+        if b.n != self.m:
+            raise ValueError("Size of vector must match height of matrix")
+        self._check_rank()
+        return _vector(self._solve(b.elems))
+
+
+    def solve_many(self, B):
+        """
+        returns the matrix X minimizing ||A*X - B||, solving for every column of B
+        """
+        if not isinstance(B, M.Matrix):
+            raise TypeError("Can only solve for a matrix right-hand side")
+        if B.m != self.m:
+            raise ValueError("Height of right-hand side must match height of matrix")
+        self._check_rank()
+        cols = [self._solve(B._get(B._col_slice(j))) for j in range(B.n)]
+        return _from_cols(cols, self.n, B.n)
+
+
+    def residual(self, b):
+        """
+        returns the least squares residual ||A*x - b|| for the vector b,
+        read off Q^T*b without solving for x
+        """
+        if not isinstance(b, V.Vector):
+            raise TypeError("Can only find the residual of a vector right-hand side")
+        if b.n != self.m:
+            raise ValueError("Size of vector must match height of matrix")
+        return math.hypot(*self._qt(b.elems)[self.n:])
+
+
+    def get_R(self):
+        """
+        returns the n by n upper triangular factor R
+        """
+        n, qr = self.n, self.qr
+        return _from_cols([[(qr[j][i] if i <= j else 0) for i in range(n)] for j in range(n)], n, n)
+
+
+    def get_Q(self, full=False):
+        """
+        returns the m by n factor Q with orthonormal columns (m by m if full),
+        formed by applying the reflectors to the columns of an identity matrix
+        """
+        m = self.m
+        width = m if full else self.n
+        cols = []
+        for j in range(width):
+            e = [0.0] * m
+            e[j] = 1.0
+            self._reflect(e, range(self.n - 1, -1, -1))
+            cols.append(e)
+        return _from_cols(cols, m, width)
+
+
+class GivensLeastSquares:
+    """
+    A least squares problem min ||A*x - b|| with n unknowns, solved by
+    rotating the rows of [A | b] one at a time into an upper triangle with
+    Givens rotations. Memory stays O(n^2) whatever the number of rows.
+
+        n = number of unknowns
+        count = number of rows added so far
+        rows = the n rows of the running triangle [R | Q^T*b], row i holding
+               columns i to n (the last being the rotated b)
+        residual_sq = squared residual ||A*x - b||^2 of the rows so far
+    """
+
+    def __init__(self, n):
+        self.n = n
+        self.count = 0
+        self.rows = [[0.0] * (n + 1 - i) for i in range(n)]
+        self.residual_sq = 0.0
+
+
+    def add_row(self, row, y):
+        """
+        adds the equation row*x = y
+        """
+        r = [float(a) for a in row]
+        if len(r) != self.n:
+            raise ValueError(f"Length of row does not match number of unknowns (expected {self.n}, got {len(r)})")
+        r.append(float(y))
+        for i, Ri in enumerate(self.rows):
+            a = r[i]
+            if a == 0:
+                continue
+            h = math.hypot(Ri[0], a)
+            c, s = Ri[0] / h, a / h
+            tail = r[i:]
+            self.rows[i] = [c*p + s*q for p, q in zip(Ri, tail)]
+            r[i+1:] = [c*q - s*p for p, q in zip(Ri[1:], tail[1:])]
+        self.residual_sq += r[-1] * r[-1]
+        self.count += 1
+
+
+    def add_rows(self, A, b):
+        """
+        adds the equations A*x = b, for a matrix A and vector b
+        """
+        if A.n != self.n:
+            raise ValueError(f"Width of matrix does not match number of unknowns (expected {self.n}, got {A.n})")
+        if b.n != A.m:
+            raise ValueError("Size of vector must match height of matrix")
+        for i, y in enumerate(b.elems):
+            self.add_row(A._get(A._row_slice(i)), y)
+
+
+    @property
+    def residual(self):
+        """
+        the least squares residual ||A*x - b|| of the rows so far
+        """
+        return math.sqrt(self.residual_sq)
+
+
+    def solve(self):
+        """
+        returns the vector x minimizing ||A*x - b|| over the rows so far
+        """
+        n, rows = self.n, self.rows
+        largest = max((abs(r[0]) for r in rows), default=0)
+        if any(abs(r[0]) <= TOL * largest for r in rows) or (n > 0 and largest == 0):
+            raise ValueError("Matrix does not have full column rank")
+        x = [0.0] * n
+        for i in range(n-1, -1, -1):
+            r = rows[i]
+            x[i] = (r[-1] - sum(map(operator.mul, r[1:-1], x[i+1:]))) / r[0]
+        return _vector(x)
+
+
+def _vector(x):
+    return V.Vector._wrap(Utils.make_buffer([(round(e) if Utils.is_integer(e) else e) for e in x]))
+
+
+def _from_cols(cols, m, n):
+    """
+    returns the m by n matrix with the given list of columns,
+    rounding entries within tolerance of an integer
+    """
+    flat = [(round(x) if Utils.is_integer(x) else x) for i in range(m) for x in (col[i] for col in cols)]
+    return M.Matrix._wrap(m, n, Utils.make_buffer(flat))
+
+
+def qr(A):
+    """
+    returns the Householder QR factorization of a matrix A with at least as
+    many rows as columns, cached until A next changes
+    """
+    if isinstance(A, M.Matrix):
+        return A._cached("qr", lambda: QRFactorization(A))
+    return QRFactorization(A)
+
+
+def lstsq(A, b, method="householder"):
+    """
+    returns the x minimizing ||A*x - b|| for a matrix A with full column
+    rank and a vector (or matrix) b. method is "householder" (a QR
+    factorization of A) or "givens" (A streamed through Givens rotations a
+    row at a time, for a vector b)
+    """
+    if method == "householder":
+        F = qr(A)
+        return F.solve_many(b) if isinstance(b, M.Matrix) else F.solve(b)
+    if method == "givens":
+        if not isinstance(A, M.Matrix):
+            raise TypeError("Can only solve least squares problems for matrices")
+        if not isinstance(b, V.Vector):
+            raise TypeError("Givens least squares needs a vector right-hand side")
+        G = GivensLeastSquares(A.n)
+        G.add_rows(A, b)
+        return G.solve()
+    raise ValueError(f"Unknown least squares method {method!r} (expected \"householder\" or \"givens\")")
@@ -0,0 +1,642 @@
+"""
+Sparse matrices, storing only their nonzero entries.
+
+    COOMatrix = coordinate format: parallel lists of row indices, column indices and values
+    CSRMatrix = compressed sparse rows: the entries of row i are data[indptr[i]:indptr[i+1]],
+                in the columns indices[indptr[i]:indptr[i+1]]
+    CSCMatrix = compressed sparse columns: as CSR, but compressed by column
+
+All three multiply with matrices, vectors and each other, and convert to and
+from dense matrices. SparseLU solves sparse systems, choosing pivots that
+keep the fill-in (new nonzeros created by elimination) low.
+"""
+
+from array import array
+import heapq
+import operator
+import Matrix as M
+import Vector as V
+import Utils
+
+
+class SparseMatrix:
+    """
+    Shared behaviour of the sparse matrix formats.
+
+        m = number of rows
+        n = number of columns
+    """
+
+    def nnz(self):
+        """
+        returns the number of stored entries
+        """
+        raise NotImplementedError
+
+
+    def tocsr(self):
+        raise NotImplementedError
+
+
+    def to_dense(self):
+        """
+        returns the sparse matrix as a dense Matrix
+        """
+        return self.tocsr().to_dense()
+
+
+    def at(self, i, j):
+        """
+        returns the (i,j) entry of a sparse matrix
+        """
+        return self.tocsr().at(i, j)
+
+
+    def __mul__(self, A):
+        return self.tocsr() * A
+
+
+    def __rmul__(self, A):
+        return self.tocsr().__rmul__(A)
+
+
+    def __add__(self, A):
+        return self.tocsr() + A
+
+
+    def __sub__(self, A):
+        return self.tocsr() - A
+
+
+    def __radd__(self, A):
+        return self + A
+
+
+    def __rsub__(self, A):
+        if isinstance(A, M.Matrix):
+            return A - self.to_dense()
+        return NotImplemented
+
+
+    def __eq__(self, A):
+        if isinstance(A, SparseMatrix):
+            if (self.m != A.m) or (self.n != A.n):
+                return False
+            return self.tocsr()._row_dicts() == A.tocsr()._row_dicts()
+        if isinstance(A, M.Matrix):
+            return self.to_dense() == A
+        return False
+
+
+    def __ne__(self, A):
+        return not (self == A)
+
+
+    def __str__(self):
+        return str(self.to_dense())
+
+
+class COOMatrix(SparseMatrix):
+    """
+    A sparse matrix in coordinate format. entries may be listed in any order;
+    duplicates are summed when converting to another format.
+
+        m = number of rows
+        n = number of columns
+        rows, cols = buffers of the row and column index of each entry
+        data = buffer of the entry values
+    """
+
+    def __init__(self, m, n, rows=None, cols=None, data=None):
+        rows, cols, data = list(rows or []), list(cols or []), list(data or [])
+        if not len(rows) == len(cols) == len(data):
+            raise ValueError("Row indices, column indices and values must have the same length")
+        for i, j in zip(rows, cols):
+            if not (0 <= i < m and 0 <= j < n):
+                raise IndexError(f"Entry ({i}, {j}) out of range for a {m} by {n} matrix")
+        self.m = m
+        self.n = n
+        self.rows = array("q", rows)
+        self.cols = array("q", cols)
+        self.data = Utils.make_buffer(data)
+
+
+    def nnz(self):
+        return len(self.data)
+
+
+    def tocsr(self):
+        """
+        returns the matrix in CSR format, summing duplicate entries
+        """
+        row_dicts = [{} for _ in range(self.m)]
+        for i, j, x in zip(self.rows, self.cols, self.data):
+            row = row_dicts[i]
+            row[j] = row.get(j, 0) + x
+        return CSRMatrix._from_row_dicts(self.m, self.n, row_dicts)
+
+
+    def tocsc(self):
+        return self.tocsr().tocsc()
+
+
+    def trans(self):
+        """
+        returns the transpose of a sparse matrix
+        """
+        T = COOMatrix(self.n, self.m)
+        T.rows, T.cols, T.data = self.cols[:], self.rows[:], Utils.copy_buffer(self.data)
+        return T
+
+
+class CSRMatrix(SparseMatrix):
+    """
+    A sparse matrix in compressed sparse row format.
+
+        m = number of rows
+        n = number of columns
+        indptr = buffer of m+1 offsets; row i is stored in positions indptr[i] to indptr[i+1]
+        indices = buffer of the column index of each stored entry, ascending within a row
+        data = buffer of the stored entry values
+    """
+
+    def __init__(self, m, n, indptr, indices, data):
+        if len(indptr) != m + 1:
+            raise ValueError(f"indptr must have m+1 entries (expected {m+1}, got {len(indptr)})")
+        if len(indices) != len(data) or indptr[-1] != len(data):
+            raise ValueError("Column indices and values do not match indptr")
+        self.m = m
+        self.n = n
+        self.indptr = array("q", indptr)
+        self.indices = array("q", indices)
+        self.data = Utils.make_buffer(list(data))
+
+
+    @classmethod
+    def _from_row_dicts(cls, m, n, row_dicts):
+        """
+        returns the CSR matrix with the given list of {column: value} rows,
+        dropping explicit zeros
+        """
+        indptr, indices, data = array("q", [0]), array("q"), []
+        for row in row_dicts:
+            for j in sorted(row):
+                x = row[j]
+                if x != 0:
+                    indices.append(j)
+                    data.append(x)
+            indptr.append(len(indices))
+        A = cls.__new__(cls)
+        A.m, A.n = m, n
+        A.indptr, A.indices, A.data = indptr, indices, Utils.make_buffer(data)
+        return A
+
+
+    def _row_dicts(self):
+        """
+        returns the rows of the matrix as a list of {column: value} dicts
+        """
+        indptr, indices, data = self.indptr, self.indices, self.data
+        return [dict(zip(indices[indptr[i]:indptr[i+1]], data[indptr[i]:indptr[i+1]])) for i in range(self.m)]
+
+
+    def nnz(self):
+        return len(self.data)
+
+
+    def tocsr(self):
+        return self
+
+
+    def tocsc(self):
+        """
+        returns the matrix in CSC format
+        """
+        counts = [0] * (self.n + 1)
+        for j in self.indices:
+            counts[j+1] += 1
+        for j in range(self.n):
+            counts[j+1] += counts[j]
+        indptr = array("q", counts)
+        nxt = counts[:-1]
+        indices = array("q", [0]) * len(self.data)
+        data = [0] * len(self.data)
+        for i in range(self.m):
+            for k in range(self.indptr[i], self.indptr[i+1]):
+                j = self.indices[k]
+                pos = nxt[j]
+                indices[pos] = i
+                data[pos] = self.data[k]
+                nxt[j] = pos + 1
+        A = CSCMatrix.__new__(CSCMatrix)
+        A.m, A.n = self.m, self.n
+        A.indptr, A.indices, A.data = indptr, indices, Utils.make_buffer(data)
+        return A
+
+
+    def tocoo(self):
+        rows = [i for i in range(self.m) for _ in range(self.indptr[i], self.indptr[i+1])]
+        return COOMatrix(self.m, self.n, rows, self.indices, self.data)
+
+
+    def trans(self):
+        """
+        returns the transpose of a sparse matrix: the same buffers, read as CSC
+        """
+        T = CSCMatrix.__new__(CSCMatrix)
+        T.m, T.n = self.n, self.m
+        T.indptr, T.indices, T.data = self.indptr, self.indices, self.data
+        return T
+
+
+    def to_dense(self):
+        m, n = self.m, self.n
+        flat = [0] * (m*n)
+        for i in range(m):
+            for k in range(self.indptr[i], self.indptr[i+1]):
+                flat[i*n + self.indices[k]] = self.data[k]
+        return M.Matrix._wrap(m, n, Utils.make_buffer(flat))
+
+
+    def at(self, i, j):
+        if not (0 <= i < self.m and 0 <= j < self.n):
+            raise IndexError("index out of range")
+        for k in range(self.indptr[i], self.indptr[i+1]):
+            if self.indices[k] == j:
+                return self.data[k]
+        return 0
+
+
+    def __mul__(self, A):
+        if isinstance(A, V.Vector):
+            if self.n != A.n:
+                raise ValueError("Size of vector must match width of matrix")
+            return V.Vector._wrap(Utils.make_buffer(self._matvec(A.elems)))
+        if isinstance(A, SparseMatrix):
+            if self.n != A.m:
+                raise ValueError("Width of left matrix must match height of right matrix")
+            return self._matmul_sparse(A.tocsr())
+        if isinstance(A, M.Matrix):
+            if self.n != A.m:
+                raise ValueError("Width of left matrix must match height of right matrix")
+            return self._matmul_dense(A)
+        raise TypeError("Can only multiply a matrix by a matrix or a vector")
+
+
+    def __rmul__(self, A):
+        if isinstance(A, M.Matrix):
+            if A.n != self.m:
+                raise ValueError("Width of left matrix must match height of right matrix")
+            return self._rmatmul_dense(A)
+        raise TypeError("Can only multiply a matrix by a matrix or a vector")
+
+
+    def _matvec(self, x):
+        """
+        returns the product of the matrix and the buffer x, as a list
+        """
+        indptr, indices, data = self.indptr, self.indices, self.data
+        mul = operator.mul
+        return [sum(map(mul, data[indptr[i]:indptr[i+1]], [x[j] for j in indices[indptr[i]:indptr[i+1]]]))
+                for i in range(self.m)]
+
+
+    def _matmul_sparse(self, B):
+        """
+        returns the product with the CSR matrix B, as a CSR matrix.
+        builds each row of the result from the rows of B that row of self selects
+        """
+        out = []
+        for i in range(self.m):
+            acc = {}
+            for k in range(self.indptr[i], self.indptr[i+1]):
+                a, r = self.data[k], self.indices[k]
+                for kk in range(B.indptr[r], B.indptr[r+1]):
+                    j = B.indices[kk]
+                    acc[j] = acc.get(j, 0) + a*B.data[kk]
+            out.append(acc)
+        return CSRMatrix._from_row_dicts(self.m, B.n, out)
+
+
+    def _matmul_dense(self, B):
+        """
+        returns the product with the dense matrix B, as a dense matrix
+        """
+        p = B.n
+        b_rows = [B._get(B._row_slice(r)) for r in range(B.m)]
+        flat = []
+        for i in range(self.m):
+            acc = [0] * p
+            for k in range(self.indptr[i], self.indptr[i+1]):
+                a = self.data[k]
+                acc = [x + a*y for x, y in zip(acc, b_rows[self.indices[k]])]
+            flat.extend(acc)
+        return M.Matrix._wrap(self.m, p, Utils.make_buffer(flat))
+
+
+    def _rmatmul_dense(self, A):
+        """
+        returns the product A*self of the dense matrix A and the matrix
+        """
+        p = self.n
+        flat = []
+        for i in range(A.m):
+            acc = [0] * p
+            for r, a in enumerate(A._get(A._row_slice(i))):
+                if a:
+                    for k in range(self.indptr[r], self.indptr[r+1]):
+                        acc[self.indices[k]] += a*self.data[k]
+            flat.extend(acc)
+        return M.Matrix._wrap(A.m, p, Utils.make_buffer(flat))
+
+
+    def _combine(self, A, sign):
+        if isinstance(A, SparseMatrix):
+            if self.m != A.m or self.n != A.n:
+                raise ValueError("Can only add matrices of same dimensions")
+            rows = self._row_dicts()
+            for row, other in zip(rows, A.tocsr()._row_dicts()):
+                for j, x in other.items():
+                    row[j] = row.get(j, 0) + sign*x
+            return CSRMatrix._from_row_dicts(self.m, self.n, rows)
+        if isinstance(A, M.Matrix):
+            return self.to_dense() + A if sign == 1 else self.to_dense() - A
+        raise TypeError("Can only add matrices to matrices")
+
+
+    def __add__(self, A):
+        return self._combine(A, 1)
+
+
+    def __sub__(self, A):
+        return self._combine(A, -1)
+
+
+class CSCMatrix(SparseMatrix):
+    """
+    A sparse matrix in compressed sparse column format.
+
+        m = number of rows
+        n = number of columns
+        indptr = buffer of n+1 offsets; column j is stored in positions indptr[j] to indptr[j+1]
+        indices = buffer of the row index of each stored entry, ascending within a column
+        data = buffer of the stored entry values
+    """
+
+    def __init__(self, m, n, indptr, indices, data):
+        if len(indptr) != n + 1:
+            raise ValueError(f"indptr must have n+1 entries (expected {n+1}, got {len(indptr)})")
+        if len(indices) != len(data) or indptr[-1] != len(data):
+            raise ValueError("Row indices and values do not match indptr")
+        self.m = m
+        self.n = n
+        self.indptr = array("q", indptr)
+        self.indices = array("q", indices)
+        self.data = Utils.make_buffer(list(data))
+
+
+    def nnz(self):
+        return len(self.data)
+
+
+    def trans(self):
+        """
+        returns the transpose of a sparse matrix: the same buffers, read as CSR
+        """
+        T = CSRMatrix.__new__(CSRMatrix)
+        T.m, T.n = self.n, self.m
+        T.indptr, T.indices, T.data = self.indptr, self.indices, self.data
+        return T
+
+
+    def tocsr(self):
+        return self.trans().tocsc().trans()
+
+
+    def tocsc(self):
+        return self
+
+
+    def __mul__(self, A):
+        if isinstance(A, V.Vector):
+            if self.n != A.n:
+                raise ValueError("Size of vector must match width of matrix")
+            y = [0] * self.m
+            for j, x in enumerate(A.elems):
+                if x:
+                    for k in range(self.indptr[j], self.indptr[j+1]):
+                        y[self.indices[k]] += self.data[k]*x
+            return V.Vector._wrap(Utils.make_buffer(y))
+        return self.tocsr() * A
+
+
+def from_dense(A, fmt="csr"):
+    """
+    returns the dense matrix A as a sparse matrix, in format "csr", "csc" or "coo"
+    """
+    if not isinstance(A, M.Matrix):
+        raise TypeError("Can only convert dense matrices")
+    rows = [{j: x for j, x in enumerate(A._get(A._row_slice(i))) if x != 0} for i in range(A.m)]
+    S = CSRMatrix._from_row_dicts(A.m, A.n, rows)
+    if fmt == "csr":
+        return S
+    if fmt == "csc":
+        return S.tocsc()
+    if fmt == "coo":
+        return S.tocoo()
+    raise ValueError(f"Unknown sparse format {fmt!r}")
+
+
+def identity(n):
+    """
+    returns a sparse (CSR) identity matrix of size n
+    """
+    return CSRMatrix(n, n, range(n+1), range(n), [1] * n)
+
+
+def _perm_sign(perm):
+    """
+    returns the sign of a permutation given as a list
+    """
+    seen = [False] * len(perm)
+    sign = 1
+    for i in range(len(perm)):
+        if not seen[i]:
+            j, length = i, 0
+            while not seen[j]:
+                seen[j] = True
+                j = perm[j]
+                length += 1
+            if length % 2 == 0:
+                sign = -sign
+    return sign
+
+
+class SparseLU:
+    """
+    A sparse LU factorization P*A*Q = L*U of a square sparse matrix A.
+
+    Pivots are chosen by Markowitz' rule: among the entries of the sparsest
+    columns, the one minimizing (row count - 1)*(column count - 1), an upper
+    bound on the fill-in its elimination creates. For stability, a candidate
+    must be at least threshold times the largest entry of its column.
+
+        n = size of the factored matrix
+        perm_r, perm_c = the row and column of A chosen as pivot at each step
+        L = list of {step: multiplier} dicts, one per row of A
+        U = list of {column: value} dicts, one per step (the pivot rows)
+        singular = whether A is singular (no usable pivot was left)
+    """
+
+    def __init__(self, A, threshold=0.1, search=4):
+        if isinstance(A, M.Matrix):
+            A = from_dense(A)
+        if not isinstance(A, SparseMatrix):
+            raise TypeError("Can only factor matrices")
+        if A.m != A.n:
+            raise ValueError("LU factorization requires a square matrix")
+
+        n = A.n
+        rows = A.tocsr()._row_dicts()
+        cols = [set() for _ in range(n)]
+        for i, row in enumerate(rows):
+            for j in row:
+                cols[j].add(i)
+
+        # heap of (column count, column), with stale entries skipped when popped
+        counts = [(len(cols[j]), j) for j in range(n)]
+        heapq.heapify(counts)
+        active = [True] * n
+
+        self.n = n
+        self.perm_r, self.perm_c = [], []
+        self.L = [{} for _ in range(n)]
+        self.U = []
+        self.singular = False
+
+        for step in range(n):
+            pivot = self._choose_pivot(rows, cols, counts, active, threshold, search)
+            if pivot is None:
+                self.singular = True
+                break
+            i, j = pivot
+            pivot_row = rows[i]
+            p = pivot_row.pop(j)
+            for c in pivot_row:
+                cols[c].discard(i)
+
+            # eliminate column j from the other rows, recording fill-in
+            for r in cols[j]:
+                if r == i:
+                    continue
+                row = rows[r]
+                f = row.pop(j) / p
+                self.L[r][step] = f
+                for c, x in pivot_row.items():
+                    y = row.get(c, 0) - f*x
+                    if y == 0:
+                        if c in row:
+                            del row[c]
+                            cols[c].discard(r)
+                    else:
+                        if c not in row:
+                            cols[c].add(r)
+                        row[c] = y
+
+            for c in pivot_row:
+                heapq.heappush(counts, (len(cols[c]), c))
+            pivot_row[j] = p
+            self.U.append(pivot_row)
+            self.perm_r.append(i)
+            self.perm_c.append(j)
+            cols[j] = set()
+            rows[i] = {}
+            active[j] = False
+
+
+    @staticmethod
+    def _choose_pivot(rows, cols, counts, active, threshold, search):
+        """
+        returns the (row, column) of the next pivot, or None if the
+        remaining submatrix is zero. looks at the search sparsest columns
+        """
+        candidates = []
+        while counts and len(candidates) < search:
+            count, j = heapq.heappop(counts)
+            if active[j] and count == len(cols[j]) and count > 0:
+                candidates.append((count, j))
+
+        best, best_cost = None, None
+        for count, j in candidates:
+            col_max = max(abs(rows[r][j]) for r in cols[j])
+            if Utils.is_zero(col_max):
+                continue
+            for r in cols[j]:
+                if abs(rows[r][j]) >= threshold*col_max:
+                    cost = (len(rows[r]) - 1) * (count - 1)
+                    if best_cost is None or cost < best_cost:
+                        best, best_cost = (r, j), cost
+
+        for count, j in candidates:
+            if best is None or j != best[1]:
+                heapq.heappush(counts, (count, j))
+        return best
+
+
+    def det(self):
+        """
+        returns the determinant of the factored matrix
+        """
+        if self.singular:
+            return 0
+        det = _perm_sign(self.perm_r) * _perm_sign(self.perm_c)
+        for row, j in zip(self.U, self.perm_c):
+            det *= row[j]
+        return (round(det) if Utils.is_integer(det) else det)
+
+
+    def solve(self, b):
+        """
+        returns the vector x s.t. A*x = b
+        """
+        if not isinstance(b, V.Vector):
+            raise TypeError("Can only solve for a vector right-hand side")
+        if b.n != self.n:
+            raise ValueError("Size of vector must match size of matrix")
+        if self.singular:
+            raise ValueError("Matrix is not invertible")
+
+        # forward substitution through L, in pivot order
+        y = []
+        for r in self.perm_r:
+            y.append(b.elems[r] - sum(f*y[s] for s, f in self.L[r].items()))
+
+        # back substitution through U
+        x = [0] * self.n
+        for k in range(self.n - 1, -1, -1):
+            j = self.perm_c[k]
+            row = self.U[k]
+            s = sum(v*x[c] for c, v in row.items() if c != j)
+            x[j] = (y[k] - s) / row[j]
+        return V.Vector._wrap(Utils.make_buffer([(round(e) if Utils.is_integer(e) else e) for e in x]))
+
+
+    def nnz(self):
+        """
+        returns the number of entries stored in L and U together
+        """
+        return sum(len(row) for row in self.L) + sum(len(row) for row in self.U)
+
+
+def lu(A, threshold=0.1):
+    """
+    returns the sparse LU factorization of a square matrix A
+    """
+    return SparseLU(A, threshold)
+
+
+def spsolve(A, b):
+    """
+    returns the vector x s.t. A*x = b, for a sparse matrix A
+    """
+    return SparseLU(A).solve(b)
@@ -0,0 +1,940 @@
+"""
+Structured matrices, storing only the entries their structure allows.
+
+    DiagonalMatrix   = the n entries of the diagonal
+    TriangularMatrix = the n*(n+1)/2 entries on and above (upper) or on and
+                       below (lower) the diagonal
+    BandedMatrix     = the n*(lower+upper+1) entries within lower diagonals
+                       below and upper diagonals above the diagonal
+    SymmetricMatrix  = the n*(n+1)/2 entries on and below the diagonal
+
+All four multiply with dense matrices, vectors and each other, and add,
+subtract and compare with dense matrices. Each has multiply, solve,
+determinant and inverse kernels that work on its own storage:
+    diagonal   = O(n) solves, determinants and inverses
+    triangular = O(n^2) solves by substitution, O(n) determinants
+    banded     = banded LU with partial pivoting, O(n*lower*(lower+upper)),
+                 so a tridiagonal system solves in O(n)
+    symmetric  = Cholesky for positive definite matrices (half the work of
+                 LU), falling back to LU for indefinite ones
+"""
+
+import math
+import operator
+import Matrix as M
+import Vector as V
+import LU
+import Utils
+
+
+def _from_rows(rows, m, n):
+    """
+    returns the m by n dense matrix with the given list of rows
+    """
+    return M.Matrix._wrap(m, n, Utils.make_buffer([x for row in rows for x in row]))
+
+
+def _rounded(x):
+    return (round(x) if Utils.is_integer(x) else x)
+
+
+class StructuredMatrix:
+    """
+    Shared behaviour of the structured matrix types, which are all square.
+
+        m = number of rows
+        n = number of columns (the same as m)
+    """
+
+    def _row(self, i):
+        """
+        returns row i as a list of all n entries
+        """
+        raise NotImplementedError
+
+
+    def _matvec(self, x):
+        """
+        returns the product of the matrix with the sequence x, as a list
+        """
+        raise NotImplementedError
+
+
+    def _rmatvec(self, x):
+        """
+        returns the product of the sequence x (as a row) with the matrix, as a list
+        """
+        raise NotImplementedError
+
+
+    def _solve(self, b):
+        """
+        returns the solution x of A*x = b for a sequence b, as a list
+        """
+        raise NotImplementedError
+
+
+    def _solver(self):
+        """
+        returns a function solving A*x = b for a sequence b, as _solve does,
+        with any factorization it needs done once, for every right-hand side
+        """
+        return self._solve
+
+
+    def _combine(self, A, sign):
+        """
+        returns self + sign*A as a structured matrix when A has a structure
+        the result keeps, otherwise None
+        """
+        return None
+
+
+    def to_dense(self):
+        """
+        returns the structured matrix as a dense Matrix
+        """
+        return _from_rows([self._row(i) for i in range(self.n)], self.n, self.n)
+
+
+    def at(self, i, j):
+        """
+        returns the (i,j) entry of a structured matrix
+        """
+        if not (0 <= i < self.m and 0 <= j < self.n):
+            raise IndexError("index out of range")
+        return self._at(i, j)
+
+
+    def __mul__(self, A):
+        if isinstance(A, V.Vector):
+            if self.n != A.n:
+                raise ValueError("Size of vector must match width of matrix")
+            return V.Vector._wrap(Utils.make_buffer(self._matvec(A.elems)))
+        if isinstance(A, StructuredMatrix):
+            A = A.to_dense()
+        if isinstance(A, M.Matrix):
+            if self.n != A.m:
+                raise ValueError("Width of left matrix must match height of right matrix")
+            cols = [self._matvec(A._get(A._col_slice(j))) for j in range(A.n)]
+            return _from_rows(zip(*cols), self.m, A.n) if cols else M.Matrix(self.m, 0)
+        raise TypeError("Can only multiply a matrix by a matrix or a vector")
+
+
+    def __rmul__(self, A):
+        if isinstance(A, M.Matrix):
+            if A.n != self.m:
+                raise ValueError("Width of left matrix must match height of right matrix")
+            return _from_rows([self._rmatvec(A._get(A._row_slice(i))) for i in range(A.m)], A.m, self.n)
+        return NotImplemented
+
+
+    def _check_shape(self, A):
+        if self.m != A.m or self.n != A.n:
+            raise ValueError("Can only add matrices of same dimensions")
+
+
+    def __add__(self, A):
+        if isinstance(A, StructuredMatrix):
+            self._check_shape(A)
+            R = self._combine(A, 1)
+            return R if R is not None else self.to_dense() + A.to_dense()
+        if isinstance(A, M.Matrix):
+            return self.to_dense() + A
+        raise TypeError("Can only add matrices to matrices")
+
+
+    def __sub__(self, A):
+        if isinstance(A, StructuredMatrix):
+            self._check_shape(A)
+            R = self._combine(A, -1)
+            return R if R is not None else self.to_dense() - A.to_dense()
+        if isinstance(A, M.Matrix):
+            return self.to_dense() - A
+        raise TypeError("Can only subtract matrices from matrices")
+
+
+    def __radd__(self, A):
+        if isinstance(A, M.Matrix):
+            return A + self.to_dense()
+        return NotImplemented
+
+
+    def __rsub__(self, A):
+        if isinstance(A, M.Matrix):
+            return A - self.to_dense()
+        return NotImplemented
+
+
+    def __eq__(self, A):
+        if isinstance(A, StructuredMatrix):
+            A = A.to_dense()
+        if isinstance(A, M.Matrix):
+            return self.to_dense() == A
+        return False
+
+
+    def __ne__(self, A):
+        return not (self == A)
+
+
+    def __str__(self):
+        return str(self.to_dense())
+
+
+    def solve(self, b):
+        """
+        returns the vector x s.t. A*x = b, or for a matrix b, the matrix X s.t. A*X = b
+        """
+        if isinstance(b, V.Vector):
+            if b.n != self.n:
+                raise ValueError("Size of vector must match size of matrix")
+            return V.Vector._wrap(Utils.make_buffer([_rounded(e) for e in self._solve(b.elems)]))
+        if isinstance(b, M.Matrix):
+            if b.m != self.n:
+                raise ValueError("Height of right-hand side must match size of matrix")
+            solve = self._solver()
+            cols = [solve(b._get(b._col_slice(j))) for j in range(b.n)]
+            return LU._from_cols(cols, self.n, b.n)
+        raise TypeError("Can only solve for a vector or matrix right-hand side")
+
+
+    def inverse(self):
+        """
+        returns the inverse of the matrix, as a dense Matrix
+        """
+        n = self.n
+        solve = self._solver()
+        cols = []
+        for j in range(n):
+            e = [0] * n
+            e[j] = 1
+            cols.append(solve(e))
+        return LU._from_cols(cols, n, n)
+
+
+class DiagonalMatrix(StructuredMatrix):
+    """
+    A square matrix that is zero off its diagonal.
+
+        n = size of the matrix
+        diag = buffer of the n diagonal entries
+    """
+
+    def __init__(self, n, diag=None):
+        if diag is not None and len(diag) != n:
+            raise ValueError("Length of diagonal does not match size of matrix")
+        self.m = self.n = n
+        self.diag = Utils.make_buffer(list(diag)) if diag is not None else Utils.zeros(n)
+
+
+    @classmethod
+    def _wrap(cls, diag):
+        D = cls.__new__(cls)
+        D.m = D.n = len(diag)
+        D.diag = diag
+        return D
+
+
+    def _at(self, i, j):
+        return self.diag[i] if i == j else 0
+
+
+    def _row(self, i):
+        row = [0] * self.n
+        row[i] = self.diag[i]
+        return row
+
+
+    def _matvec(self, x):
+        return list(map(operator.mul, self.diag, x))
+
+
+    _rmatvec = _matvec
+
+
+    def _solve(self, b):
+        if not all(self.diag):
+            raise ValueError("Matrix is not invertible")
+        return list(map(operator.truediv, b, self.diag))
+
+
+    def _combine(self, A, sign):
+        if isinstance(A, DiagonalMatrix):
+            return DiagonalMatrix._wrap(Utils.make_buffer([x + sign*y for x, y in zip(self.diag, A.diag)]))
+        return None
+
+
+    def __mul__(self, A):
+        if isinstance(A, DiagonalMatrix):
+            if self.n != A.n:
+                raise ValueError("Width of left matrix must match height of right matrix")
+            return DiagonalMatrix._wrap(Utils.make_buffer(self._matvec(A.diag)))
+        return super().__mul__(A)
+
+
+    def trans(self):
+        return self
+
+
+    def det(self):
+        """
+        returns the determinant, the product of the diagonal
+        """
+        return math.prod(self.diag)
+
+
+    def inverse(self):
+        """
+        returns the inverse, the diagonal matrix of reciprocals
+        """
+        return DiagonalMatrix._wrap(Utils.make_buffer([_rounded(x) for x in self._solve([1] * self.n)]))
+
+
+class TriangularMatrix(StructuredMatrix):
+    """
+    A square matrix that is zero below (upper) or above (lower) its diagonal.
+
+        n = size of the matrix
+        lower = whether the matrix is lower triangular
+        data = flat buffer of the rows of the triangle, packed one after
+               another: row i holds columns i to n-1 if upper, 0 to i if lower
+    """
+
+    def __init__(self, n, rows=None, lower=False):
+        self.m = self.n = n
+        self.lower = lower
+        if rows is None:
+            self.data = Utils.zeros(n*(n+1) // 2)
+            return
+        if len(rows) != n:
+            raise ValueError("Number of rows does not match size of matrix")
+        for i, row in enumerate(rows):
+            if len(row) != (i + 1 if lower else n - i):
+                raise ValueError(f"Row {i} of a {'lower' if lower else 'upper'} triangular matrix "
+                                 f"must have {i + 1 if lower else n - i} entries")
+        self.data = Utils.make_buffer([x for row in rows for x in row])
+
+
+    @classmethod
+    def _wrap(cls, n, data, lower):
+        T = cls.__new__(cls)
+        T.m = T.n = n
+        T.lower = lower
+        T.data = data
+        return T
+
+
+    def _start(self, i):
+        """
+        returns the position of row i in data
+        """
+        return i*(i+1) // 2 if self.lower else i*self.n - i*(i-1) // 2
+
+
+    def _tri_row(self, i):
+        """
+        returns the stored part of row i
+        """
+        start = self._start(i)
+        return self.data[start:start + (i + 1 if self.lower else self.n - i)]
+
+
+    def _at(self, i, j):
+        if self.lower:
+            return self.data[self._start(i) + j] if j <= i else 0
+        return self.data[self._start(i) + j - i] if j >= i else 0
+
+
+    def _row(self, i):
+        part = list(self._tri_row(i))
+        if self.lower:
+            return part + [0] * (self.n - i - 1)
+        return [0] * i + part
+
+
+    def _matvec(self, x):
+        mul = operator.mul
+        if self.lower:
+            return [sum(map(mul, self._tri_row(i), x[:i+1])) for i in range(self.n)]
+        return [sum(map(mul, self._tri_row(i), x[i:])) for i in range(self.n)]
+
+
+    def _rmatvec(self, x):
+        n = self.n
+        y = [0] * n
+        for i in range(n):
+            if x[i]:
+                if self.lower:
+                    y[:i+1] = Utils.axpy(x[i], self._tri_row(i), y[:i+1])
+                else:
+                    y[i:] = Utils.axpy(x[i], self._tri_row(i), y[i:])
+        return y
+
+
+    def _diagonal(self):
+        return [self._at(i, i) for i in range(self.n)]
+
+
+    def _solve(self, b):
+        """
+        forward (lower) or back (upper) substitution, O(n^2)
+        """
+        n = self.n
+        mul = operator.mul
+        if not all(self._diagonal()):
+            raise ValueError("Matrix is not invertible")
+        x = [0] * n
+        if self.lower:
+            for i in range(n):
+                row = self._tri_row(i)
+                x[i] = (b[i] - sum(map(mul, row[:i], x[:i]))) / row[i]
+        else:
+            for i in range(n-1, -1, -1):
+                row = self._tri_row(i)
+                x[i] = (b[i] - sum(map(mul, row[1:], x[i+1:]))) / row[0]
+        return x
+
+
+    def _combine(self, A, sign):
+        if isinstance(A, TriangularMatrix) and A.lower == self.lower:
+            data = Utils.make_buffer([x + sign*y for x, y in zip(self.data, A.data)])
+            return TriangularMatrix._wrap(self.n, data, self.lower)
+        return None
+
+
+    def __mul__(self, A):
+        if isinstance(A, TriangularMatrix) and A.lower == self.lower:
+            P = super().__mul__(A)
+            return from_dense(P, "lower" if self.lower else "upper")
+        return super().__mul__(A)
+
+
+    def trans(self):
+        """
+        returns the transpose, triangular on the other side
+        """
+        n = self.n
+        if self.lower:
+            rows = [[self._at(i, j) for i in range(j, n)] for j in range(n)]
+        else:
+            rows = [[self._at(i, j) for i in range(j + 1)] for j in range(n)]
+        return TriangularMatrix._wrap(n, Utils.make_buffer([x for row in rows for x in row]), not self.lower)
+
+
+    def det(self):
+        """
+        returns the determinant, the product of the diagonal
+        """
+        return math.prod(self._diagonal())
+
+
+    def inverse(self):
+        """
+        returns the inverse, triangular on the same side. column j of the
+        inverse only involves the leading (upper) or trailing (lower) part of
+        the matrix from row j, so the whole costs O(n^3/6)
+        """
+        n = self.n
+        mul = operator.mul
+        if not all(self._diagonal()):
+            raise ValueError("Matrix is not invertible")
+        cols = []
+        for j in range(n):
+            x = [0] * n
+            if self.lower:
+                x[j] = 1 / self._at(j, j)
+                for i in range(j + 1, n):
+                    row = self._tri_row(i)
+                    x[i] = -sum(map(mul, row[j:i], x[j:i])) / row[i]
+            else:
+                x[j] = 1 / self._at(j, j)
+                for i in range(j - 1, -1, -1):
+                    row = self._tri_row(i)
+                    x[i] = -sum(map(mul, row[1:j-i+1], x[i+1:j+1])) / row[0]
+            cols.append(x)
+        if self.lower:
+            rows = [[_rounded(cols[j][i]) for j in range(i + 1)] for i in range(n)]
+        else:
+            rows = [[_rounded(cols[j][i]) for j in range(i, n)] for i in range(n)]
+        return TriangularMatrix._wrap(n, Utils.make_buffer([x for row in rows for x in row]), self.lower)
+
+
+class BandedLU:
+    """
+    An LU factorization with partial pivoting of a banded matrix. Row swaps
+    stay within the band, so U has at most lower+upper diagonals above its
+    own, and factoring costs O(n*lower*(lower+upper)) time and
+    O(n*(2*lower+upper)) memory: O(n) for a tridiagonal matrix.
+
+        n = size of the factored matrix
+        pivots = list of the row swapped with row k at step k
+        mult = list of the multipliers of step k, applied to rows k+1 to k+lower
+        U = list of the rows of U, row k holding columns k on
+        sign = sign of the row permutation (1 or -1)
+        singular = whether the matrix is singular (a zero pivot was met)
+    """
+
+    def __init__(self, A):
+        n, l, u = A.n, A.lower, A.upper
+        # each row is [first column, entries from it], its band widening as rows are swapped in
+        rows = []
+        for i in range(n):
+            lo, hi = max(0, i - l), min(n, i + u + 1)
+            base = A._base(i)
+            rows.append([lo, [float(x) for x in A.data[base + lo:base + hi]]])
+
+        self.n = n
+        self.pivots, self.mult, self.U = [], [], []
+        self.sign = 1
+        self.singular = False
+        for k in range(n):
+            last = min(n, k + l + 1)
+            p = max(range(k, last), key=lambda i: abs(_entry(rows[i], k)))
+            if Utils.is_zero(_entry(rows[p], k)):
+                self.singular = True
+                return
+            if p != k:
+                rows[k], rows[p] = rows[p], rows[k]
+                self.sign = -self.sign
+            start, values = rows[k]
+            tail = values[k - start:]
+            pivot = tail[0]
+            fs = []
+            for i in range(k + 1, last):
+                s, v = rows[i]
+                f = _entry(rows[i], k) / pivot
+                rest = v[k + 1 - s:]
+                if len(rest) < len(tail) - 1:
+                    rest += [0.0] * (len(tail) - 1 - len(rest))
+                if f:
+                    rest[:len(tail) - 1] = Utils.axpy(-f, tail[1:], rest[:len(tail) - 1])
+                rows[i] = [k + 1, rest]
+                fs.append(f)
+            self.pivots.append(p)
+            self.mult.append(fs)
+            self.U.append(tail)
+
+
+    def det(self):
+        """
+        returns the determinant of the factored matrix
+        """
+        if self.singular:
+            return 0
+        det = self.sign * math.prod(row[0] for row in self.U)
+        return _rounded(det)
+
+
+    def _solve(self, b):
+        if self.singular:
+            raise ValueError("Matrix is not invertible")
+        x = [float(e) for e in b]
+        for k, (p, fs) in enumerate(zip(self.pivots, self.mult)):
+            x[k], x[p] = x[p], x[k]
+            xk = x[k]
+            for t, f in enumerate(fs, k + 1):
+                x[t] -= f * xk
+        mul = operator.mul
+        for k in range(self.n - 1, -1, -1):
+            row = self.U[k]
+            x[k] = (x[k] - sum(map(mul, row[1:], x[k+1:k+len(row)]))) / row[0]
+        return x
+
+
+    def solve(self, b):
+        """
+        returns the vector x s.t. A*x = b
+        """
+        if not isinstance(b, V.Vector):
+            raise TypeError("Can only solve for a vector right-hand side")
+        if b.n != self.n:
+            raise ValueError("Size of vector must match size of matrix")
+        return V.Vector._wrap(Utils.make_buffer([_rounded(e) for e in self._solve(b.elems)]))
+
+
+def _entry(row, j):
+    """
+    returns the entry in column j of a row [first column, entries] of BandedLU
+    """
+    start, values = row
+    return values[j - start] if start <= j < start + len(values) else 0
+
+
+class BandedMatrix(StructuredMatrix):
+    """
+    A square matrix that is zero outside a band around its diagonal.
+
+        n = size of the matrix
+        lower = number of nonzero diagonals below the diagonal
+        upper = number of nonzero diagonals above the diagonal
+        data = flat buffer of n rows of lower+upper+1 entries each: row i
+               holds columns i-lower to i+upper (positions outside the
+               matrix hold zeros)
+    """
+
+    def __init__(self, n, lower, upper, diagonals=None):
+        """
+        diagonals, if given, lists the lower+upper+1 diagonals of the band from
+        the lowest (n-lower entries) to the highest (n-upper entries)
+        """
+        if lower < 0 or upper < 0:
+            raise ValueError("Bandwidths must be non-negative")
+        self.m = self.n = n
+        self.lower = lower
+        self.upper = upper
+        width = lower + upper + 1
+        if diagonals is None:
+            self.data = Utils.zeros(n * width)
+            return
+        if len(diagonals) != width:
+            raise ValueError(f"Band has {width} diagonals (got {len(diagonals)})")
+        flat = [0] * (n * width)
+        for d, values in zip(range(-lower, upper + 1), diagonals):
+            if len(values) != n - abs(d):
+                raise ValueError(f"Diagonal {d} must have {n - abs(d)} entries (got {len(values)})")
+            for t, x in enumerate(values):
+                i = t - d if d < 0 else t
+                flat[i*width + d + lower] = x
+        self.data = Utils.make_buffer(flat)
+
+
+    @classmethod
+    def _wrap(cls, n, lower, upper, data):
+        B = cls.__new__(cls)
+        B.m = B.n = n
+        B.lower = lower
+        B.upper = upper
+        B.data = data
+        return B
+
+
+    def _base(self, i):
+        """
+        returns the position in data where column j of row i would be at
+        _base(i) + j
+        """
+        return i*(self.lower + self.upper + 1) - i + self.lower
+
+
+    def _span(self, i):
+        """
+        returns the first and past-the-last columns of row i within the band
+        """
+        return max(0, i - self.lower), min(self.n, i + self.upper + 1)
+
+
+    def _at(self, i, j):
+        if -self.lower <= j - i <= self.upper:
+            return self.data[self._base(i) + j]
+        return 0
+
+
+    def _row(self, i):
+        lo, hi = self._span(i)
+        base = self._base(i)
+        return [0] * lo + list(self.data[base + lo:base + hi]) + [0] * (self.n - hi)
+
+
+    def _matvec(self, x):
+        mul = operator.mul
+        y = []
+        for i in range(self.n):
+            lo, hi = self._span(i)
+            base = self._base(i)
+            y.append(sum(map(mul, self.data[base + lo:base + hi], x[lo:hi])))
+        return y
+
+
+    def _rmatvec(self, x):
+        y = [0] * self.n
+        for i in range(self.n):
+            if x[i]:
+                lo, hi = self._span(i)
+                base = self._base(i)
+                y[lo:hi] = Utils.axpy(x[i], self.data[base + lo:base + hi], y[lo:hi])
+        return y
+
+
+    def lu(self):
+        """
+        returns the banded LU factorization of the matrix, to reuse for many solves
+        """
+        return BandedLU(self)
+
+
+    def _solve(self, b):
+        return self._solver()(b)
+
+
+    def _solver(self):
+        return BandedLU(self)._solve
+
+
+    def _combine(self, A, sign):
+        if isinstance(A, BandedMatrix):
+            lower, upper = max(self.lower, A.lower), max(self.upper, A.upper)
+            width = lower + upper + 1
+            flat = [0] * (self.n * width)
+            for B, s in ((self, 1), (A, sign)):
+                for i in range(self.n):
+                    lo, hi = B._span(i)
+                    base, to = B._base(i), i*width - i + lower
+                    for j in range(lo, hi):
+                        flat[to + j] += s * B.data[base + j]
+            return BandedMatrix._wrap(self.n, lower, upper, Utils.make_buffer(flat))
+        return None
+
+
+    def __mul__(self, A):
+        if isinstance(A, BandedMatrix):
+            if self.n != A.n:
+                raise ValueError("Width of left matrix must match height of right matrix")
+            n = self.n
+            lower, upper = min(self.lower + A.lower, max(n - 1, 0)), min(self.upper + A.upper, max(n - 1, 0))
+            width = lower + upper + 1
+            flat = [0] * (n * width)
+            for i in range(n):
+                lo, hi = self._span(i)
+                base = self._base(i)
+                to = i*width - i + lower
+                for j in range(lo, hi):
+                    a = self.data[base + j]
+                    if a:
+                        blo, bhi = A._span(j)
+                        bbase = A._base(j)
+                        for k in range(blo, bhi):
+                            flat[to + k] += a * A.data[bbase + k]
+            return BandedMatrix._wrap(n, lower, upper, Utils.make_buffer(flat))
+        return super().__mul__(A)
+
+
+    def trans(self):
+        """
+        returns the transpose, with the bandwidths swapped
+        """
+        n, lower, upper = self.n, self.upper, self.lower
+        width = lower + upper + 1
+        flat = [0] * (n * width)
+        for i in range(n):
+            lo, hi = self._span(i)
+            base = self._base(i)
+            for j in range(lo, hi):
+                flat[j*width - j + lower + i] = self.data[base + j]
+        return BandedMatrix._wrap(n, lower, upper, Utils.make_buffer(flat))
+
+
+    def det(self):
+        """
+        returns the determinant, from the banded LU factorization
+        """
+        return BandedLU(self).det()
+
+
+class SymmetricMatrix(StructuredMatrix):
+    """
+    A square matrix equal to its transpose.
+
+        n = size of the matrix
+        data = flat buffer of the rows of the lower triangle, packed one after
+               another: row i holds columns 0 to i
+    """
+
+    def __init__(self, n, rows=None):
+        """
+        rows, if given, lists the rows of the lower triangle, row i having i+1 entries
+        """
+        self.m = self.n = n
+        if rows is None:
+            self.data = Utils.zeros(n*(n+1) // 2)
+            return
+        if len(rows) != n or any(len(row) != i + 1 for i, row in enumerate(rows)):
+            raise ValueError("Rows of the lower triangle must have 1, 2, ..., n entries")
+        self.data = Utils.make_buffer([x for row in rows for x in row])
+
+
+    @classmethod
+    def _wrap(cls, n, data):
+        S = cls.__new__(cls)
+        S.m = S.n = n
+        S.data = data
+        return S
+
+
+    def _tri_row(self, i):
+        start = i*(i+1) // 2
+        return self.data[start:start + i + 1]
+
+
+    def _at(self, i, j):
+        if j > i:
+            i, j = j, i
+        return self.data[i*(i+1) // 2 + j]
+
+
+    def _row(self, i):
+        return list(self._tri_row(i)) + [self._at(j, i) for j in range(i + 1, self.n)]
+
+
+    def _matvec(self, x):
+        # row i of the lower triangle serves as row i and, left of the diagonal, column i
+        n = self.n
+        mul = operator.mul
+        y = [0] * n
+        for i in range(n):
+            row = self._tri_row(i)
+            y[i] += sum(map(mul, row, x[:i+1]))
+            if x[i] and i:
+                y[:i] = Utils.axpy(x[i], row[:i], y[:i])
+        return y
+
+
+    _rmatvec = _matvec
+
+
+    def cholesky(self):
+        """
+        returns the lower triangular L s.t. A = L*L^T. throws an error if the
+        matrix is not positive definite
+        """
+        L = self._cholesky()
+        if L is None:
+            raise ValueError("Matrix is not positive definite")
+        return L
+
+
+    def _cholesky(self):
+        """
+        returns the Cholesky factor, or None if the matrix is not positive definite
+        """
+        n = self.n
+        mul = operator.mul
+        rows = []
+        for i in range(n):
+            a = self._tri_row(i)
+            row = []
+            for j in range(i + 1):
+                s = a[j] - sum(map(mul, row[:j], rows[j][:j])) if j < i else a[j] - sum(map(mul, row, row))
+                if j < i:
+                    row.append(s / rows[j][j])
+                elif s <= 0:
+                    return None
+                else:
+                    row.append(math.sqrt(s))
+            rows.append(row)
+        return TriangularMatrix._wrap(n, Utils.pack([x for row in rows for x in row], "d"), True)
+
+
+    def _solver(self):
+        """
+        returns a function solving A*x = b for a sequence b: through the
+        Cholesky factor if the matrix is positive definite, otherwise through LU
+        """
+        L = self._cholesky()
+        if L is None:
+            F = LU.lu(self.to_dense())
+            F._check_invertible()
+            return F._solve
+        U = L.trans()
+        return lambda b: U._solve(L._solve(b))
+
+
+    def _solve(self, b):
+        return self._solver()(b)
+
+
+    def _combine(self, A, sign):
+        if isinstance(A, SymmetricMatrix):
+            return SymmetricMatrix._wrap(self.n, Utils.make_buffer([x + sign*y for x, y in zip(self.data, A.data)]))
+        if isinstance(A, DiagonalMatrix):
+            data = list(self.data)
+            for i, d in enumerate(A.diag):
+                data[i*(i+1) // 2 + i] += sign*d
+            return SymmetricMatrix._wrap(self.n, Utils.make_buffer(data))
+        return None
+
+
+    def trans(self):
+        return self
+
+
+    def det(self):
+        """
+        returns the determinant: the squared product of the diagonal of the
+        Cholesky factor for a positive definite matrix, otherwise from LU
+        """
+        L = self._cholesky()
+        if L is None:
+            return LU.lu(self.to_dense()).det()
+        return _rounded(math.prod(L._diagonal())**2)
+
+
+    def inverse(self):
+        """
+        returns the inverse, which is symmetric too
+        """
+        n = self.n
+        solve = self._solver()
+        cols = []
+        for j in range(n):
+            e = [0] * n
+            e[j] = 1
+            cols.append(solve(e))
+        rows = [[_rounded(cols[j][i]) for j in range(i + 1)] for i in range(n)]
+        return SymmetricMatrix._wrap(n, Utils.make_buffer([x for row in rows for x in row]))
+
+
+def from_dense(A, structure, lower=None, upper=None):
+    """
+    returns the square dense matrix A as a structured matrix: structure is
+    "diagonal", "upper" or "lower" (triangular), "banded" (lower and upper
+    default to the bandwidths of A) or "symmetric". throws an error if A
+    does not have the structure
+    """
+    if not isinstance(A, M.Matrix):
+        raise TypeError("Can only convert dense matrices")
+    if A.m != A.n:
+        raise ValueError("Structured matrices must be square")
+    n = A.n
+    rows = [list(A._get(A._row_slice(i))) for i in range(n)]
+    outside = None
+    if structure == "diagonal":
+        outside = lambda i, j: i != j
+        S = DiagonalMatrix(n, [rows[i][i] for i in range(n)])
+    elif structure == "upper":
+        outside = lambda i, j: j < i
+        S = TriangularMatrix(n, [row[i:] for i, row in enumerate(rows)])
+    elif structure == "lower":
+        outside = lambda i, j: j > i
+        S = TriangularMatrix(n, [row[:i+1] for i, row in enumerate(rows)], lower=True)
+    elif structure == "banded":
+        nonzero = [j - i for i, row in enumerate(rows) for j, x in enumerate(row) if x != 0]
+        lower = min(max([-d for d in nonzero] + [0]) if lower is None else lower, max(n - 1, 0))
+        upper = min(max(nonzero + [0]) if upper is None else upper, max(n - 1, 0))
+        outside = lambda i, j: not -lower <= j - i <= upper
+        diagonals = [[rows[t - d][t] if d < 0 else rows[t][t + d] for t in range(n - abs(d))] for d in range(-lower, upper + 1)]
+        S = BandedMatrix(n, lower, upper, diagonals)
+    elif structure == "symmetric":
+        if any(rows[i][j] != rows[j][i] for i in range(n) for j in range(i)):
+            raise ValueError("Matrix is not symmetric")
+        S = SymmetricMatrix(n, [row[:i+1] for i, row in enumerate(rows)])
+    else:
+        raise ValueError(f"Unknown structure {structure!r}")
+    if outside is not None and any(x != 0 and outside(i, j) for i, row in enumerate(rows) for j, x in enumerate(row)):
+        raise ValueError(f"Matrix is not {structure}" + (" triangular" if structure in ("upper", "lower") else ""))
+    return S
+
+
+def identity(n):
+    """
+    returns an identity matrix of size n, storing only its diagonal
+    """
+    return DiagonalMatrix._wrap(Utils.pack([1] * n, "q"))
+
+
+def tridiagonal(sub, diag, sup):
+    """
+    returns the tridiagonal matrix with the given subdiagonal, diagonal and
+    superdiagonal (of n-1, n and n-1 entries)
+    """
+    return BandedMatrix(len(diag), 1, 1, [sub, diag, sup])
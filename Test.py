@@ -1,8 +1,35 @@
 import Vector as V
 import Matrix as M
+import Kernels as K
+import LU
+import Backend as B
+import Sparse as S
+import Batch
+import Lazy
+import Iterative as I
+import Parallel as P
+import IO
+import OutOfCore as OC
+import Bench
+import Profile
+import Cache
+import Format
+import Utils
+import QR
+import Eigen
+import Structured as St
+import Async
 import operator as O
 
+import asyncio
 import math
+import os
+import io
+import tempfile
+import random
+import time
+from array import array
+from fractions import Fraction
 
 
 def test_func(f, x, y, tol=1e-6):
@@ -207,6 +234,53 @@ def test_vector_methods(v=False):
     run_method_tests(cases, names, v)
 
 
+def test_storage(v=False):
+    """
+    Tests how vectors and matrices store their entries: typed buffers and slots.
+    """
+    print(f"Testing storage:{' (verbose feedback)' if v else ''}")
+
+    def storage(x):
+        """
+        returns the typecode of the buffer of a vector or matrix (None for generic entries)
+        """
+        return Utils.typecode(x.elems if isinstance(x, V.Vector) else x.data)
+
+    def has_dict(x):
+        return hasattr(x, "__dict__")
+
+    def layout(A):
+        return [A.strides, A.offset, len(A.data)]
+
+    names = {
+        storage  : "\n\tBuffer types:",
+        has_dict : "\n\tSlotted instances:",
+        layout   : "\n\tFlat row-major layout:"
+    }
+
+    cases = [   # (function, [inputs], expected)
+        (storage, [V.Vector(3, [1, 2, 3])], "q"),
+        (storage, [V.Vector(3, [1.0, 2.0, 3.0])], "q"),
+        (storage, [V.Vector(2, [1.5, 2])], "d"),
+        (storage, [V.Vector(2, [Fraction(1, 3), 1])], None),
+        (storage, [V.Vector(2, [2**70, 1])], None),
+        (storage, [V.Vector(3)], "q"),
+        (storage, [V.Vector._wrap(array("d", [1.0, 2.0]))], "d"),
+        (storage, [V.Vector(2, [1, 2]).times(0.5)], "d"),
+        (storage, [M.Matrix(2, 2, [[1, 2], [3, 4]])], "q"),
+        (storage, [M.Matrix(2, 2, [[1, 2], [3, 4.5]])], "d"),
+        (storage, [M.Matrix(1, 2, [[Fraction(1, 3), 1]])], None),
+
+        (has_dict, [V.Vector(2, [1, 2])], False),
+        (has_dict, [M.Matrix(2, 2)], False),
+
+        (layout, [M.Matrix(2, 3, [[1, 2, 3], [4, 5, 6]])], [(3, 1), 0, 6]),
+        (layout, [M.Matrix(3, 3).submatrix((1, 1), (2, 2))], [(3, 1), 4, 9])
+    ]
+
+    run_func_tests(cases, names, v)
+
+
 def test_matrix_ops(v=False):
     """
     Tests supported matrix operators: +, -, *, ==, and !=.
@@ -282,7 +356,1806 @@ def test_matrix_ops(v=False):
     run_func_tests(cases, names, v)
 
 
+def test_indexing(v=False):
+    """
+    Tests matrix indexing: .at() bounds, row, column and submatrix views, and .rows.
+    """
+    print(f"Testing matrix indexing and views:{' (verbose feedback)' if v else ''}")
+
+    mat = [
+        M.Matrix(3, 3, [[1, 2, 3], [4, 5, 6], [7, 8, 9]]),  # 0
+        B.to_backend(M.Matrix(2, 2, [[1, 2], [3, 4]]), "python")
+    ]
+
+    def read(f, *args):
+        """
+        returns the entries of the view f(*args), as a list of lists (or a list for vectors)
+        """
+        x = f(*args)
+        if isinstance(x, V.Vector):
+            return Utils.to_list(x.elems)
+        return [Utils.to_list(x._get(x._row_slice(i))) for i in range(x.m)]
+
+    def write_through(view, mutate):
+        """
+        returns a copy A of mat[0] after mutate is applied to the view view(A)
+        """
+        A = mat[0].copy()
+        mutate(view(A))
+        return A
+
+    def row_lists(A, sl):
+        """
+        returns the rows of A in the slice sl, as lists
+        """
+        return [Utils.to_list(r.elems) for r in A.rows[sl]]
+
+    def set_elem(A):
+        A.row(0).elems[0] = 5
+
+    def set_row(A, i, v):
+        A.rows[i] = v
+        return A
+
+    def set_row_det(A, i, v):
+        """
+        returns det(A) after caching it, then assigning v to row i
+        """
+        A.det()
+        A.rows[i] = v
+        return A.det()
+
+    names = {
+        M.Matrix.at   : "\n\tGet (i,j) entry (at):",
+        read          : "\n\tReading through views:",
+        write_through : "\n\tWriting through views:",
+        row_lists     : "\n\tIterating and slicing rows:",
+        set_elem      : "\n\tWriting directly into a view's elements:",
+        set_row       : "\n\tAssign a row (rows[i] = v):",
+        set_row_det   : "\n\tDeterminant after assigning a row:"
+    }
+
+    cases = [   # (function, [inputs], expected)
+        (M.Matrix.at, [mat[0], 1, 2], 6),
+        (M.Matrix.at, [mat[0], -1, -3], 7),
+        (M.Matrix.at, [mat[0], -3, 0], 1),
+        (M.Matrix.at, [mat[0], -4, 0], IndexError),
+        (M.Matrix.at, [mat[0], -5, 0], IndexError),
+        (M.Matrix.at, [mat[0], 0, -4], IndexError),
+        (M.Matrix.at, [mat[0], 0, 3], IndexError),
+        (M.Matrix.at, [mat[0], 3, 0], ValueError),
+
+        (read, [mat[0].row, 1], [4, 5, 6]),
+        (read, [mat[0].row, -1], [7, 8, 9]),
+        (read, [mat[0].col, 1], [2, 5, 8]),
+        (read, [mat[0].col, -3], [1, 4, 7]),
+        (read, [mat[0].row, 3], IndexError),
+        (read, [mat[0].col, -4], IndexError),
+        (read, [mat[0].submatrix, (1, 1), (2, 2)], [[5, 6], [8, 9]]),
+        (read, [mat[0].submatrix((1, 0), (2, 3)).col, 2], [6, 9]),
+        (read, [M.trans(mat[0]).row, 0], [1, 4, 7]),
+        (read, [lambda: mat[0].rows[-1]], [7, 8, 9]),
+        (row_lists, [mat[0], slice(1, None)], [[4, 5, 6], [7, 8, 9]]),
+        (row_lists, [mat[0], slice(None)], [[1, 2, 3], [4, 5, 6], [7, 8, 9]]),
+
+        (write_through, [lambda A: A.submatrix((1, 1), (2, 2)), lambda S: S.edit_entry(0, 1, 0)],
+         M.Matrix(3, 3, [[1, 2, 3], [4, 5, 0], [7, 8, 9]])),
+        (write_through, [lambda A: A.submatrix((0, 1), (3, 2)), lambda S: S.swap_cols_ip(0, 1)],
+         M.Matrix(3, 3, [[1, 3, 2], [4, 6, 5], [7, 9, 8]])),
+        (write_through, [lambda A: A.col(2), lambda c: c.__imul__(0)],
+         M.Matrix(3, 3, [[1, 2, 0], [4, 5, 0], [7, 8, 0]])),
+        (write_through, [lambda A: A.submatrix((1, 0), (2, 3)).row(0), lambda r: r.__isub__(V.Vector(3, [4, 5, 6]))],
+         M.Matrix(3, 3, [[1, 2, 3], [0, 0, 0], [7, 8, 9]])),
+        (set_elem, [mat[1].copy()], TypeError),
+
+        (set_row, [mat[1].copy(), 0, V.Vector(2, [5, 6])], M.Matrix(2, 2, [[5, 6], [3, 4]])),
+        (set_row, [mat[1].copy(), -1, V.Vector(2, [0.5, 0])], M.Matrix(2, 2, [[1, 2], [0.5, 0]])),
+        (set_row, [mat[1].copy(), 0, V.Vector(2, [Fraction(1, 3), 1])], M.Matrix(2, 2, [[Fraction(1, 3), 1], [3, 4]])),
+        (set_row, [mat[1].copy(), 2, V.Vector(2, [5, 6])], IndexError),
+        (set_row, [mat[1].copy(), 0, V.Vector(3, [5, 6, 7])], ValueError),
+        (set_row, [mat[1].copy(), 0, [5, 6]], TypeError),
+        (set_row_det, [mat[1].copy(), 0, V.Vector(2, [5, 6])], 2)
+    ]
+
+    run_func_tests(cases, names, v)
+
+
+def test_mul_kernels(v=False):
+    """
+    Tests matrix multiplication through the blocked and Strassen kernels.
+    """
+    print(f"Testing multiplication kernels:{' (verbose feedback)' if v else ''}")
+
+    lst = [[(i*7 + j*3) % 11 - 5 for j in range(9)] for i in range(9)]
+    mat = [
+        M.Matrix(9, 9, lst),    # 0
+        M.identity_matrix(9),
+        M.Matrix(3, 4, [[7, 2, 4, 6], [6, 3, 0, 1], [2, 5, 2, 6]]),
+        M.Matrix(4, 2, [[1, 0], [2, 1], [0, 3], [1, 1]]),
+
+        M.Matrix(9, 9, [[sum(lst[i][k]*lst[k][j] for k in range(9)) for j in range(9)] for i in range(9)]),    # 4
+        M.Matrix(3, 2, [[17, 20], [13, 4], [18, 17]])
+    ]
+
+    names = {
+        O.mul : "\n\tMultiplication (*), blocked and Strassen:"
+    }
+
+    cases = [   # (op, [inputs], expected)
+        (O.mul, [mat[0], mat[1]], mat[0]),
+        (O.mul, [mat[0], mat[0]], mat[4]),
+        (O.mul, [mat[2], mat[3]], mat[5]),
+        (O.mul, [mat[0], V.Vector(9, [1]*9)], V.Vector(9, [sum(row) for row in lst]))
+    ]
+
+    block_size, threshold = K.BLOCK_SIZE, K.STRASSEN_THRESHOLD
+    K.BLOCK_SIZE, K.STRASSEN_THRESHOLD = 2, 2
+    try:
+        run_func_tests(cases, names, v)
+    finally:
+        K.BLOCK_SIZE, K.STRASSEN_THRESHOLD = block_size, threshold
+
+
+def test_lu(v=False):
+    """
+    Tests LU factorization methods: .det(), .solve(), .solve_many(), and .inverse().
+    """
+    print(f"Testing LU factorization:{' (verbose feedback)' if v else ''}")
+
+    mat = [
+        M.Matrix(3, 3, [[2, 1, 1], [4, -6, 0], [-2, 7, 2]]),   # 0
+        M.Matrix(3, 3, [[1, 4, 5], [2, 8, 10], [6, 2, 1]]),
+        M.Matrix(2, 2, [[0, 2], [4, 0]]),
+        M.Matrix(2, 2, [[3, 7], [1, -4]])
+    ]
+
+    lu = [LU.lu(A) for A in mat]
+
+    names = {
+        LU.LUFactorization.det        : "\n\tDeterminant (det):",
+        LU.LUFactorization.solve      : "\n\tSolve for a vector (solve):",
+        LU.LUFactorization.solve_many : "\n\tSolve for a matrix (solve_many):",
+        LU.LUFactorization.inverse    : "\n\tInverse (inverse):"
+    }
+
+    cases = [   # (method, object, [inputs], expected)
+        (LU.LUFactorization.det, lu[0], [], -16),
+        (LU.LUFactorization.det, lu[1], [], 0),
+        (LU.LUFactorization.det, lu[2], [], -8),
+        (LU.LUFactorization.det, lu[3], [], -19),
+
+        (LU.LUFactorization.solve, lu[0], [V.Vector(3, [5, -2, 9])], V.Vector(3, [1, 1, 2])),
+        (LU.LUFactorization.solve, lu[2], [V.Vector(2, [4, 8])], V.Vector(2, [2, 2])),
+        (LU.LUFactorization.solve, lu[1], [V.Vector(3, [1, 2, 3])], ValueError),
+        (LU.LUFactorization.solve, lu[0], [V.Vector(2, [1, 2])], ValueError),
+
+        (LU.LUFactorization.solve_many, lu[0], [M.Matrix(3, 2, [[5, 2], [-2, 4], [9, -2]])], M.Matrix(3, 2, [[1, 1], [1, 0], [2, 0]])),
+        (LU.LUFactorization.solve_many, lu[2], [M.identity_matrix(2)], M.inverse(mat[2])),
+
+        (LU.LUFactorization.inverse, lu[2], [], M.Matrix(2, 2, [[0, 0.25], [0.5, 0]])),
+        (LU.LUFactorization.inverse, lu[1], [], ValueError)
+    ]
+
+    run_method_tests(cases, names, v)
+
+
+def test_numpy_backend(v=False):
+    """
+    Tests matrix operators and functions dispatched to the numpy backend.
+    """
+    print(f"Testing numpy backend:{' (verbose feedback)' if v else ''}")
+    if not B.HAS_NUMPY:
+        print("\tSkipped (NumPy is not installed)\n")
+        return
+
+    mat = [
+        B.to_backend(M.Matrix(3, 3, [[1, 2, 3], [4, 5, 6], [7, 2, 9]]), "numpy"),  # 0
+        B.to_backend(M.Matrix(3, 3, [[4, 5, 6], [7, 8, 9], [1, 2, 3]]), "numpy"),
+        B.to_backend(M.Matrix(2, 2, [[0, 2], [4, 0]]), "numpy"),
+        B.to_backend(M.Matrix(3, 3, [[1, 4, 5], [2, 8, 10], [6, 2, 1]]), "python")
+    ]
+
+    def triangular(A, b, lower, unit):
+        """
+        returns the backend of the triangular solve, and whether it agrees with the pure-Python one
+        """
+        x = M.solve_triangular(A, b, lower, unit)
+        expected = M.solve_triangular(B.to_backend(A, "python"), B.to_backend(b, "python"), lower, unit)
+        return [B.backend_of(x), M.allclose(x, expected, 0, 1e-9)]
+
+    def big(x):
+        """
+        returns the 1 by 1 matrix [[x]] on the numpy backend
+        """
+        return B.to_backend(M.Matrix(1, 1, [[x]]), "numpy")
+
+    names = {
+        O.add          : "\n\tAddition (+):",
+        O.sub          : "\n\tSubtraction (-):",
+        O.mul          : "\n\tMultiplication (*):",
+        V.Vector.times : "\n\tScalar multiplication (times):",
+        V.Vector.dot   : "\n\tDot product (dot):",
+        M.trans        : "\n\tTranspose (trans):",
+        M.Matrix.det   : "\n\tDeterminant (det):",
+        M.inverse      : "\n\tInverse (inverse):",
+        triangular     : "\n\tTriangular solve (solve_triangular):",
+        B.backend_of   : "\n\tBackend of results (backend_of):"
+    }
+
+    cases = [   # (function, [inputs], expected)
+        (O.add, [mat[0], mat[1]], M.Matrix(3, 3, [[5, 7, 9], [11, 13, 15], [8, 4, 12]])),
+        (O.add, [mat[0], M.identity_matrix(3)], M.Matrix(3, 3, [[2, 2, 3], [4, 6, 6], [7, 2, 10]])),
+        (O.add, [big(2**62), big(2**62)], M.Matrix(1, 1, [[2**63]])),
+        (O.sub, [big(-2**62), big(2**62)], M.Matrix(1, 1, [[-2**63]])),
+
+        (O.mul, [mat[0], mat[1]], M.Matrix(3, 3, [[21, 27, 33], [57, 72, 87], [51, 69, 87]])),
+        (O.mul, [mat[2], V.Vector(2, [1, 2])], V.Vector(2, [4, 4])),
+        (O.mul, [big(2**62), big(4)], M.Matrix(1, 1, [[2**64]])),
+        (V.Vector.times, [B.to_backend(V.Vector(2, [2**62, 1]), "numpy"), 4], V.Vector(2, [2**64, 4])),
+        (V.Vector.dot, [B.to_backend(V.Vector(2, [2**62, 1]), "numpy"), B.to_backend(V.Vector(2, [4, 1]), "numpy")], 2**64 + 1),
+
+        (M.trans, [mat[2]], M.Matrix(2, 2, [[0, 4], [2, 0]])),
+
+        (M.Matrix.det, [mat[0]], -36),
+        (M.Matrix.det, [B.to_backend(mat[3], "numpy")], 0),
+
+        (M.inverse, [mat[2]], M.Matrix(2, 2, [[0, 0.25], [0.5, 0]])),
+        (M.inverse, [B.to_backend(mat[3], "numpy")], ValueError),
+
+        (triangular, [mat[0], B.to_backend(V.Vector(3, [4, 5, 6]), "numpy"), False, False], ["numpy", True]),
+        (triangular, [mat[0], B.to_backend(V.Vector(3, [4, 5, 6]), "numpy"), True, False], ["numpy", True]),
+        (triangular, [mat[1], B.to_backend(M.Matrix(3, 2, [[1, 0], [0, 1], [2, 2]]), "numpy"), True, True], ["numpy", True]),
+        (triangular, [mat[1], B.to_backend(M.Matrix(3, 2, [[1, 0], [0, 1], [2, 2]]), "numpy"), False, False], ["numpy", True]),
+
+        (B.backend_of, [mat[0] * mat[1]], "numpy"),
+        (B.backend_of, [mat[3] * mat[3]], "python"),
+        (B.backend_of, [big(2**30) * big(4)], "numpy")
+    ]
+
+    run_func_tests(cases, names, v)
+
+
+def test_sparse(v=False):
+    """
+    Tests sparse matrices: products, transposes, conversion and sparse solves.
+    """
+    print(f"Testing sparse matrices:{' (verbose feedback)' if v else ''}")
+
+    dense = [
+        M.Matrix(3, 3, [[4, 0, 1], [0, 3, 0], [2, 0, 5]]),   # 0
+        M.Matrix(3, 2, [[1, 2], [0, 1], [3, 0]]),
+        M.Matrix(3, 3, [[1, 4, 5], [2, 8, 10], [6, 2, 1]])
+    ]
+    mat = [
+        S.from_dense(dense[0]),                                      # 0
+        S.COOMatrix(3, 2, [0, 0, 1, 2, 2], [0, 1, 1, 0, 0], [1, 2, 1, 1, 2]),
+        S.from_dense(dense[0], "csc"),
+        S.from_dense(dense[2])
+    ]
+
+    names = {
+        O.mul        : "\n\tMultiplication (*):",
+        M.trans      : "\n\tTranspose (trans):",
+        O.eq         : "\n\tConversion (to_dense, from_dense, tocsr):",
+        O.ne         : "\n\tInequality with dense matrices (!=):",
+        O.add        : "\n\tAddition with dense matrices (+):",
+        O.sub        : "\n\tSubtraction with dense matrices (-):",
+        S.spsolve    : "\n\tSparse solve (spsolve):",
+        S.SparseLU.det : "\n\tSparse determinant (det):"
+    }
+
+    cases = [   # (function, [inputs], expected)
+        (O.mul, [mat[0], V.Vector(3, [1, 1, 1])], V.Vector(3, [5, 3, 7])),
+        (O.mul, [mat[2], V.Vector(3, [1, 1, 1])], V.Vector(3, [5, 3, 7])),
+        (O.mul, [mat[0], dense[1]], dense[0] * dense[1]),
+        (O.mul, [dense[0], mat[1]], dense[0] * dense[1]),
+        (O.mul, [mat[0], mat[1]], S.from_dense(dense[0] * dense[1])),
+        (O.mul, [mat[0], V.Vector(2, [1, 1])], ValueError),
+
+        (M.trans, [mat[1]], S.from_dense(M.trans(dense[1]))),
+        (M.trans, [mat[0]], M.trans(dense[0])),
+
+        (O.eq, [mat[1].to_dense(), dense[1]], True),
+        (O.eq, [mat[2].tocsr(), mat[0]], True),
+        (O.eq, [S.identity(3), M.identity_matrix(3)], True),
+        (O.eq, [M.identity_matrix(3), S.identity(3)], True),
+        (O.ne, [M.identity_matrix(3), S.identity(3)], False),
+        (O.add, [mat[0], dense[2]], dense[0] + dense[2]),
+        (O.add, [dense[2], mat[0]], dense[0] + dense[2]),
+        (O.sub, [dense[2], mat[0]], dense[2] - dense[0]),
+        (O.sub, [mat[0], dense[2]], dense[0] - dense[2]),
+        (O.add, [dense[1], mat[0]], ValueError),
+
+        (S.spsolve, [mat[0], V.Vector(3, [9, 6, 27])], V.Vector(3, [1, 2, 5])),
+        (S.spsolve, [mat[3], V.Vector(3, [1, 2, 3])], ValueError),
+
+        (S.SparseLU.det, [S.lu(mat[0])], dense[0].det()),
+        (S.SparseLU.det, [S.lu(mat[3])], 0)
+    ]
+
+    run_func_tests(cases, names, v)
+
+
+def test_batch(v=False):
+    """
+    Tests batched matrix methods: *, .matvec(), .det(), and .inverse().
+    """
+    print(f"Testing matrix batches:{' (verbose feedback)' if v else ''}")
+
+    mat = [
+        M.Matrix(2, 2, [[0, 2], [4, 0]]),     # 0
+        M.Matrix(2, 2, [[3, 7], [1, -4]]),
+        M.Matrix(3, 3, [[2, 1, 1], [4, -6, 0], [-2, 7, 2]]),
+        M.Matrix(3, 3, [[1, 4, 5], [2, 8, 10], [6, 2, 1]]),
+        M.Matrix(4, 4, [[2, 0, 0, 0], [0, 1, 0, 0], [0, 0, 4, 0], [1, 0, 0, 1]])
+    ]
+    batch = [
+        Batch.MatrixBatch(2, 2, [mat[0], mat[1]]),    # 0
+        Batch.MatrixBatch(3, 3, [mat[2], mat[3]]),
+        Batch.MatrixBatch(4, 4, [mat[4], M.identity_matrix(4)])
+    ]
+
+    names = {
+        O.mul                         : "\n\tMultiplication (*):",
+        Batch.MatrixBatch.matvec      : "\n\tMatrix-vector products (matvec):",
+        Batch.MatrixBatch.det         : "\n\tDeterminants (det):",
+        Batch.MatrixBatch.inverse     : "\n\tInverses (inverse):"
+    }
+
+    cases = [   # (function, [inputs], expected)
+        (O.mul, [batch[0], batch[0]], Batch.MatrixBatch(2, 2, [mat[0]*mat[0], mat[1]*mat[1]])),
+        (O.mul, [batch[1], mat[2]], Batch.MatrixBatch(3, 3, [mat[2]*mat[2], mat[3]*mat[2]])),
+        (O.mul, [batch[0], batch[1]], ValueError),
+
+        (Batch.MatrixBatch.matvec, [batch[0], V.Vector(2, [1, 1])], [V.Vector(2, [2, 4]), V.Vector(2, [10, -3])]),
+        (Batch.MatrixBatch.matvec, [batch[0], [V.Vector(2, [1, 0]), V.Vector(2, [0, 1])]], [V.Vector(2, [0, 4]), V.Vector(2, [7, -4])]),
+
+        (Batch.MatrixBatch.det, [batch[0]], [-8, -19]),
+        (Batch.MatrixBatch.det, [batch[1]], [-16, 0]),
+        (Batch.MatrixBatch.det, [batch[2]], [8, 1]),
+
+        (Batch.MatrixBatch.inverse, [Batch.MatrixBatch(2, 2, [mat[0], [[2, 1], [1, 1]]])], Batch.MatrixBatch(2, 2, [M.inverse(mat[0]), [[1, -1], [-1, 2]]])),
+        (Batch.MatrixBatch.inverse, [batch[2]], Batch.MatrixBatch(4, 4, [M.inverse(mat[4]), M.identity_matrix(4)])),
+        (Batch.MatrixBatch.inverse, [batch[1]], ValueError)
+    ]
+
+    run_func_tests(cases, names, v)
+
+
+def test_lazy(v=False):
+    """
+    Tests evaluation of lazy matrix expressions.
+    """
+    print(f"Testing lazy expressions:{' (verbose feedback)' if v else ''}")
+
+    mat = [
+        M.Matrix(3, 1, [[1], [2], [3]]),                        # 0
+        M.Matrix(1, 3, [[4, 5, 6]]),
+        M.Matrix(3, 3, [[1, 2, 3], [4, 5, 6], [7, 2, 9]]),
+        M.Matrix(3, 3, [[4, 5, 6], [7, 8, 9], [1, 2, 3]])
+    ]
+    lz = [Lazy.lazy(A) for A in mat]
+    vec = V.Vector(3, [1, 0, -1])
+
+    def chain_flops(E):
+        return E.order()[0]
+
+    names = {
+        Lazy.evaluate : "\n\tEvaluation (evaluate):",
+        chain_flops   : "\n\tCheapest chain order (order):",
+        O.add         : "\n\tBuilding mismatched expressions:"
+    }
+
+    cases = [   # (function, [inputs], expected)
+        (Lazy.evaluate, [lz[0]*mat[1]*mat[2]], mat[0]*mat[1]*mat[2]),
+        (Lazy.evaluate, [lz[0]*mat[1]*mat[2] + mat[3] - mat[2]], mat[0]*mat[1]*mat[2] + mat[3] - mat[2]),
+        (Lazy.evaluate, [2*lz[2] - lz[3]*3], mat[2] + mat[2] - mat[3] - mat[3] - mat[3]),
+        (Lazy.evaluate, [mat[3] - lz[2]], mat[3] - mat[2]),
+        (Lazy.evaluate, [(lz[2] + mat[3])*vec], (mat[2] + mat[3])*vec),
+        (Lazy.evaluate, [lz[2]*mat[3]*vec], mat[2]*(mat[3]*vec)),
+        (Lazy.evaluate, [mat[2]], mat[2]),
+
+        (chain_flops, [lz[0]*mat[1]*mat[0]], 6),
+        (chain_flops, [lz[1]*mat[0]*mat[1]], 6),
+        (O.add, [lz[0], mat[2]], ValueError)
+    ]
+
+    run_func_tests(cases, names, v)
+
+
+def test_in_place(v=False):
+    """
+    Tests in-place operators, axpy and out= destinations.
+    """
+    print(f"Testing in-place operations:{' (verbose feedback)' if v else ''}")
+
+    mat = [
+        M.Matrix(2, 2, [[1, 2], [3, 4]]),                       # 0
+        M.Matrix(2, 2, [[0.5, 0], [0, 0.5]]),
+        M.Matrix(3, 3, [[1, 2, 3], [4, 5, 6], [7, 2, 9]]),
+        M.Matrix(2, 3, [[1, 2, 3], [4, 5, 6]])
+    ]
+    vec = [
+        V.Vector(2, [1, -1]),                                   # 0
+        V.Vector(3, [1, 0, -1]),
+        V.Vector(3, [0.5, 1, 1.5])
+    ]
+
+    def row_iadd(A, i, v):
+        r = A.row(i)
+        r += v
+        return A
+
+    def view_scale(A, i, factors, col=False):
+        """
+        returns A after scaling its row (or column) i in place by each of factors in turn
+        """
+        r = A.col(i) if col else A.row(i)
+        for k in factors:
+            r *= k
+        return A
+
+    def stale_iadd(A, i, v):
+        """
+        returns A after widening it through edit_entry, then adding v to a row view taken before
+        """
+        r = A.row(i)
+        A.edit_entry(i, 0, 0.5)
+        r += v
+        return A
+
+    def sub_isub(A, pos, size, B):
+        S = A.submatrix(pos, size)
+        S -= B
+        return A
+
+    def into(f, *args):
+        out = args[-1]
+        f(*args[:-1], out=out)
+        return out
+
+    names = {
+        O.iadd     : "\n\tIn-place addition (+=):",
+        O.isub     : "\n\tIn-place subtraction (-=):",
+        O.imul     : "\n\tIn-place multiplication (*=):",
+        V.axpy     : "\n\tIn-place axpy (y += a*x):",
+        row_iadd   : "\n\tWriting through row views:",
+        view_scale : "\n\tWidening through row and column views:",
+        stale_iadd : "\n\tWriting through views after the matrix widens:",
+        sub_isub   : "\n\tWriting through submatrix views:",
+        into       : "\n\tWriting results into out:"
+    }
+
+    cases = [   # (function, [inputs], expected)
+        (O.iadd, [mat[0].copy(), mat[0]], M.Matrix(2, 2, [[2, 4], [6, 8]])),
+        (O.iadd, [mat[0].copy(), mat[1]], mat[0] + mat[1]),
+        (O.iadd, [vec[1].copy(), vec[2]], vec[1] + vec[2]),
+        (O.iadd, [mat[0].copy(), mat[2]], ValueError),
+        (O.isub, [mat[2].copy(), mat[2]], M.Matrix(3, 3)),
+        (O.isub, [vec[2].copy(), vec[1]], vec[2] - vec[1]),
+        (O.imul, [mat[0].copy(), 2], mat[0] + mat[0]),
+        (O.imul, [mat[0].copy(), mat[0]], mat[0]*mat[0]),
+        (O.imul, [mat[3].copy(), mat[3]], ValueError),
+        (O.imul, [vec[1].copy(), 0.5], vec[1].times(0.5)),
+
+        (V.axpy, [2, vec[1], vec[2].copy()], V.Vector(3, [2.5, 1, -0.5])),
+        (V.axpy, [2, vec[0], vec[1].copy()], ValueError),
+
+        (row_iadd, [mat[2].copy(), 1, vec[1]], M.Matrix(3, 3, [[1, 2, 3], [5, 5, 5], [7, 2, 9]])),
+        (view_scale, [mat[0].copy(), 1, [2]], M.Matrix(2, 2, [[1, 2], [6, 8]])),
+        (view_scale, [mat[0].copy(), 1, [2.5]], M.Matrix(2, 2, [[1, 2], [7.5, 10]])),
+        (view_scale, [mat[0].copy(), 0, [2.5, 2], True], M.Matrix(2, 2, [[5, 2], [15, 4]])),
+        (view_scale, [B.to_backend(mat[0], "python").copy(), 0, [2**62]], TypeError),
+        (stale_iadd, [B.to_backend(mat[0], "python").copy(), 0, V.Vector(2, [1, 1])], M.Matrix(2, 2, [[1.5, 3], [3, 4]])),
+        (sub_isub, [mat[2].copy(), (1, 1), (2, 2), M.identity_matrix(2)], M.Matrix(3, 3, [[1, 2, 3], [4, 4, 6], [7, 2, 8]])),
+
+        (into, [M.add, mat[0], mat[1], M.Matrix(2, 2)], mat[0] + mat[1]),
+        (into, [M.sub, mat[0], mat[1], M.Matrix(2, 2)], mat[0] - mat[1]),
+        (into, [M.mul, mat[2], mat[2], M.Matrix(3, 3)], mat[2]*mat[2]),
+        (into, [M.mul, mat[3], vec[1], V.Vector(2)], mat[3]*vec[1]),
+        (into, [M.trans, mat[3], M.Matrix(3, 2)], M.trans(mat[3])),
+        (into, [V.add, vec[1], vec[2], V.Vector(3)], vec[1] + vec[2]),
+        (into, [vec[2].times, 2, V.Vector(3)], vec[2].times(2)),
+        (into, [M.mul, mat[2], mat[2], M.Matrix(2, 2)], ValueError),
+        (into, [M.trans, mat[3], mat[3]], ValueError)
+    ]
+
+    run_func_tests(cases, names, v)
+
+
+def test_exact(v=False):
+    """
+    Tests exact (fraction-free) elimination.
+    """
+    print(f"Testing exact elimination:{' (verbose feedback)' if v else ''}")
+
+    mat = [
+        B.to_backend(M.Matrix(2, 2, [[10**10 + 1, 10**10], [10**10, 10**10 - 1]]), "python"),  # 0
+        M.Matrix(3, 3, [[2, -1, 0], [-1, 2, -1], [0, -1, 2]]),
+        M.Matrix(3, 4, [[1, 3, 1, 9], [1, 1, -1, 1], [3, 11, 5, 35]]),
+        M.Matrix(2, 2, [[1, 2], [3, 4]]),
+        M.Matrix(2, 2, [[0.5, 1], [Fraction(1, 3), 2]]),
+        M.Matrix(3, 3, [[1, 4, 5], [2, 8, 10], [6, 2, 1]])
+    ]
+
+    def exact_det(A):
+        return A.det(exact=True)
+
+    def exact_ref(A):
+        return M.ref(A, True, exact=True)
+
+    def exact_rref(A):
+        return M.rref(A, exact=True)[0]
+
+    def exact_inverse(A):
+        return M.inverse(A, exact=True)
+
+    def elim_check(A):
+        U, E = M.rref(A, True, exact=True)
+        return E*A == U
+
+    def det_check(A, exact):
+        """
+        returns whether det(A) = (product of the diagonal of U) / d, with U and d from ref
+        """
+        U, _, d = M.ref(A, exact=exact)
+        return Utils.isclose(math.prod(U.at(i, i) for i in range(U.m)) / d, A.det(exact))
+
+    names = {
+        M.Matrix.det  : "\n\tDeterminant (default for integers):",
+        exact_det     : "\n\tDeterminant (exact=True):",
+        exact_ref     : "\n\tFraction-free row echelon form:",
+        exact_rref    : "\n\tExact reduced row echelon form:",
+        elim_check    : "\n\tExact elimination matrix (E*A = U):",
+        det_check     : "\n\tDeterminant from the echelon form (float and exact):",
+        exact_inverse : "\n\tExact inverse:"
+    }
+
+    cases = [   # (function, [inputs], expected)
+        (M.Matrix.det, [mat[0]], -1),
+        (M.Matrix.det, [mat[1]], 4),
+        (M.Matrix.det, [mat[5]], 0),
+        (exact_det, [mat[4]], Fraction(2, 3)),
+
+        (exact_ref, [mat[1]], (M.Matrix(3, 3, [[2, -1, 0], [0, 3, -2], [0, 0, 4]]),
+                               M.Matrix(3, 3, [[1, 0, 0], [1, 2, 0], [1, 2, 3]]),
+                               6)),
+        (exact_rref, [mat[2]], M.Matrix(3, 4, [[1, 0, -2, -3], [0, 1, 1, 4], [0, 0, 0, 0]])),
+        (exact_rref, [mat[3]], M.identity_matrix(2)),
+        (elim_check, [mat[2]], True),
+        (det_check, [mat[1], False], True),
+        (det_check, [mat[1], True], True),
+        (det_check, [mat[3], False], True),
+        (det_check, [mat[3], True], True),
+        (det_check, [M.Matrix(2, 2, [[2, 1], [1, 3]]), True], True),
+
+        (exact_inverse, [mat[3]], M.Matrix(2, 2, [[-2, 1], [Fraction(3, 2), Fraction(-1, 2)]])),
+        (exact_inverse, [mat[1]], M.Matrix(3, 3, [[Fraction(3, 4), Fraction(1, 2), Fraction(1, 4)],
+                                                  [Fraction(1, 2), 1, Fraction(1, 2)],
+                                                  [Fraction(1, 4), Fraction(1, 2), Fraction(3, 4)]])),
+        (exact_inverse, [mat[4]], M.Matrix(2, 2, [[3, Fraction(-3, 2)], [Fraction(-1, 2), Fraction(3, 4)]])),
+        (exact_inverse, [mat[5]], ValueError)
+    ]
+
+    run_func_tests(cases, names, v)
+
+
+def test_iterative(v=False):
+    """
+    Tests the iterative solvers.
+    """
+    print(f"Testing iterative solvers:{' (verbose feedback)' if v else ''}")
+
+    spd = M.Matrix(4, 4, [[4, -1, 0, 1], [-1, 4, -1, 0], [0, -1, 4, -1], [1, 0, -1, 3]])
+    nonsym = M.Matrix(3, 3, [[4, 1, 2], [0, 3, 1], [1, -1, 5]])
+    b4 = V.Vector(4, [1, 2, 0, -1])
+    b3 = V.Vector(3, [1, 2, 3])
+    x4 = LU.lu(spd).solve(b4)
+    x3 = LU.lu(nonsym).solve(b3)
+
+    def solves(f, A, b, x, **kwargs):
+        y, converged, _ = f(A, b, **kwargs)
+        return converged and all(abs(p - q) < 1e-6 for p, q in zip(y.elems, x.elems))
+
+    def iterations(f, *args):
+        return f(*args)[2]
+
+    names = {
+        solves     : "\n\tSolving A*x = b:",
+        iterations : "\n\tIteration counts and warm starts:",
+        I.cg       : "\n\tBad arguments:"
+    }
+
+    cases = [   # (function, [inputs], expected)
+        (solves, [I.cg, spd, b4, x4], True),
+        (solves, [I.cg, S.from_dense(spd), b4, x4], True),
+        (solves, [I.cg, I.LinearOperator(4, 4, lambda x: spd*x), b4, x4], True),
+        (solves, [I.gmres, nonsym, b3, x3], True),
+        (solves, [I.jacobi, nonsym, b3, x3], True),
+        (solves, [I.gauss_seidel, spd, b4, x4], True),
+        (solves, [I.gauss_seidel, S.from_dense(nonsym), b3, x3], True),
+
+        (iterations, [I.cg, spd, b4], 3),
+        (iterations, [I.gmres, nonsym, b3], 3),
+        (iterations, [I.gmres, nonsym, b3, None, 1e-8, 20, None, "ilu0"], 1),
+        (iterations, [I.cg, spd, b4, x4], 0),
+
+        (I.cg, [nonsym, b4], ValueError),
+        (I.cg, [spd, b4, None, 1e-8, None, "cholesky"], ValueError)
+    ]
+
+    run_func_tests(cases, names, v)
+
+
+def test_parallel(v=False):
+    """
+    Tests operations split across worker processes, against their serial results.
+    """
+    print(f"Testing parallel execution:{' (verbose feedback)' if v else ''}")
+
+    mat = [
+        M.Matrix(4, 3, [[1, 2, 3], [4, 5, 6], [7, 8, 9], [10, 11, 12]]),      # 0
+        M.Matrix(3, 4, [[0.5, 1, 0, 2], [1, -1, 3, 0.25], [2, 0, 1, 1]]),
+        M.Matrix(4, 4, [[2, 3, 3, 8], [10, 2, 4, 5], [1, 2, 0, 2], [4, 3, 7, 20]]),
+        M.Matrix(4, 4, [[0, 2, 1, 1], [0, 1, 0, 3], [5, 1, 1, 1], [2, 0, 4, 1]]),
+        M.Matrix(4, 4, [[2**40, 1, 0, 0], [0, 2**40, 0, 0], [0, 0, 1, 0], [1, 0, 0, 2**40]])
+    ]
+    serial = {
+        "mul"  : [mat[0]*mat[1], mat[1]*mat[0], mat[4]*mat[4]],
+        "trans": [M.trans(mat[0]), M.trans(mat[1])],
+        "ref"  : [M.ref(mat[2]), M.ref(mat[3])],
+        "rref" : [M.rref(mat[2])[0], M.rref(mat[3])[0], M.rref(mat[1])[0]]
+    }
+
+    def in_parallel(f, *args):
+        workers, threshold = P.WORKERS, P.THRESHOLD
+        P.WORKERS, P.THRESHOLD = 2, 2
+        try:
+            return f(*args)
+        finally:
+            P.WORKERS, P.THRESHOLD = workers, threshold
+
+    def rref_U(A):
+        return M.rref(A)[0]
+
+    names = {
+        in_parallel : "\n\tMultiplication, transposition and elimination:"
+    }
+
+    cases = [   # (function, [inputs], expected)
+        (in_parallel, [O.mul, mat[0], mat[1]], serial["mul"][0]),
+        (in_parallel, [O.mul, mat[1], mat[0]], serial["mul"][1]),
+        (in_parallel, [O.mul, mat[4], mat[4]], serial["mul"][2]),
+        (in_parallel, [M.trans, mat[0]], serial["trans"][0]),
+        (in_parallel, [M.trans, mat[1]], serial["trans"][1]),
+        (in_parallel, [M.ref, mat[2]], serial["ref"][0]),
+        (in_parallel, [M.ref, mat[3]], serial["ref"][1]),
+        (in_parallel, [rref_U, mat[2]], serial["rref"][0]),
+        (in_parallel, [rref_U, mat[3]], serial["rref"][1]),
+        (in_parallel, [rref_U, mat[1]], serial["rref"][2])
+    ]
+
+    run_func_tests(cases, names, v)
+    P.shutdown()
+
+
+def test_io(v=False):
+    """
+    Tests saving and loading matrices, and memory-mapped loading.
+    """
+    print(f"Testing saving and loading:{' (verbose feedback)' if v else ''}")
+
+    mat = [
+        M.Matrix(2, 3, [[1, 2, 3], [4, 5, 6]]),                                 # 0
+        M.augment(M.Matrix(2, 2, [[0.5, 1], [2, -3]]), V.Vector(2, [1, 2])),
+        M.Matrix(1, 2, [[Fraction(1, 3), 1]])
+    ]
+    vec = V.Vector(3, [1.5, 0, -2])
+    path = os.path.join(tempfile.mkdtemp(), "matrix.npy")
+
+    def round_trip(A, mmap_mode=None):
+        IO.save(path, A)
+        B = IO.load(path, mmap_mode)
+        return B == A and getattr(B, "aug", 0) == getattr(A, "aug", 0)
+
+    def write_through(A, i, j, k):
+        IO.save(path, A)
+        B = IO.load(path, "r+")
+        B.edit_entry(i, j, k)
+        del B
+        return IO.load(path).at(i, j)
+
+    def mapped(A, mutate):
+        """
+        returns A as saved after mutate is applied to it through a memory map (r+)
+        """
+        IO.save(path, A)
+        B = IO.load(path, "r+")
+        mutate(B)
+        del B
+        return IO.load(path)
+
+    def copy_on_write(A, i, j, k):
+        IO.save(path, A)
+        B = IO.load(path, "c")
+        B.edit_entry(i, j, k)
+        return (B.at(i, j), IO.load(path).at(i, j))
+
+    def read_only(A):
+        IO.save(path, A)
+        IO.load(path, "r").edit_entry(0, 0, 0)
+
+    names = {
+        round_trip    : "\n\tSaving and loading:",
+        write_through : "\n\tWriting through a memory map (r+):",
+        mapped        : "\n\tWriting and widening a memory-mapped matrix:",
+        copy_on_write : "\n\tCopy-on-write memory maps (c):",
+        read_only     : "\n\tRead-only memory maps (r):",
+        IO.save       : "\n\tSaving unsupported entries:"
+    }
+
+    cases = [   # (function, [inputs], expected)
+        (round_trip, [mat[0]], True),
+        (round_trip, [mat[1]], True),
+        (round_trip, [vec], True),
+        (round_trip, [mat[0], "r"], True),
+        (round_trip, [mat[1], "r"], True),
+        (round_trip, [mat[0].submatrix((0, 1), (2, 2))], True),
+
+        (write_through, [mat[0], 1, 2, 9], 9),
+        (mapped, [mat[0], lambda B: B.row(1).__imul__(2)], M.Matrix(2, 3, [[1, 2, 3], [8, 10, 12]])),
+        (mapped, [mat[0], lambda B: B.row_scale(0, 2)], M.Matrix(2, 3, [[2, 4, 6], [4, 5, 6]])),
+        (mapped, [mat[0], lambda B: B.row_scale(0, 0.5)], TypeError),
+        (mapped, [mat[0], lambda B: B.edit_entry(0, 0, 2**70)], TypeError),
+        (mapped, [mat[0], lambda B: B.row(1).__imul__(0.5)], TypeError),
+        (copy_on_write, [mat[0], 1, 2, 9], (9, 6)),
+        (read_only, [mat[0]], TypeError),
+        (IO.save, [path, mat[2]], TypeError)
+    ]
+
+    run_func_tests(cases, names, v)
+
+
+def test_out_of_core(v=False):
+    """
+    Tests tiled products and LU factorization streamed from disk.
+    """
+    print(f"Testing out-of-core operations:{' (verbose feedback)' if v else ''}")
+
+    mat = [
+        M.Matrix(5, 5, [[2, 3, 3, 8, 1], [10, 2, 4, 5, 0], [1, 2, 0, 2, 7], [4, 3, 7, 20, 1], [0, 1, 1, 0, 2]]),  # 0
+        M.Matrix(5, 3, [[1, 0, 2], [0, 1, 0], [3, 0, 1], [1, 1, 1], [0, 2, 0]]),
+        M.Matrix(4, 4, [[0, 2, 1, 1], [0, 1, 0, 3], [0, 1, 1, 1], [0, 0, 4, 1]]),
+        M.Matrix(4, 4, [[0.5, 2, 1, 1], [0, 1, 0, 3], [5, 1, 1, 1], [2, 0, 4, 1]])
+    ]
+    vec = V.Vector(4, [1, 2, 3, 4])
+    folder = tempfile.mkdtemp()
+
+    def tiled(A, name, tile):
+        return OC.TiledMatrix.from_matrix(os.path.join(folder, name), A, tile)
+
+    def tiled_mul(A, B, tile):
+        with tiled(A, "a.npy", tile) as TA, tiled(B, "b.npy", tile) as TB:
+            with OC.matmul(TA, TB, os.path.join(folder, "c.npy")) as C:
+                return C.to_matrix()
+
+    def tiled_det(A, tile):
+        with tiled(A, "a.npy", tile) as TA:
+            with OC.lu(TA, os.path.join(folder, "lu.npy")) as F:
+                return F.det()
+
+    def tiled_solve(A, b, tile):
+        with tiled(A, "a.npy", tile) as TA:
+            with OC.lu(TA, os.path.join(folder, "lu.npy")) as F:
+                x = F.solve(b)
+            return all(abs(p - q) < 1e-9 for p, q in zip(x.elems, LU.lu(A).solve(b).elems))
+
+    names = {
+        tiled_mul   : "\n\tTiled multiplication:",
+        tiled_det   : "\n\tTiled LU determinant:",
+        tiled_solve : "\n\tTiled LU solve:"
+    }
+
+    cases = [   # (function, [inputs], expected)
+        (tiled_mul, [mat[0], mat[1], 2], mat[0]*mat[1]),
+        (tiled_mul, [mat[0], mat[1], 3], mat[0]*mat[1]),
+        (tiled_mul, [mat[0], mat[0], 8], mat[0]*mat[0]),
+        (tiled_mul, [mat[1], mat[0], 2], ValueError),
+
+        (tiled_det, [mat[0], 2], mat[0].det()),
+        (tiled_det, [mat[0], 5], mat[0].det()),
+        (tiled_det, [mat[2], 2], 0),
+        (tiled_det, [mat[3], 3], mat[3].det()),
+
+        (tiled_solve, [mat[3], vec, 2], True),
+        (tiled_solve, [mat[3], vec, 3], True),
+        (tiled_solve, [mat[2], vec, 2], ValueError)
+    ]
+
+    run_func_tests(cases, names, v)
+
+
+def test_streaming(v=False):
+    """
+    Tests building matrices from row iterators, CSV/TSV text and binary row streams.
+    """
+    print(f"Testing streaming row ingestion:{' (verbose feedback)' if v else ''}")
+
+    mat = [
+        M.Matrix(3, 2, [[1, 2], [3, 4], [5, 6]]),   # 0
+        M.Matrix(3, 2, [[1, 2], [3, 4.5], [5, 6]]),
+        M.Matrix(1, 2, [[2**70, 1]])
+    ]
+
+    def from_rows(rows, m=None):
+        return M.Matrix.from_rows(iter(rows), m=m)
+
+    def from_csv(text, delimiter=",", skip=0, m=None):
+        return IO.read_csv(io.StringIO(text), delimiter, skip, m)
+
+    def from_tsv(text):
+        return IO.read_tsv(io.StringIO(text))
+
+    def csv_chunks(text, chunk):
+        return [C.m for C in IO.iter_csv(io.StringIO(text), chunk)]
+
+    def from_binary(values, n, tc, m=None, size=None):
+        old, IO.READ_SIZE = IO.READ_SIZE, size or IO.READ_SIZE
+        try:
+            return IO.read_rows(io.BytesIO(array(tc, values).tobytes()), n, tc, m)
+        finally:
+            IO.READ_SIZE = old
+
+    names = {
+        from_rows   : "\n\tFrom a row iterator:",
+        from_csv    : "\n\tRead CSV:",
+        from_tsv    : "\n\tRead TSV:",
+        csv_chunks  : "\n\tCSV chunk sizes:",
+        from_binary : "\n\tRead binary row stream:"
+    }
+
+    cases = [   # (function, [inputs], expected)
+        (from_rows, [[[1, 2], [3, 4], [5, 6]]], mat[0]),
+        (from_rows, [[[1, 2], V.Vector(2, [3, 4]), (x for x in (5, 6))], 3], mat[0]),
+        (from_rows, [[[1, 2], [3, 4.5], [5, 6]]], mat[1]),
+        (from_rows, [[[1, 2], [3, 4.5], [5, 6]], 3], mat[1]),
+        (from_rows, [[[2**70, 1]], 1], mat[2]),
+        (from_rows, [[[1, 2], [3]]], ValueError),
+        (from_rows, [[[1, 2], [3, 4]], 3], ValueError),
+        (from_rows, [[[1, 2]] * 4, 3], ValueError),
+
+        (from_csv, ["1,2\n3,4\n5,6\n"], mat[0]),
+        (from_csv, ["x,y\n1,2\n\n3,4.5\n5,6", ",", 1], mat[1]),
+        (from_csv, ["1;2\n3;4\n5;6\n", ";", 0, 3], mat[0]),
+        (from_csv, ["1,2\n3,a\n"], ValueError),
+        (from_tsv, ["1\t2\n3\t4.5\n5\t6\n"], mat[1]),
+
+        (csv_chunks, ["1,2\n3,4\n5,6\n", 2], [2, 1]),
+        (csv_chunks, ["1,2\n3,4\n5,6\n", 3], [3]),
+        (csv_chunks, ["", 3], []),
+
+        (from_binary, [[1, 2, 3, 4, 5, 6], 2, "q"], mat[0]),
+        (from_binary, [[1, 2, 3, 4.5, 5, 6], 2, "d", None, 1], mat[1]),
+        (from_binary, [[1, 2, 3, 4.5, 5, 6], 2, "d", None, 12], mat[1]),
+        (from_binary, [[1, 2, 3, 4, 5, 6, 7, 8], 2, "q", 3, 20], mat[0]),
+        (from_binary, [[1, 2, 3, 4, 5, 6, 7, 8], 2, "q", 3], mat[0]),
+        (from_binary, [[1, 2, 3, 4, 5], 2, "q"], ValueError),
+        (from_binary, [[1, 2, 3, 4], 2, "q", 3], ValueError),
+        (from_binary, [[1, 2], 2, "i"], ValueError)
+    ]
+
+    run_func_tests(cases, names, v)
+
+
+def test_bench(v=False):
+    """
+    Tests the benchmark runner and its comparison against a baseline.
+    """
+    print(f"Testing benchmarks:{' (verbose feedback)' if v else ''}")
+
+    def result(**times):
+        return {"results": {key.replace("_", " "): {"time": t} for key, t in times.items()}}
+
+    def bench_keys(names, sizes):
+        return sorted(Bench.run(names, sizes, repeat=2, min_time=0.001)["results"])
+
+    def bench_fields(name):
+        r = Bench.run([name], [4], repeat=2, min_time=0.001)["results"][f"{name} 4x4"]
+        return r["time"] <= r["median"] and r["throughput"] > 0 and r["peak"] >= 0
+
+    def regressions(current, baseline, threshold):
+        return [key for key, *_ in Bench.compare(current, baseline, threshold)]
+
+    names = {
+        bench_keys   : "\n\tBenchmarks run:",
+        bench_fields : "\n\tReported measures:",
+        regressions  : "\n\tRegressions against a baseline:"
+    }
+
+    cases = [   # (function, [inputs], expected)
+        (bench_keys, [["copy", "det"], [2, 3]], ["copy 2x2", "copy 2x4", "copy 3x3", "copy 3x6", "det 2x2", "det 3x3"]),
+        (bench_keys, [["nothing"], [2]], ValueError),
+        (bench_fields, ["mul"], True),
+        (bench_fields, ["submatrix"], True),
+
+        (regressions, [result(a=1.0, b=2.0), result(a=1.0, b=2.0), 0.1], []),
+        (regressions, [result(a=1.05, b=2.5), result(a=1.0, b=2.0), 0.1], ["b"]),
+        (regressions, [result(a=1.5, c=9.0), result(a=1.0, b=2.0), 0.1], ["a"]),
+        (regressions, [result(a=1.5), result(a=1.0), 0.6], [])
+    ]
+
+    run_func_tests(cases, names, v)
+
+
+def test_profile(v=False):
+    """
+    Tests the operation counters collected by a profile.
+    """
+    print(f"Testing profiling:{' (verbose feedback)' if v else ''}")
+
+    mat = [   # counted on the pure-python paths, whatever the default backend
+        B.to_backend(M.Matrix(3, 3, [[2, 1, 1], [1, 3, 2], [1, 0, 0.5]]), "python"),   # 0
+        B.to_backend(M.Matrix(2, 3, [[1, 2, 3], [4, 5, 6]]), "python")
+    ]
+    vec = B.to_backend(V.Vector(3, [1, 2, 3]), "python")
+
+    def counts(call, name):
+        with Profile.profile() as p:
+            call()
+        s = p[name]
+        return [s.calls, s.flops, s.copies, s.allocations]
+
+    def total_flops(call):
+        with Profile.profile() as p:
+            call()
+        return p.totals.flops
+
+    def restored():
+        originals = (M.trans, M.Matrix.__mul__, M.Matrix.__dict__["_wrap"], K.matmul)
+        with Profile.profile():
+            wrapped = (M.trans, M.Matrix.__mul__, M.Matrix.__dict__["_wrap"], K.matmul)
+        now = (M.trans, M.Matrix.__mul__, M.Matrix.__dict__["_wrap"], K.matmul)
+        return all(a is c and a is not b for a, b, c in zip(originals, wrapped, now))
+
+    def hook_events():
+        events = []
+        with Profile.profile([lambda event, name, elapsed: events.append((event, name))]):
+            M.identity_matrix(2)
+        return events
+
+    def nested():
+        with Profile.profile() as outer:
+            mat[1] * mat[0]
+            with Profile.profile() as inner:
+                M.trans(mat[1])
+        return [outer.totals.calls, inner.totals.calls, inner["Matrix.__mul__"].calls]
+
+    def threaded(threads, calls):
+        """
+        returns the calls and flops of inverses run by threads at once,
+        each running calls of them, compared to the same inverses run serially
+        """
+        mats = [B.to_backend(mat[0], "python").copy() for _ in range(threads * calls)]
+        with Profile.profile() as serial:
+            for A in mats:
+                M.inverse(A.copy())
+        with Profile.profile() as p:
+            workers = [Async.threading.Thread(target=lambda i=i: [M.inverse(A) for A in mats[i::threads]])
+                       for i in range(threads)]
+            for t in workers:
+                t.start()
+            for t in workers:
+                t.join()
+        return [p["Matrix.inverse"].calls, p.totals.calls, p["LU.lu"].flops == serial["LU.lu"].flops]
+
+    names = {
+        counts      : "\n\tPer-operation counts:",
+        total_flops : "\n\tTotal flops:",
+        restored    : "\n\tOperations unwrapped after a profile:",
+        hook_events : "\n\tTracer hooks:",
+        nested      : "\n\tNested profiles:",
+        threaded    : "\n\tOperations on several threads:"
+    }
+
+    cases = [   # (function, [inputs], expected)
+        (counts, [lambda: mat[1] * mat[0], "Matrix.__mul__"], [1, 36, 0, 1]),
+        (counts, [lambda: mat[1] * mat[0], "Kernels.matmul"], [1, 36, 0, 0]),
+        (counts, [lambda: M.trans(mat[1]), "Matrix.trans"], [1, 0, 6, 1]),
+        (counts, [lambda: mat[1].copy(), "Matrix.copy"], [1, 0, 6, 1]),
+        (counts, [lambda: M.identity_matrix(4), "Matrix.identity_matrix"], [1, 0, 0, 1]),
+        (counts, [lambda: vec.dot(vec), "Vector.dot"], [1, 6, 0, 0]),
+        (counts, [lambda: M.inverse(mat[0]), "LU.lu"], [1, 18, 0, 0]),
+        (counts, [lambda: M.ref(mat[0]), "Kernels.eliminate_rows"], [3, 19, 0, 0]),
+
+        (total_flops, [lambda: mat[1] * mat[0]], 36),
+        (total_flops, [lambda: M.augment(mat[1], mat[1])], 0),
+
+        (restored, [], True),
+        (hook_events, [], [("start", "Matrix.identity_matrix"), ("start", "Matrix.__init__"),
+                           ("end", "Matrix.__init__"), ("end", "Matrix.identity_matrix")]),
+        (nested, [], [2, 1, 0]),
+        (threaded, [4, 3], [12, 12, True])
+    ]
+
+    run_func_tests(cases, names, v)
+
+
+def test_cache(v=False):
+    """
+    Tests caching of derived quantities, its invalidation, and the global LRU.
+    """
+    print(f"Testing caching of derived quantities:{' (verbose feedback)' if v else ''}")
+
+    def fresh():
+        return M.Matrix(3, 3, [[2, 1, 1], [1, 3, 2], [1, 0, 1]])
+
+    def reused(f, key):
+        """
+        returns whether f(A) is computed once, and its later results are
+        independent copies unless it is an unchanging factorization
+        """
+        A = fresh()
+        X = f(A)
+        cached = A._cache[key][1]
+        Y = f(A)
+        if isinstance(X, M.Matrix):
+            X.edit_entry(0, 0, 7)
+            return A._cache[key][1] is cached and X is not Y and Y == f(A.copy())
+        return A._cache[key][1] is cached and X is Y
+
+    def after(mutate, f):
+        """
+        returns whether f(A) is recomputed, and correctly, after mutate(A)
+        """
+        A = fresh()
+        old = f(A)
+        mutate(A)
+        new = f(A)
+        return new is not old and new == f(A.copy())
+
+    def through_view(f):
+        A = fresh()
+        old = f(A)
+        A.submatrix((1, 1), (2, 2)).row_scale(0, 5)
+        return f(A) != old
+
+    def raw_write(A):
+        """
+        returns det(A) after caching it, then trying to write an entry directly into a row's elements
+        """
+        A.det()
+        try:
+            A.row(0).elems[0] = 10
+        except (TypeError, ValueError):    # read-only (memoryview or NumPy array)
+            pass
+        return A.det()
+
+    def modified_result():
+        A = fresh()
+        T = M.trans(A)
+        T.edit_entry(0, 0, 100)
+        return M.trans(A).at(0, 0)
+
+    def frozen_mutation(mutate):
+        A = fresh().freeze()
+        mutate(A.submatrix((0, 0), (2, 2)))
+
+    def frozen_shared():
+        A, B = fresh().freeze(), fresh().freeze()
+        inv = M.inverse(A)
+        return [M.inverse(B) is inv, inv.frozen, fresh().frozen, A.copy().frozen]
+
+    def lru(sizes, budget):
+        cache = Cache.LRU(budget)
+        for i, size in enumerate(sizes):
+            cache.put(i, str(i), size)
+            cache.get(0)
+        return [i for i in range(len(sizes)) if i in cache]
+
+    def ranks(A):
+        return [A.rank(), B.to_backend(A, "python").rank()]
+
+    names = {
+        reused          : "\n\tQuantities reused while unchanged:",
+        after           : "\n\tRecomputed after a mutation:",
+        through_view    : "\n\tInvalidated through a view:",
+        raw_write       : "\n\tWriting directly into a view's elements:",
+        modified_result : "\n\tModified cached results:",
+        frozen_mutation : "\n\tMutating frozen matrices:",
+        frozen_shared   : "\n\tFrozen matrices sharing the global cache:",
+        lru             : "\n\tSize-aware LRU eviction:",
+        ranks           : "\n\tRank:"
+    }
+
+    cases = [   # (function, [inputs], expected)
+        (reused, [M.trans, "trans"], True),
+        (reused, [M.inverse, ("inverse", False)], True),
+        (reused, [LU.lu, "lu"], True),
+
+        (after, [lambda A: A.swap_rows_ip(0, 1), M.trans], True),
+        (after, [lambda A: A.swap_cols_ip(0, 2), M.inverse], True),
+        (after, [lambda A: A.row_add(0, 1, 2), lambda A: LU.lu(A).solve(V.Vector(3, [1, 2, 3]))], True),
+        (after, [lambda A: A.row_scale(2, 3), M.Matrix.det], True),
+        (after, [lambda A: A.edit_entry(1, 1, 7), M.trans], True),
+        (after, [lambda A: A.__imul__(2), M.inverse], True),
+        (after, [lambda A: M.add(A, A, out=A), M.trans], True),
+        (after, [lambda A: A.row(0).__imul__(2), M.Matrix.det], True),
+        (after, [lambda A: V.axpy(1, V.Vector(3, [1, 1, 1]), A.col(2)), M.inverse], True),
+        (after, [lambda A: A.submatrix((1, 1), (2, 2)).row(1).__iadd__(V.Vector(2, [1, 1])), M.trans], True),
+        (through_view, [M.Matrix.det], True),
+        (through_view, [M.trans], True),
+        (raw_write, [fresh()], 4),
+        (raw_write, [B.to_backend(fresh(), "python")], 4),
+        (modified_result, [], 2),
+
+        (frozen_mutation, [lambda A: A.edit_entry(0, 0, 1)], ValueError),
+        (frozen_mutation, [lambda A: A.swap_rows_ip(0, 1)], ValueError),
+        (frozen_mutation, [lambda A: A.__iadd__(A)], ValueError),
+        (frozen_shared, [], [True, True, False, False]),
+
+        (lru, [[1, 1, 1, 1], 3], [0, 2, 3]),
+        (lru, [[2, 2, 5], 4], [0, 1]),
+        (lru, [[2, 2, 1], 4], [0, 2]),
+        (lru, [[1, 3, 1], 4], [0, 2]),
+
+        (ranks, [M.Matrix(3, 3, [[1, 2, 3], [2, 4, 6], [1, 0, 1]])], [2, 2]),
+        (ranks, [M.Matrix(2, 3, [[1.5, 2, 3], [3, 4, 6]])], [1, 1]),
+        (ranks, [M.Matrix(2, 2, [[0, 0], [0, 0]])], [0, 0])
+    ]
+
+    run_func_tests(cases, names, v)
+
+
+def test_format(v=False):
+    """
+    Tests rendering matrices as text, summarized or streamed in full.
+    """
+    print(f"Testing matrix rendering:{' (verbose feedback)' if v else ''}")
+
+    mat = [
+        M.Matrix(2, 2, [[1.5, 2], [3, 4]]),   # 0
+        M.augment(M.Matrix(2, 2, [[1, -2], [3, 40]]), V.Vector(2, [5, 6])),
+        M.Matrix(8, 8, [[8*i + j for j in range(8)] for i in range(8)]),
+        M.Matrix(2, 3, [[Fraction(1, 3), 2, 0], [1, 0, 1]])
+    ]
+
+    def render(A, threshold=1000, edgeitems=3, precision=2):
+        with Format.printoptions(threshold=threshold, edgeitems=edgeitems, precision=precision):
+            return str(A)
+
+    def streamed(A):
+        f = io.StringIO()
+        A.write_to(f)
+        return f.getvalue()
+
+    def streamed_whole(A, threshold):
+        with Format.printoptions(threshold=threshold):
+            return streamed(A) == render(A, threshold=A.m*A.n)
+
+    def options_restored():
+        with Format.printoptions(edgeitems=1, precision=5):
+            pass
+        return Format.get_printoptions() == {"threshold": 1000, "edgeitems": 3, "precision": 2}
+
+    names = {
+        render           : "\n\tRendering:",
+        streamed         : "\n\tStreaming to a file:",
+        streamed_whole   : "\n\tStreaming ignores the threshold:",
+        options_restored : "\n\tPrint options restored:"
+    }
+
+    cases = [   # (function, [inputs], expected)
+        (render, [mat[0]], "[ 1.50 2.00 ]\n[ 3.00 4.00 ]\n"),
+        (render, [mat[1]], "[  1 -2 |  5 ]\n[  3 40 |  6 ]\n"),
+        (render, [mat[3]], "[ 1/3   2   0 ]\n[   1   0   1 ]\n"),
+        (render, [M.Matrix(2, 0)], "[ ]\n[ ]\n"),
+        (render, [mat[2].submatrix((0, 0), (2, 2))], "[ 0 1 ]\n[ 8 9 ]\n"),
+        (render, [mat[2], 16, 1],
+                 "[   0 ...   7 ]\n[ ... ... ... ]\n[  56 ...  63 ]\n"),
+        (render, [M.augment(mat[2], mat[2]), 16, 1],
+                 "[   0 ... |   7 ]\n[ ... ... | ... ]\n[  56 ... |  63 ]\n"),
+        (render, [M.augment(mat[2], V.Vector(8, list(range(8)))), 16, 2],
+                 "[   0   1 ...   7 |   0 ]\n[   8   9 ...  15 |   1 ]\n[ ... ... ... ... | ... ]\n"
+                 "[  48  49 ...  55 |   6 ]\n[  56  57 ...  63 |   7 ]\n"),
+        (render, [mat[0], 1000, 3, 0], "[ 2 2 ]\n[ 3 4 ]\n"),
+
+        (streamed, [mat[0]], "[ 1.50 2.00 ]\n[ 3.00 4.00 ]\n"),
+        (streamed, [mat[1]], "[  1 -2 |  5 ]\n[  3 40 |  6 ]\n"),
+        (streamed, [mat[3]], "[ 1/3   2   0 ]\n[   1   0   1 ]\n"),
+        (streamed, [M.Matrix(2, 2, [[-0.001, 1], [2, 100.5]])], "[  -0.00   1.00 ]\n[   2.00 100.50 ]\n"),
+        (streamed_whole, [mat[2], 4], True),
+        (options_restored, [], True)
+    ]
+
+    run_func_tests(cases, names, v)
+
+
+def test_compare(v=False):
+    """
+    Tests tolerance-aware comparisons, identity and zero checks, and fingerprints.
+    """
+    print(f"Testing comparisons and fingerprints:{' (verbose feedback)' if v else ''}")
+
+    mat = [
+        M.Matrix(3, 3, [[1, 2, 3], [4, 5, 6], [7, 8, 9]]),   # 0
+        M.Matrix(2, 2, [[4, 7], [2, 6]]),
+        M.Matrix._wrap(2, 2, array("d", [1.0, 1e-12, 0, 1 - 1e-12])),   # float noise the constructor would round away
+        M.Matrix(2, 2, [[1, 0.5], [0, 1]])
+    ]
+
+    def fingerprints_match(A, B):
+        return A.fingerprint() == B.fingerprint()
+
+    def inverse_is_identity(A):
+        return (M.inverse(A) * A).is_identity()
+
+    names = {
+        M.allclose                   : "\n\tallclose:",
+        Utils.isclose              : "\n\tisclose:",
+        M.Matrix.is_identity         : "\n\tIdentity check:",
+        inverse_is_identity          : "\n\tInverse times matrix is identity:",
+        M.Matrix.is_zero             : "\n\tZero check:",
+        fingerprints_match           : "\n\tFingerprints:"
+    }
+
+    cases = [   # (function, [inputs], expected)
+        (M.allclose, [mat[0], mat[0].copy()], True),
+        (M.allclose, [mat[2], M.identity_matrix(2)], True),
+        (M.allclose, [mat[3], M.identity_matrix(2)], False),
+        (M.allclose, [mat[3], M.identity_matrix(2), 0, 0.5], True),
+        (M.allclose, [M.Matrix(1, 1, [[100.0]]), M.Matrix(1, 1, [[100.001]]), 1e-4], True),
+        (M.allclose, [M.Matrix(1, 1, [[100.0]]), M.Matrix(1, 1, [[100.001]]), 1e-6], False),
+        (M.allclose, [mat[0], mat[1]], False),
+        (M.allclose, [V.Vector(2, [1, 2]), V.Vector(2, [1.0, 2.0000000001])], True),
+        (M.allclose, [mat[1], V.Vector(2, [1, 2])], TypeError),
+
+        (Utils.isclose, [1.0, 1.0 + 1e-9], True),
+        (Utils.isclose, [0.0, 1e-7], False),
+        (Utils.isclose, [float("inf"), float("inf")], True),
+
+        (M.Matrix.is_identity, [M.identity_matrix(4)], True),
+        (M.Matrix.is_identity, [mat[2]], True),
+        (M.Matrix.is_identity, [mat[2], 0], False),
+        (M.Matrix.is_identity, [mat[3]], False),
+        (M.Matrix.is_identity, [mat[0].submatrix((0, 0), (2, 3))], False),
+        (M.Matrix.is_identity, [M.trans(M.identity_matrix(3))], True),
+        (inverse_is_identity, [mat[1]], True),
+
+        (M.Matrix.is_zero, [M.Matrix(3, 2)], True),
+        (M.Matrix.is_zero, [M.Matrix(2, 2, [[0, 1e-12], [0, 0]])], True),
+        (M.Matrix.is_zero, [mat[0]], False),
+        (M.Matrix.is_zero, [M.Matrix(0, 0)], True),
+
+        (fingerprints_match, [mat[0], mat[0].copy()], True),
+        (fingerprints_match, [mat[0].submatrix((0, 1), (3, 2)), M.Matrix(3, 2, [[2, 3], [5, 6], [8, 9]])], True),
+        (fingerprints_match, [mat[0], B.to_backend(mat[0], "numpy")], True),
+        (fingerprints_match, [mat[0], M.trans(mat[0])], False),
+        (fingerprints_match, [M.Matrix(1, 2, [[1, 2]]), M.Matrix(2, 1, [[1], [2]])], False),
+        (fingerprints_match, [M.Matrix(1, 2, [[1, 2]]), M.Matrix(1, 2, [[1.5, 2]])], False),
+        (fingerprints_match, [mat[0].col(1), V.Vector(3, [2, 5, 8])], True)
+    ]
+
+    run_func_tests(cases, names, v)
+
+
+def test_qr(v=False):
+    """
+    Tests Householder QR, least squares, and streamed Givens least squares.
+    """
+    print(f"Testing QR factorization and least squares:{' (verbose feedback)' if v else ''}")
+
+    mat = [
+        M.Matrix(4, 2, [[1, 1], [1, 2], [1, 3], [1, 4]]),   # 0
+        M.Matrix(3, 3, [[2, 1, 1], [1, 3, 2], [1, 0, 0]]),
+        M.Matrix(3, 2, [[1, 2], [2, 4], [3, 6]]),
+        M.Matrix(2, 3, [[1, 2, 3], [4, 5, 6]]),
+        M.Matrix(4, 3, [[0, 1, 2], [3, 0.5, 1], [2, 2, 0], [1, 1, 1]])
+    ]
+    vec = [
+        V.Vector(4, [6, 5, 7, 10]),   # 0
+        V.Vector(3, [4, 5, 6])
+    ]
+
+    def close(x, y):
+        return M.allclose(x, y, 0, 1e-9)
+
+    def factors(A, full=False):
+        F = QR.qr(A)
+        Q, R = F.get_Q(full), F.get_R()
+        if full:
+            R = M.Matrix.from_rows(list(R.rows) + [[0] * A.n] * (A.m - A.n), m=A.m)
+        return close(Q * R, A) and (M.trans(Q) * Q).is_identity()
+
+    def lstsq(A, b, expected, method="householder"):
+        return close(QR.lstsq(A, b, method), expected)
+
+    def residual(A, b):
+        return round(QR.qr(A).residual(b), 9)
+
+    def streamed(A, b, chunk):
+        G = QR.GivensLeastSquares(A.n)
+        for i in range(0, A.m, chunk):
+            h = min(chunk, A.m - i)
+            G.add_rows(A.submatrix((i, 0), (h, A.n)), V.Vector(h, list(b.elems[i:i+h])))
+        return close(G.solve(), QR.lstsq(A, b)) and abs(G.residual - QR.qr(A).residual(b)) < 1e-9
+
+    def normal_equations(A, b):
+        """
+        returns whether lstsq agrees with solving the normal equations A^T*A*x = A^T*b
+        """
+        At = M.trans(A)
+        return close(QR.lstsq(A, b), LU.lu(At * A).solve(At * b))
+
+    names = {
+        factors          : "\n\tQ*R = A, with orthonormal Q:",
+        lstsq            : "\n\tLeast squares:",
+        residual         : "\n\tResidual:",
+        streamed         : "\n\tStreamed Givens least squares:",
+        normal_equations : "\n\tAgreement with the normal equations:"
+    }
+
+    cases = [   # (function, [inputs], expected)
+        (factors, [mat[0]], True),
+        (factors, [mat[0], True], True),
+        (factors, [mat[1]], True),
+        (factors, [mat[4]], True),
+        (factors, [mat[3]], ValueError),
+
+        (lstsq, [mat[0], vec[0], V.Vector(2, [3.5, 1.4])], True),
+        (lstsq, [mat[0], vec[0], V.Vector(2, [3.5, 1.4]), "givens"], True),
+        (lstsq, [mat[1], vec[1], LU.lu(mat[1]).solve(vec[1])], True),
+        (lstsq, [mat[1], vec[1], LU.lu(mat[1]).solve(vec[1]), "givens"], True),
+        (lstsq, [mat[0], M.Matrix(4, 2, [[6, 1], [5, 2], [7, 3], [10, 4]]), M.Matrix(2, 2, [[3.5, 0], [1.4, 1]])], True),
+        (lstsq, [mat[2], vec[1], None], ValueError),
+        (lstsq, [mat[2], vec[1], None, "givens"], ValueError),
+        (lstsq, [mat[0], vec[1], None], ValueError),
+        (lstsq, [mat[0], vec[0], None, "normal"], ValueError),
+
+        (residual, [mat[0], vec[0]], round(math.sqrt(4.2), 9)),
+        (residual, [mat[1], vec[1]], 0),
+
+        (streamed, [mat[0], vec[0], 1], True),
+        (streamed, [mat[0], vec[0], 3], True),
+        (streamed, [mat[4], vec[0], 2], True),
+
+        (normal_equations, [mat[0], vec[0]], True),
+        (normal_equations, [mat[4], vec[0]], True)
+    ]
+
+    run_func_tests(cases, names, v)
+
+
+def test_eigen(v=False):
+    """
+    Tests dense eigendecompositions and the power, inverse power and Lanczos iterations.
+    """
+    print(f"Testing eigenvalues and eigenvectors:{' (verbose feedback)' if v else ''}")
+
+    rng = random.Random(7)
+    sym = [[rng.uniform(-1, 1) for _ in range(12)] for _ in range(12)]
+    big = M.Matrix(12, 12, [[sym[i][j] + sym[j][i] for j in range(12)] for i in range(12)])
+    mat = [
+        M.Matrix(3, 3, [[2, 1, 0], [1, 3, 1], [0, 1, 4]]),   # 0
+        M.Matrix(2, 2, [[0, -1], [1, 0]]),
+        M.Matrix(3, 3, [[1, 2, 3], [4, 5, 6], [7, 8, 10]]),
+        M.Matrix(3, 3, [[2, 0, 0], [0, 3, 4], [0, 4, 9]]),
+        M.Matrix(2, 2, [[1, 1], [0, 1]]),
+        big,                                                  # 5
+        M.Matrix(2, 3, [[1, 2, 3], [4, 5, 6]])
+    ]
+    spectrum = sorted(Eigen.eigvals(big))
+
+    def pairs(A):
+        """
+        returns whether A*V = V*D for the eigenvalues D and eigenvectors V
+        """
+        values, vecs = Eigen.eig(A)
+        n = A.n
+        D = M.Matrix._wrap(n, n, [values[i] if i == j else 0 for i in range(n) for j in range(n)])
+        return M.allclose(A * vecs, vecs * D, 0, 1e-9)
+
+    def orthonormal(A):
+        vecs = Eigen.eig(A)[1]
+        return (M.trans(vecs) * vecs).is_identity()
+
+    def rounded(values):
+        return [round(x, 9) if isinstance(x, float) else x for x in values]
+
+    def eigvals(A, symmetric=None):
+        return rounded(Eigen.eigvals(A, symmetric))
+
+    def power(A, method, *args):
+        value, x, converged, _ = method(A, *args)
+        return converged and M.allclose(A * M.Matrix(x.n, 1, [[e] for e in x.elems]),
+                                        M.Matrix(x.n, 1, [[value * e] for e in x.elems]), 0, 1e-8) and round(value, 9)
+
+    def lanczos(A, k, which, operator=False):
+        op = I.LinearOperator(A.n, A.n, lambda x: A * x) if operator else A
+        values, vecs, converged, _ = Eigen.lanczos(op, k, which)
+        return converged and (M.trans(vecs) * vecs).is_identity() and rounded(values)
+
+    names = {
+        eigvals     : "\n\tEigenvalues:",
+        pairs       : "\n\tA*V = V*D:",
+        orthonormal : "\n\tOrthonormal eigenvectors of symmetric matrices:",
+        power       : "\n\tPower and inverse power iteration:",
+        lanczos     : "\n\tLanczos:"
+    }
+
+    cases = [   # (function, [inputs], expected)
+        (eigvals, [mat[0]], [round(3 - math.sqrt(3), 9), 3, round(3 + math.sqrt(3), 9)]),
+        (eigvals, [mat[1]], [-1j, 1j]),
+        (eigvals, [mat[3]], [1, 2, 11]),
+        (eigvals, [mat[3], False], [1, 2, 11]),
+        (eigvals, [mat[4]], [1, 1]),
+        (eigvals, [M.identity_matrix(3)], [1, 1, 1]),
+        (eigvals, [M.Matrix(0, 0)], []),
+        (eigvals, [mat[6]], ValueError),
+        (eigvals, [S.from_dense(mat[0])], TypeError),
+
+        (pairs, [mat[0]], True),
+        (pairs, [mat[1]], True),
+        (pairs, [mat[2]], True),
+        (pairs, [mat[5]], True),
+
+        (orthonormal, [mat[0]], True),
+        (orthonormal, [mat[3]], True),
+        (orthonormal, [mat[5]], True),
+
+        (power, [mat[3], Eigen.power], 11),
+        (power, [mat[0], Eigen.inverse_power, 1], round(3 - math.sqrt(3), 9)),
+        (power, [mat[3], Eigen.inverse_power, 2], 2),
+        (power, [mat[3], Eigen.inverse_power, 2.2], 2),
+        (power, [S.from_dense(mat[3]), Eigen.inverse_power, 1.2], 1),
+        (power, [mat[6], Eigen.power], ValueError),
+
+        (lanczos, [mat[5], 3, "largest"], rounded(spectrum[:-4:-1])),
+        (lanczos, [mat[5], 2, "smallest"], rounded(spectrum[:2])),
+        (lanczos, [mat[5], 2, "magnitude"], rounded(sorted(spectrum, key=abs)[:-3:-1])),
+        (lanczos, [mat[5], 2, "largest", True], rounded(spectrum[:-3:-1])),
+        (lanczos, [mat[3], 1, "largest"], [11]),
+        (lanczos, [mat[3], 3, "smallest"], [1, 2, 11]),
+        (lanczos, [mat[3], 4, "largest"], ValueError),
+        (lanczos, [mat[3], 1, "middle"], ValueError)
+    ]
+
+    run_func_tests(cases, names, v)
+
+
+def test_structured(v=False):
+    """
+    Tests diagonal, triangular, banded and symmetric matrices, and elimination matrices.
+    """
+    print(f"Testing structured matrices:{' (verbose feedback)' if v else ''}")
+
+    mat = [
+        M.Matrix(4, 4, [[4, 1, 0, 0], [2, 5, 1, 0], [0, 1, 6, 2], [0, 0, 3, 7]]),   # 0
+        M.Matrix(3, 3, [[2, 1, 3], [0, 4, 5], [0, 0, 6]]),
+        M.Matrix(3, 3, [[4, 2, 2], [2, 5, 3], [2, 3, 6]]),
+        M.Matrix(3, 3, [[0, 1, 0], [1, 0, 2], [0, 3, 1]]),
+        M.Matrix(2, 2, [[0, 1], [1, 0]]),
+        M.Matrix(3, 3, [[0, 2, 1], [1, 1, 0], [2, 0, 3]])                            # 5
+    ]
+    vec = V.Vector(4, [1, 2, 3, 4])
+
+    def close(x, y):
+        if isinstance(x, St.StructuredMatrix):
+            x = x.to_dense()
+        if isinstance(y, St.StructuredMatrix):
+            y = y.to_dense()
+        return M.allclose(x, y, 0, 1e-9)
+
+    def kernels(A, structure):
+        """
+        returns whether products, solves, determinants, inverses and transposes
+        of the structured form of A agree with those of A
+        """
+        S = St.from_dense(A, structure)
+        b = B.to_backend(V.Vector(A.n, list(range(1, A.n + 1))), "python")
+        return (close(S * A, A * A) and close(A * S, A * A) and close(S * b, A * b)
+                and close(S.solve(b), LU.lu(A).solve(b)) and close(S.solve(A), M.identity_matrix(A.n))
+                and abs(S.det() - A.det()) < 1e-9 and close(M.inverse(S), M.inverse(A))
+                and close(M.trans(S), M.trans(A)))
+
+    def kind(f, *args):
+        return type(f(*args)).__name__
+
+    def elimination(A, reduce):
+        """
+        returns whether E*A = U for the elimination matrix E of ref or rref
+        """
+        result = M.rref(A, True) if reduce else M.ref(A, True)
+        return close(result[1] * A, result[0])
+
+    names = {
+        St.from_dense : "\n\tConversion and equality:",
+        kernels       : "\n\tKernels agree with dense results:",
+        kind          : "\n\tStructure kept by operations:",
+        close         : "\n\tArithmetic with dense matrices:",
+        elimination   : "\n\tElimination matrices:"
+    }
+
+    python = [B.to_backend(A, "python") for A in mat]
+    cases = [   # (function, [inputs], expected)
+        (St.from_dense, [mat[0], "banded"], mat[0]),
+        (St.from_dense, [mat[1], "upper"], mat[1]),
+        (St.from_dense, [M.trans(mat[1]), "lower"], M.trans(mat[1])),
+        (St.from_dense, [mat[2], "symmetric"], mat[2]),
+        (St.from_dense, [M.identity_matrix(3), "diagonal"], St.identity(3)),
+        (St.from_dense, [mat[1], "lower"], ValueError),
+        (St.from_dense, [mat[1], "symmetric"], ValueError),
+        (St.from_dense, [mat[0], "banded", 0, 1], ValueError),
+        (St.from_dense, [mat[0], "sparse"], ValueError),
+
+        (kernels, [python[0], "banded"], True),
+        (kernels, [python[3], "banded"], True),
+        (kernels, [python[1], "upper"], True),
+        (kernels, [B.to_backend(M.trans(python[1]), "python"), "lower"], True),
+        (kernels, [python[2], "symmetric"], True),
+        (kernels, [python[4], "symmetric"], True),
+        (kernels, [B.to_backend(M.Matrix(3, 3, [[2, 0, 0], [0, -1, 0], [0, 0, 4]]), "python"), "diagonal"], True),
+
+        (kind, [lambda: St.identity(3) * St.DiagonalMatrix(3, [1, 2, 3])], "DiagonalMatrix"),
+        (kind, [lambda: St.from_dense(mat[1], "upper") * St.from_dense(mat[1], "upper")], "TriangularMatrix"),
+        (kind, [lambda: M.inverse(St.from_dense(mat[1], "upper"))], "TriangularMatrix"),
+        (kind, [lambda: St.from_dense(mat[0], "banded") * St.from_dense(mat[0], "banded")], "BandedMatrix"),
+        (kind, [lambda: St.from_dense(mat[0], "banded") - St.identity(4)], "Matrix"),
+        (kind, [lambda: St.from_dense(mat[2], "symmetric") + St.identity(3)], "SymmetricMatrix"),
+        (kind, [lambda: M.inverse(St.from_dense(mat[2], "symmetric"))], "SymmetricMatrix"),
+        (kind, [lambda: St.from_dense(mat[2], "symmetric").cholesky()], "TriangularMatrix"),
+
+        (close, [St.from_dense(mat[0], "banded") + mat[0], mat[0] + mat[0]], True),
+        (close, [mat[0] - St.from_dense(mat[0], "banded"), M.Matrix(4, 4)], True),
+        (close, [St.from_dense(mat[0], "banded") * St.from_dense(mat[0], "banded"), mat[0] * mat[0]], True),
+        (close, [St.tridiagonal([2, 1, 3], [4, 5, 6, 7], [1, 1, 2]), mat[0]], True),
+        (close, [St.tridiagonal([1.0] * 99, [4.0] * 100, [1.0] * 99).solve(V.Vector(100, [5] + [6] * 98 + [5])),
+                 V.Vector(100, [1] * 100)], True),
+
+        (elimination, [python[5], False], True),
+        (elimination, [python[5], True], True),
+        (elimination, [python[3], True], True),
+        (elimination, [B.to_backend(M.Matrix(3, 4, [[0, 2, 1, 4], [0, 1, 0, 1], [2, 0, 3, 5]]), "python"), True], True)
+    ]
+
+    run_func_tests(cases, names, v)
+
+
+def test_solve(v=False):
+    """
+    Tests direct solves and triangular solves.
+    """
+    print(f"Testing linear system solvers:{' (verbose feedback)' if v else ''}")
+
+    mat = [
+        M.Matrix(3, 3, [[2, 1, 1], [1, 3, 2], [1, 0, 0]]),   # 0
+        M.Matrix(3, 3, [[0, 2, 1], [1, 1, 0], [2, 0, 3]]),
+        M.Matrix(3, 3, [[1, 2, 3], [2, 4, 6], [1, 1, 1]]),
+        M.Matrix(2, 3, [[1, 2, 3], [4, 5, 6]]),
+        M.Matrix(3, 3, [[2, 7, 1], [3, 4, 5], [1, 8, 6]])
+    ]
+    vec = [
+        V.Vector(3, [4, 5, 6]),   # 0
+        V.Vector(2, [1, 2])
+    ]
+
+    def close(x, y):
+        return M.allclose(x, y, 0, 1e-9)
+
+    def solves(A, b):
+        """
+        returns whether A*solve(A, b) = b
+        """
+        return close(A * M.solve(A, b), b)
+
+    def matches_inverse(A, b):
+        return close(M.solve(A, b), M.inverse(A) * b)
+
+    def triangular(A, b, lower, unit):
+        """
+        returns whether the triangular solve agrees with solving the triangle of A as a full system
+        """
+        n = A.n
+        T = M.Matrix(n, n, [[(1 if unit and i == j else A.at(i, j)) if (j <= i if lower else j >= i) else 0
+                             for j in range(n)] for i in range(n)])
+        return close(M.solve_triangular(A, b, lower, unit), M.solve(T, b))
+
+    names = {
+        M.solve            : "\n\tSolve:",
+        solves             : "\n\tA*x = b:",
+        matches_inverse    : "\n\tAgreement with the inverse:",
+        M.solve_triangular : "\n\tTriangular solve:",
+        triangular         : "\n\tTriangular solve against full solve:"
+    }
+
+    python = [B.to_backend(A, "python") for A in mat]
+    cases = [   # (function, [inputs], expected)
+        (M.solve, [mat[0], vec[0]], V.Vector(3, [6, 15, -23])),
+        (M.solve, [mat[0], M.Matrix(3, 2, [[4, 2], [5, 1], [6, 1]])], M.Matrix(3, 2, [[6, 1], [15, 0], [-23, 0]])),
+        (M.solve, [mat[4], vec[0], True], V.Vector(3, [Fraction(48, 103), Fraction(39, 103), Fraction(43, 103)])),
+        (M.solve, [mat[4], M.Matrix(3, 1, [[4], [5], [6]]), True],
+                  M.Matrix(3, 1, [[Fraction(48, 103)], [Fraction(39, 103)], [Fraction(43, 103)]])),
+        (M.solve, [S.from_dense(mat[0]), vec[0]], V.Vector(3, [6, 15, -23])),
+        (M.solve, [S.from_dense(mat[0]), M.Matrix(2, 2, [[1, 0], [0, 1]])], ValueError),
+        (M.solve, [St.from_dense(M.Matrix(2, 2, [[2, 0], [0, 4]]), "diagonal"), vec[1]], V.Vector(2, [0.5, 0.5])),
+        (M.solve, [mat[2], vec[0]], ValueError),
+        (M.solve, [mat[2], vec[0], True], ValueError),
+        (M.solve, [mat[3], vec[1]], ValueError),
+        (M.solve, [mat[0], vec[1]], ValueError),
+        (M.solve, [mat[0], [4, 5, 6]], TypeError),
+
+        (solves, [mat[1], vec[0]], True),
+        (solves, [mat[4], M.Matrix(3, 2, [[1, 0], [0, 1], [2, 2]])], True),
+
+        (matches_inverse, [mat[1], vec[0]], True),
+        (matches_inverse, [mat[4], M.Matrix(3, 2, [[1, 0], [0, 1], [2, 2]])], True),
+
+        (M.solve_triangular, [mat[4], vec[0]], V.Vector(3, [1.5, 0, 1])),
+        (M.solve_triangular, [mat[4], vec[0], True], V.Vector(3, [2, -0.25, 1])),
+        (M.solve_triangular, [mat[4], vec[0], True, True], V.Vector(3, [4, -7, 58])),
+        (M.solve_triangular, [M.Matrix(2, 2, [[1, 0], [5, 0]]), vec[1], True], ValueError),
+        (M.solve_triangular, [M.Matrix(2, 2, [[1, 0], [5, 0]]), vec[1], True, True], V.Vector(2, [1, -3])),
+        (M.solve_triangular, [mat[3], vec[1]], ValueError),
+
+        (triangular, [python[4], vec[0], False, False], True),
+        (triangular, [python[4], vec[0], True, False], True),
+        (triangular, [python[4], M.Matrix(3, 2, [[1, 0], [0, 1], [2, 2]]), False, True], True),
+        (triangular, [python[1], M.Matrix(3, 2, [[1, 0], [0, 1], [2, 2]]), True, True], True)
+    ]
+
+    run_func_tests(cases, names, v)
+
+
+def test_async(v=False):
+    """
+    Tests the awaitable operations, their progress reports, cancellation and in-flight limit.
+    """
+    print(f"Testing asynchronous operations:{' (verbose feedback)' if v else ''}")
+
+    random.seed(5)
+    mat = [
+        M.Matrix(3, 3, [[2, 1, 1], [1, 3, 2], [1, 0, 0]]),   # 0
+        M.Matrix(3, 3, [[1, 2, 3], [2, 4, 6], [1, 1, 1]]),
+        M.Matrix(2, 3, [[1, 2, 3], [4, 5, 6]]),
+        M.Matrix(150, 40, [[random.randint(-9, 9) for _ in range(40)] for _ in range(150)]),
+        M.Matrix(60, 60, [[random.random() for _ in range(60)] for _ in range(60)])
+    ]
+    vec = V.Vector(3, [4, 5, 6])
+    tr = M.trans(mat[3])
+
+    def run(op, *args, **kwargs):
+        return asyncio.run(op(*args, **kwargs))
+
+    def progress(op, *args):
+        """
+        returns the progress reports of op
+        """
+        seen = []
+        run(op, *args, progress=lambda done, total: seen.append((done, total)))
+        return seen
+
+    def cancel(op, *args):
+        """
+        returns whether cancelling op from its first progress report stops it,
+        and its slot is freed once the worker has stopped
+        """
+        async def main():
+            task = asyncio.create_task(op(*args, progress=lambda done, total: task.cancel()))
+            try:
+                await task
+                return False
+            except asyncio.CancelledError:
+                pass
+            sem = Async._limit(asyncio.get_running_loop())
+            for _ in range(100):
+                if sem._value == Async.MAX_IN_FLIGHT:
+                    return True
+                await asyncio.sleep(0.01)
+            return False
+        return asyncio.run(main())
+
+    def in_flight(limit, jobs):
+        """
+        returns the most jobs seen running at once, out of jobs, with a limit of limit
+        """
+        count, peak = [0], [0]
+        lock = Async.threading.Lock()
+        def work():
+            with lock:
+                count[0] += 1
+                peak[0] = max(peak[0], count[0])
+            time.sleep(0.02)
+            with lock:
+                count[0] -= 1
+        async def main():
+            await asyncio.gather(*[Async._submit(work, (), None) for _ in range(jobs)])
+        old = Async.MAX_IN_FLIGHT
+        Async.set_max_in_flight(limit)
+        try:
+            asyncio.run(main())
+        finally:
+            Async.set_max_in_flight(old)
+        return peak[0]
+
+    def on_processes(op, *args):
+        old = (Async.EXECUTOR, Async.WORKERS)
+        Async.set_executor("process", 1)
+        try:
+            return run(op, *args)
+        finally:
+            Async.set_executor(*old)
+            Async.shutdown()
+
+    names = {
+        run                    : "\n\tAwaitable operations:",
+        progress               : "\n\tProgress reports:",
+        cancel                 : "\n\tCancellation:",
+        in_flight              : "\n\tJobs in flight:",
+        Async.set_executor     : "\n\tExecutor settings:",
+        Async.set_max_in_flight: "\n\tIn-flight limit:",
+        on_processes           : "\n\tProcess executor:"
+    }
+
+    cases = [   # (function, [inputs], expected)
+        (run, [Async.amul, mat[0], mat[1]], mat[0] * mat[1]),
+        (run, [Async.amul, mat[3], tr], mat[3] * tr),
+        (run, [Async.amul, mat[0], vec], mat[0] * vec),
+        (run, [Async.amul, mat[0], mat[2]], ValueError),
+        (run, [Async.asolve, mat[0], vec], V.Vector(3, [6, 15, -23])),
+        (run, [Async.asolve, mat[0], vec, True], V.Vector(3, [6, 15, -23])),
+        (run, [Async.asolve, mat[1], vec], ValueError),
+        (run, [Async.ainverse, mat[0]], M.inverse(mat[0])),
+        (run, [Async.ainverse, mat[4].copy()], M.inverse(mat[4])),
+        (run, [Async.ainverse, mat[1]], ValueError),
+        (run, [Async.arref, mat[1]], M.rref(mat[1])),
+        (run, [Async.arref, mat[0], True, True], M.rref(mat[0], True, True)),
+
+        (progress, [Async.asolve, B.to_backend(mat[0], "python").copy(), B.to_backend(vec, "python")], [(0, 3), (1, 3), (2, 3), (3, 3)]),
+        (progress, [Async.ainverse, B.to_backend(mat[0], "python").copy(), True], [(0, 3), (1, 3), (2, 3), (3, 3)]),
+        (progress, [Async.arref, B.to_backend(mat[0], "python").copy()], [(0, 3), (1, 3), (2, 3), (3, 3)] * 2),
+        (progress, [Async.amul, B.to_backend(mat[3], "python"), B.to_backend(tr, "python")], [(0, 3), (1, 3), (2, 3), (3, 3)]),
+
+        (cancel, [Async.ainverse, B.to_backend(mat[4], "python").copy()], True),
+        (cancel, [Async.amul, B.to_backend(mat[3], "python"), B.to_backend(tr, "python")], True),
+
+        (in_flight, [2, 6], 2),
+        (in_flight, [4, 3], 3),
+
+        (Async.set_executor, ["fiber"], ValueError),
+        (Async.set_max_in_flight, [0], ValueError),
+
+        (on_processes, [Async.asolve, mat[0], vec], V.Vector(3, [6, 15, -23])),
+        (on_processes, [Async.ainverse, mat[1]], ValueError)
+    ]
+
+    run_func_tests(cases, names, v)
+
+
 if __name__ == "__main__":
     # test_vector_ops()
     # test_vector_methods()
-    test_matrix_ops()
\ No newline at end of file
+    test_storage()
+    test_matrix_ops()
+    test_indexing()
+    test_mul_kernels()
+    test_lu()
+    test_numpy_backend()
+    test_sparse()
+    test_batch()
+    test_lazy()
+    test_in_place()
+    test_exact()
+    test_iterative()
+    test_parallel()
+    test_io()
+    test_out_of_core()
+    test_streaming()
+    test_bench()
+    test_profile()
+    test_cache()
+    test_format()
+    test_compare()
+    test_qr()
+    test_eigen()
+    test_structured()
+    test_solve()
+    test_async()
\ No newline at end of file
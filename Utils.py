@@ -1,6 +1,258 @@
+from array import array
+from itertools import repeat
+import hashlib
+import operator
+import sys
+import threading
+
+
+INT64_MIN = -2**63
+INT64_MAX = 2**63 - 1
+
+
 def is_integer(k, tol=1e-9):
     return abs(k - round(k)) <= tol
-    
+
+
+def is_zero(k, tol=1e-9):
+    return abs(k) <= tol
+
+
+def scalar_type(x):
+    """
+    returns the buffer typecode able to hold the scalar x:
+    "q" for (64-bit) integers, "d" for floats, None for anything else
+    """
+    if type(x) is int:
+        return "q" if INT64_MIN <= x <= INT64_MAX else None
+    if type(x) is float:
+        return "d"
+    return None
+
+
+_FORMATS = {"q": "q", "l": "q", "d": "d"}
+
+
+def typecode(buf):
+    """
+    returns the typecode of a buffer ("q", "d"), or None for
+    generic (list) buffers
+    """
+    if isinstance(buf, array):
+        return buf.typecode
+    if isinstance(buf, memoryview):
+        return _FORMATS.get(buf.format) if buf.itemsize == 8 else None
+    dtype = getattr(buf, "dtype", None)    # NumPy arrays
+    if dtype is not None and dtype.itemsize == 8:
+        return _FORMATS.get(dtype.char)
+    return None
+
+
+def join_types(*tcs):
+    """
+    returns the typecode of a result computed from buffers of typecodes tcs
+    """
+    if None in tcs:
+        return None
+    if "d" in tcs:
+        return "d"
+    return "q"
+
+
+def make_buffer(lst):
+    """
+    returns the elements of lst packed into the most compact buffer that holds
+    them exactly: array('q') for integers, array('d') for floats, otherwise a list
+    """
+    tc = join_types(*{scalar_type(x) for x in lst})
+    if tc is None:
+        return list(lst)
+    return array(tc, lst)
+
+
+def pack(values, tc):
+    """
+    returns an iterable of trusted values packed into a buffer of typecode tc.
+    integer buffers fall back to a list if a value overflows 64 bits
+    """
+    if tc == "d":
+        return array("d", values)
+    if tc is None:
+        return make_buffer(list(values))
+    values = list(values)
+    try:
+        return array("q", values)
+    except OverflowError:
+        return values
+
+
+def zeros(size, tc="q"):
+    """
+    returns a buffer of size zeros
+    """
+    if tc is None:
+        return [0] * size
+    return array(tc, [0]) * size
+
+
+def copy_buffer(buf):
+    """
+    returns a new, contiguous copy of buf
+    """
+    if isinstance(buf, array):
+        return buf[:]
+    if isinstance(buf, memoryview):
+        return array(typecode(buf), buf.tobytes())
+    return buf.copy()
+
+
+def concat(chunks, tc):
+    """
+    returns a new buffer of typecode tc holding the contents of the
+    iterable of sequences chunks, one after another
+    """
+    if tc is None:
+        out = []
+        for chunk in chunks:
+            out.extend(chunk)
+        return out
+    out = array(tc)
+    for chunk in chunks:
+        if isinstance(chunk, array) and chunk.typecode != tc:
+            chunk = chunk.tolist()
+        out.extend(chunk)
+    return out
+
+
+def to_list(buf):
+    """
+    returns the elements of a buffer as a list of plain Python numbers
+    """
+    if isinstance(buf, list):
+        return buf[:]
+    return buf.tolist()
+
+
+def widen(buf, x):
+    """
+    returns buf if it can store the scalar x, otherwise a copy of buf
+    in the narrowest buffer type that can
+    """
+    return widen_to(buf, scalar_type(x))
+
+
+def widen_to(buf, tc):
+    """
+    returns buf if it can store values of typecode tc, otherwise a copy of
+    buf in the narrowest buffer type that can
+    """
+    cur = typecode(buf)
+    if cur is None or tc == cur or (tc == "q" and cur == "d"):
+        return buf
+    if hasattr(buf, "astype"):    # NumPy arrays
+        return buf.astype("d" if tc == "d" else object)
+    if tc == "d":
+        _check_unmapped(buf)
+        return array("d", buf)
+    return to_generic(buf)
+
+
+def to_generic(buf):
+    """
+    returns a copy of buf as a generic (list) buffer, for values that
+    overflow its type
+    """
+    _check_unmapped(buf)
+    return list(buf)
+
+
+def _check_unmapped(buf):
+    """
+    throws an error if buf is a memory-mapped buffer (see IO.load): a copy
+    of it in a wider type would no longer write through to its file
+    """
+    if isinstance(buf, memoryview):
+        raise TypeError("Cannot widen a memory-mapped buffer")
+
+
+def axpy(a, x, y):
+    """
+    returns an iterator over the entries of y + a*x, for sequences x and y
+    """
+    return map(operator.add, y, map(operator.mul, repeat(a), x))
+
+
+def isclose(x, y, rtol=1e-05, atol=1e-08):
+    """
+    returns whether x is close to y: |x - y| <= atol + rtol*|y|
+    """
+    return x == y or abs(x - y) <= atol + rtol*abs(y)
+
+
+def all_zero(buf, tol=1e-9):
+    """
+    returns whether every element of buf is within tol of zero, stopping at
+    the first that isn't
+    """
+    if not any(buf):    # exact zeros, checked without leaving C
+        return True
+    return all(abs(x) <= tol for x in buf)
+
+
+def fingerprint(buf, shape):
+    """
+    returns a stable hash (a hex string) of the shape, buffer type and
+    elements of buf: the same on every run and platform, however the buffer
+    is stored (array, memoryview or NumPy array)
+    """
+    tc = typecode(buf)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{shape}:{tc}:".encode())
+    if tc is None:
+        digest.update(repr(to_list(buf)).encode())
+        return digest.hexdigest()
+    if not memoryview(buf).c_contiguous:
+        buf = copy_buffer(buf)
+    if sys.byteorder == "big":
+        buf = array(tc, buf)
+        buf.byteswap()
+    digest.update(buf)
+    return digest.hexdigest()
+
+
+_job = threading.local()    # the progress callback of the job running in each thread
+
+
+def set_progress(callback):
+    """
+    sets the function called as callback(done, total) as the eliminations
+    running in this thread go through their pivot columns (None for none),
+    returning the previous one. the callback may raise to abort the elimination
+    """
+    old = getattr(_job, "callback", None)
+    _job.callback = callback
+    return old
+
+
+def steps(seq):
+    """
+    returns the sequence seq of pivot columns to loop over. while a progress
+    callback is set, it is called as callback(done, len(seq)) before each
+    step and once they are all done
+    """
+    callback = getattr(_job, "callback", None)
+    if callback is None:
+        return seq
+    return _steps(seq, callback)
+
+
+def _steps(seq, callback):
+    total = len(seq)
+    for done, x in enumerate(seq):
+        callback(done, total)
+        yield x
+    callback(total, total)
+
 
 if __name__ == "__main__":
     print(is_integer(4.0))
@@ -1,50 +1,102 @@
+from array import array
 import math
+import operator
 import Utils
+import Backend
 
 class Vector:
     """
     A 1d array of numbers.
     
         n = size of vector
-        elems = list of n elements
+        elems = buffer of n elements: array('q') for integers, array('d') for
+                floats, or a list for anything else (e.g. Fractions).
+                read-only for a view: write through the vector's methods
+        base = the matrix whose data a row or column view shares (None otherwise)
     """
 
+    __slots__ = ("n", "_elems", "base", "_slice", "_source")
+
     def __init__(self, size, lst=None):
         if lst:
             if size != len(lst):
                 raise ValueError("Vector length does not match number of elements.")
 
         self.n = size
+        self.base = self._slice = self._source = None
         if lst:
-            self.elems = [(round(x) if Utils.is_integer(x) else x) for x in lst]
+            self.elems = Backend.adopt(Utils.make_buffer([(round(x) if Utils.is_integer(x) else x) for x in lst]))
         else:
-            self.elems = [0] * size
+            self.elems = Backend.adopt(Utils.zeros(size))
 
 
-    def __add__(self, v):
-        if not isinstance(v, Vector):
-            raise TypeError("Can only add vectors to vectors.")
+    @classmethod
+    def _wrap(cls, buf):
+        """
+        returns a vector backed directly by buf, skipping validation and rounding.
+        only for trusted results; buf is not copied
+        """
+        v = cls.__new__(cls)
+        v.n = len(buf)
+        v.elems = buf
+        v.base = v._slice = v._source = None
+        return v
+
+
+    @property
+    def elems(self):
+        """
+        buffer of the n elements. a view of a matrix follows the matrix's
+        buffer, which is replaced when the matrix widens
+        """
+        base = self.base
+        if base is not None and (base._data is not self._source or isinstance(self._source, list)):
+            self._source = base._data
+            self._elems = base._view_elems(self._slice)
+        return self._elems
+
+
+    @elems.setter
+    def elems(self, buf):
+        self._elems = buf
 
-        if self.n != v.n:
-            raise ValueError("Can only add vectors of same size.")
-        
-        u = []
-        for i in range(self.n):
-            u.append(self.elems[i] + v.elems[i])
-        return Vector(self.n, u)
+
+    def __add__(self, v):
+        return add(self, v)
 
 
     def __sub__(self, v):
-        if not isinstance(v, Vector):
-            raise TypeError("Can only subtract vectors from vectors.")
+        return sub(self, v)
 
-        if self.n != v.n:
-            raise ValueError("Can only subtract vectors of same size.")
-        
-        u = []
-        for i in range(self.n):
-            u.append(self.elems[i] - v.elems[i])
-        return Vector(self.n, u)
+
+    def __iadd__(self, v):
+        return add(self, v, out=self)
+
+
+    def __isub__(self, v):
+        return sub(self, v, out=self)
+
+
+    def __imul__(self, k):
+        return self.times(k, out=self)
+
+
+    def _assign(self, values, tc):
+        """
+        writes the trusted values, of typecode tc, over the elements in place.
+        a view of a matrix writes through to it, widening the matrix's buffer
+        if the values need it
+        """
+        if self.base is not None:
+            self.base._write_view(self._slice, values, tc)
+            return
+        buf = Utils.widen_to(self.elems, tc)
+        tc = Utils.typecode(buf)
+        new = Utils.pack(values, tc)
+        if tc is not None and Utils.typecode(new) != tc:    # overflowed 64 bits
+            buf = Utils.to_generic(buf)
+        buf[:] = new
+        self.elems = buf
 
 
     def __eq__(self, v):
@@ -53,8 +105,11 @@ class Vector:
         
         if self.n != v.n:
             return False
-        for i in range(self.n):
-            if self.elems[i] != v.elems[i]:
+        a, b = self.elems, v.elems
+        if isinstance(a, array) and isinstance(b, array):
+            return a == b    # compared without leaving C
+        for x, y in zip(a, b):
+            if x != y:
                 return False
         return True
     
@@ -64,21 +119,25 @@ class Vector:
     
 
     def __str__(self):
-        s = str(self.elems)
+        s = str(Utils.to_list(self.elems))
         return s
     
 
-    def times(self, k):
+    def times(self, k, out=None):
         """
-        returns a vector times the scalar k
+        returns a vector times the scalar k, written into the vector out if given
         """      
         if type(k) != int and type(k) != float:
             raise TypeError("Can only multiply vectors by scalars.")
         
-        u = []
-        for i in range(self.n):
-            u.append(self.elems[i] * k)
-        return Vector(self.n, u)
+        tc = Utils.join_types(Utils.typecode(self.elems), Utils.scalar_type(k))
+        if out is not None:
+            _check_out(out, self.n)
+            out._assign([x * k for x in self.elems], tc)
+            return out
+        if Backend.active(self):
+            return Backend.times(self, k)
+        return Vector._wrap(Utils.pack([x * k for x in self.elems], tc))
 
 
     def dot(self, v):
@@ -88,19 +147,24 @@ class Vector:
         if self.n != v.n:
             raise ValueError("Can only take dot product of vectors of same size.")
         
-        d = 0
-        for i in range(self.n):
-            d += self.elems[i]*v.elems[i]
-        return d
+        if Backend.active(self, v):
+            return Backend.dot(self, v)
+        return sum(map(operator.mul, self.elems, v.elems))
     
 
+    def fingerprint(self):
+        """
+        returns a stable hash (a hex string) of the size, entry type and
+        entries of a vector (see Matrix.fingerprint)
+        """
+        return Utils.fingerprint(self.elems, (self.n,))
+
+
     def mag(self):
         """
         returns the magnitude of a vector
         """
-        w = 0
-        for i in range(self.n):
-            w += (self.elems[i])*(self.elems[i])
+        w = sum(map(operator.mul, self.elems, self.elems))
         w = math.sqrt(w)
         return w
     
@@ -118,7 +182,7 @@ class Vector:
         """
         returns a deep copy of a vector
         """
-        return Vector(self.n, self.elems)
+        return Vector._wrap(Utils.copy_buffer(self.elems))
             
 
 def normalize(v):
@@ -128,6 +192,69 @@ def normalize(v):
     return v.times(1/v.mag())
 
 
+def add(u, v, out=None):
+    """
+    returns u + v, written into the vector out if given (which may be u or v)
+    """
+    if not isinstance(u, Vector) or not isinstance(v, Vector):
+        raise TypeError("Can only add vectors to vectors.")
+
+    if u.n != v.n:
+        raise ValueError("Can only add vectors of same size.")
+
+    if out is None and Backend.active(u, v):
+        return Backend.add(u, v)
+    return _combine(operator.add, u, v, out)
+
+
+def sub(u, v, out=None):
+    """
+    returns u - v, written into the vector out if given (which may be u or v)
+    """
+    if not isinstance(u, Vector) or not isinstance(v, Vector):
+        raise TypeError("Can only subtract vectors from vectors.")
+
+    if u.n != v.n:
+        raise ValueError("Can only subtract vectors of same size.")
+
+    if out is None and Backend.active(u, v):
+        return Backend.sub(u, v)
+    return _combine(operator.sub, u, v, out)
+
+
+def axpy(a, x, y):
+    """
+    adds a*x to the vector y in place (y += a*x), returning y
+    """
+    if type(a) != int and type(a) != float:
+        raise TypeError("Can only multiply vectors by scalars.")
+    if not isinstance(x, Vector) or not isinstance(y, Vector):
+        raise TypeError("Can only add vectors to vectors.")
+    if x.n != y.n:
+        raise ValueError("Can only add vectors of same size.")
+
+    tc = Utils.join_types(Utils.typecode(x.elems), Utils.typecode(y.elems), Utils.scalar_type(a))
+    y._assign(Utils.axpy(a, x.elems, y.elems), tc)
+    return y
+
+
+def _combine(op, u, v, out):
+    tc = Utils.join_types(Utils.typecode(u.elems), Utils.typecode(v.elems))
+    values = map(op, u.elems, v.elems)
+    if out is None:
+        return Vector._wrap(Utils.pack(values, tc))
+    _check_out(out, u.n)
+    out._assign(values, tc)
+    return out
+
+
+def _check_out(out, n):
+    if not isinstance(out, Vector):
+        raise TypeError("out must be a vector")
+    if out.n != n:
+        raise ValueError(f"out must be of size {n} (got {out.n})")
+
+
 if __name__ == "__main__":
     # deep versus shallow copy testing
     v11 = Vector(2, [1, 2])